@@ -1,26 +1,48 @@
+import copy
+import os
 import streamlit as st
 from datetime import datetime, date
 from typing import Optional, Dict, Any, List
 
 from src.services.firebase import get_firebase_instance
 from src.services.auth import render_auth_ui
+from src.services.budget_engine import apply_budget_update
+from src.services.categories import CategoryService, get_category_service
+from src.services.categorizer import get_categorizer, parse_rules
+from src.services.export import EXPORT_FORMATS, export_to_tempfile
+from src.services.export_routes import export_url, get_export_downloads
+from src.services.notebook_counters import CounterDeltas, empty_counters
+from src.services.net_worth_history import record_snapshot, load_history
+from src.services.metering import QuotaExceeded
+from src.services.resilience import FirestoreUnavailable
+from src.services.sync import (
+    PREFETCH_TIMEOUT_SECONDS,
+    cached_collections,
+    get_sync_status,
+    load_collections,
+    revalidate_in_background,
+    take_prefetch,
+    watch_for_changes
+)
+from src.services.valuation import refresh_asset_values
+from src.services.write_queue import WriteOp, get_write_tracker
 from src.models.transaction import Transaction
 from src.models.notebook import Notebook
 from src.ui.dashboard import (
     render_sidebar_dashboard,
+    render_write_status,
+    render_sync_status,
+    render_usage,
+    render_skeleton,
     display_overview_tab,
     display_budget_tab,
     display_transactions_tab,
+    display_notebooks_tab,
     display_assets_tab
 )
 from src.ui.forms import transaction_form, notebook_form, budget_form, asset_form
-
-# Initialize Firebase
-try:
-    firebase = get_firebase_instance()
-except Exception as e:
-    st.error(f"Failed to initialize Firebase: {str(e)}")
-    st.stop()
+from src.ui.debug import render_profiler_panel
+from src.utils.profiling import traced, trace_rerun
 
 # Page config
 st.set_page_config(
@@ -98,84 +120,194 @@ if "edit_budget" not in st.session_state:
 if "edit_asset" not in st.session_state:
     st.session_state.edit_asset = None
 
+# Firebase is initialized in main() once a user has signed in
+firebase = None
+
+def build_data(raw: Dict[str, Any], version: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Assemble the dashboard data from loaded collections"""
+    # Writes still committing in the background are overlaid on what was read
+    tracker = get_write_tracker()
+    tracker.settle(version)
+    categories, rules = raw["categories"]
+    transactions = tracker.apply("transactions", raw["transactions"])
+    notebooks = tracker.apply("notebooks", raw["notebooks"])
+    categories = tracker.apply_document("categories", "current", {"categories": categories})["categories"]
+    budgets = tracker.apply_document("budgets", "current", raw["budgets"])
+    assets = tracker.apply("assets", raw["assets"])
+    category_service = get_category_service(categories, transactions)
+    
+    return {
+        "transactions": transactions,
+        "notebooks": notebooks,
+        "categories": category_service.ranked(),
+        "category_service": category_service,
+        "budgets": budgets or {},
+        "assets": assets or [],
+        "rules": rules,
+        # Identifies this exact dataset, including whose it is; None when the version could not be read
+        "version": f"{firebase.user_id}:{version['version']}:{tracker.revision}" if version else None
+    }
+
+@traced("load_data")
 def load_data() -> Dict[str, Any]:
     """Load all required data from Firebase"""
+    if firebase.meter.degraded:
+        # Past the soft read quota, keep showing what this session already has
+        data = load_saved_data()
+        if data is not None:
+            st.info("Showing your saved data while database reads slow down for a minute")
+            return data
     try:
-        transactions = firebase.fetch_transactions()
-        notebooks = firebase.fetch_notebooks()
-        categories = firebase.fetch_categories()
-        budgets = firebase.fetch_budgets()
-        assets = firebase.fetch_assets()
+        # One small read tells which collections changed since the last rerun
+        version = firebase.fetch_data_version()
+        raw, _ = load_collections(firebase, version)
         
-        return {
-            "transactions": transactions,
-            "notebooks": notebooks,
-            "categories": categories,
-            "budgets": budgets or {},
-            "assets": assets or []
-        }
+        status = get_sync_status()
+        status.write_count = firebase.write_count
+        if version:
+            status.mark_synced(firebase.user_id, version)
+        return build_data(raw, version)
+    except FirestoreUnavailable as e:
+        return load_fallback_data(e)
     except Exception as e:
         st.error(f"Error loading data: {str(e)}")
         return None
 
-def handle_transaction_form(data: Optional[Dict[str, Any]], notebooks: List[Dict[str, Any]], categories: List[str]):
+def load_saved_data() -> Optional[Dict[str, Any]]:
+    """The last data this session loaded, from the shared cache"""
+    status = get_sync_status()
+    raw = cached_collections(firebase.user_id, status.version) if status.version and status.user_id == firebase.user_id else None
+    return None if raw is None else build_data(raw, status.version)
+
+def load_fallback_data(error: Exception) -> Optional[Dict[str, Any]]:
+    """The last data this session loaded, served while Firestore is unavailable"""
+    data = load_saved_data()
+    if data is None:
+        st.error(f"The database is unavailable and there is no saved data to show: {error}")
+        return None
+    status = get_sync_status()
+    synced = status.synced_at.strftime("%H:%M") if status.synced_at else "earlier"
+    if isinstance(error, QuotaExceeded):
+        st.warning(f"This session made too many database requests; showing your data as of {synced}. Try again in a minute.")
+    else:
+        st.warning(f"The database is unavailable; showing your data as of {synced}. Changes may not save until it recovers.")
+    return data
+
+def load_net_worth_history(start: date, end: date):
+    """Load the net worth history, or nothing while Firestore is unavailable"""
+    try:
+        return load_history(firebase, start, end)
+    except FirestoreUnavailable:
+        st.warning("Net worth history is unavailable right now")
+        return None
+
+@traced("load_prefetched_data")
+def load_prefetched_data() -> Optional[Dict[str, Any]]:
+    """Take over the data the sign-in prefetch loaded, showing a skeleton while it finishes"""
+    future = take_prefetch(firebase.user_id)
+    if future is None:
+        return None
+    try:
+        if future.done():
+            version, raw = future.result()
+        else:
+            placeholder = st.empty()
+            with placeholder.container():
+                render_skeleton()
+            try:
+                version, raw = future.result(timeout=PREFETCH_TIMEOUT_SECONDS)
+            finally:
+                placeholder.empty()
+    except Exception:
+        # Fall back to loading on this thread
+        return None
+    
+    status = get_sync_status()
+    status.write_count = firebase.write_count
+    if version:
+        status.mark_synced(firebase.user_id, version)
+    return build_data(raw, version)
+
+@traced("load_cached_data")
+def load_cached_data() -> Optional[Dict[str, Any]]:
+    """The last known data from the shared cache, revalidated in the background
+
+    Returns None when the session has nothing current to show, e.g. on its first
+    run or after it wrote to Firestore directly.
+    """
+    status = get_sync_status()
+    if status.version is None or status.user_id != firebase.user_id or status.write_count != firebase.write_count:
+        return None
+    raw = cached_collections(firebase.user_id, status.version)
+    if raw is None:
+        return None
+    # Past the soft read quota the cached data is served as is
+    if not firebase.meter.degraded:
+        revalidate_in_background(firebase, status)
+    return build_data(raw, status.version)
+
+def queue_save(collection: str, doc_id: Optional[str], data: Dict[str, Any], category_service: CategoryService, label: str,
+               extra_ops: Optional[List[WriteOp]] = None) -> str:
+    """Queue a document save, plus the new category and any extra writes, as one background batch"""
+    now = datetime.now()
+    data["updated_at"] = now
+    if doc_id:
+        ops = [firebase.write_op(collection, doc_id, data, kind="update")]
+    else:
+        data["created_at"] = now
+        ops = [firebase.write_op(collection, None, data)]
+    
+    # The category append shares the batch instead of costing a second round trip
+    if data.get("category") and category_service.claim(data["category"]):
+        ops.append(firebase.category_append_op([data["category"]]))
+    ops.extend(extra_ops or [])
+    
+    firebase.submit_writes(ops, label)
+    return ops[0].doc_id
+
+def handle_transaction_form(data: Optional[Dict[str, Any]], notebooks: List[Dict[str, Any]], category_service: CategoryService):
     """Handle transaction form submission"""
     if not data:
         st.session_state.show_transaction_form = False
         return
     
     try:
-        transaction_id = st.session_state.edit_transaction.get("id") if st.session_state.edit_transaction else None
+        data["category"] = category_service.resolve(data["category"])
+        previous = st.session_state.edit_transaction
+        transaction_id = previous.get("id") if previous else None
         
-        if transaction_id:
-            success = firebase.update_transaction(transaction_id, data)
-        else:
-            transaction_id = firebase.add_transaction(data)
-            success = bool(transaction_id)
+        # Notebook counters change in the same batch as the transaction
+        counters = CounterDeltas()
+        counters.add(previous, {**(previous or {}), **data})
         
-        if success:
-            st.success("Transaction saved successfully!")
-            
-            # Update categories if new one was added
-            if data["category"] not in categories:
-                firebase.update_categories(categories + [data["category"]])
-            
-            st.session_state.show_transaction_form = False
-            st.session_state.edit_transaction = None
-            st.rerun()
-        else:
-            st.error("Failed to save transaction")
-    except Exception as e:
+        # The write commits in the background; the next rerun shows it immediately
+        queue_save("transactions", transaction_id, data, category_service, f"Saving transaction '{data['description']}'",
+                   firebase.notebook_counter_ops(counters, [n["id"] for n in notebooks if n.get("id")]))
+        
+        st.session_state.show_transaction_form = False
+        st.session_state.edit_transaction = None
+        st.rerun()
+    except (ValueError, QuotaExceeded) as e:
         st.error(f"Error saving transaction: {str(e)}")
 
-def handle_notebook_form(data: Optional[Dict[str, Any]], categories: List[str]):
+def handle_notebook_form(data: Optional[Dict[str, Any]], category_service: CategoryService):
     """Handle notebook form submission"""
     if not data:
         st.session_state.show_notebook_form = False
         return
     
     try:
+        data["category"] = category_service.resolve(data["category"])
         notebook_id = st.session_state.edit_notebook.get("id") if st.session_state.edit_notebook else None
+        if not notebook_id:
+            data = {**empty_counters(), **data}
         
-        if notebook_id:
-            success = firebase.update_notebook(notebook_id, data)
-        else:
-            notebook_id = firebase.add_notebook(data)
-            success = bool(notebook_id)
+        queue_save("notebooks", notebook_id, data, category_service, f"Saving notebook '{data['name']}'")
         
-        if success:
-            st.success("Notebook saved successfully!")
-            
-            # Update categories if new one was added
-            if data["category"] not in categories:
-                firebase.update_categories(categories + [data["category"]])
-            
-            st.session_state.show_notebook_form = False
-            st.session_state.edit_notebook = None
-            st.rerun()
-        else:
-            st.error("Failed to save notebook")
-    except Exception as e:
+        st.session_state.show_notebook_form = False
+        st.session_state.edit_notebook = None
+        st.rerun()
+    except (ValueError, QuotaExceeded) as e:
         st.error(f"Error saving notebook: {str(e)}")
 
 def handle_budget_form(data: Optional[Dict[str, Any]], current_budgets: Dict[str, Any]):
@@ -185,59 +317,114 @@ def handle_budget_form(data: Optional[Dict[str, Any]], current_budgets: Dict[str
         return
     
     try:
-        # Initialize budget structure if not exists
-        if "monthly" not in current_budgets:
-            current_budgets["monthly"] = {"total": 0, "categories": {}}
-        if "annual" not in current_budgets:
-            current_budgets["annual"] = {"total": 0, "categories": {}}
-        
-        # Update budgets
-        current_budgets["monthly"]["categories"][data["category"]] = data["monthly"]
-        current_budgets["annual"]["categories"][data["category"]] = data["annual"]
+        # Update the category and adjust totals by the difference, on a copy of the shared document
+        current_budgets = apply_budget_update(copy.deepcopy(current_budgets), data["category"], data["monthly"], data["annual"])
+        current_budgets["updated_at"] = datetime.now()
         
-        # Update totals
-        current_budgets["monthly"]["total"] = sum(current_budgets["monthly"]["categories"].values())
-        current_budgets["annual"]["total"] = sum(current_budgets["annual"]["categories"].values())
+        firebase.submit_writes([firebase.write_op("budgets", "current", current_budgets)], f"Saving the {data['category']} budget")
         
-        if firebase.update_budgets(current_budgets):
-            st.success("Budget saved successfully!")
-            st.session_state.show_budget_form = False
-            st.session_state.edit_budget = None
-            st.rerun()
-        else:
-            st.error("Failed to save budget")
-    except Exception as e:
+        st.session_state.show_budget_form = False
+        st.session_state.edit_budget = None
+        st.rerun()
+    except (ValueError, QuotaExceeded) as e:
         st.error(f"Error saving budget: {str(e)}")
 
-def handle_asset_form(data: Optional[Dict[str, Any]], categories: List[str]):
+def handle_asset_form(data: Optional[Dict[str, Any]], assets: List[Dict[str, Any]], category_service: CategoryService):
     """Handle asset form submission"""
     if not data:
         st.session_state.show_asset_form = False
         return
     
     try:
+        data["category"] = category_service.resolve(data["category"])
         asset_id = st.session_state.edit_asset.get("id") if st.session_state.edit_asset else None
         
-        if asset_id:
-            success = firebase.update_asset(asset_id, data)
-        else:
-            asset_id = firebase.add_asset(data)
-            success = bool(asset_id)
+        asset_id = queue_save("assets", asset_id, data, category_service, f"Saving asset '{data['name']}'")
         
-        if success:
-            st.success("Asset saved successfully!")
-            
-            # Update categories if new one was added
-            if data["category"] not in categories:
-                firebase.update_categories(categories + [data["category"]])
-            
-            st.session_state.show_asset_form = False
-            st.session_state.edit_asset = None
+        # Record the new net worth in the history
+        updated_assets = [a for a in assets if a.get("id") != asset_id] + [{**data, "id": asset_id}]
+        record_snapshot(firebase, updated_assets)
+        
+        st.session_state.show_asset_form = False
+        st.session_state.edit_asset = None
+        st.rerun()
+    except (ValueError, QuotaExceeded) as e:
+        st.error(f"Error saving asset: {str(e)}")
+
+def edit_transaction(transaction: Dict[str, Any]):
+    """Open the transaction form for an existing transaction"""
+    st.session_state.edit_transaction = transaction
+    st.session_state.show_transaction_form = True
+    st.rerun()
+
+def apply_bulk_action(action: str, transactions: List[Dict[str, Any]], value: Any):
+    """Apply one action to many transactions with chunked batch writes and a single rerun"""
+    progress = st.progress(0.0, text=f"{action}: 0 of {len(transactions)}")
+    on_progress = lambda done, total: progress.progress(done / total, text=f"{action}: {done} of {total}")
+    # The stored versions let each batch adjust the notebook counters it affects
+    previous = {t["id"]: t for t in transactions}
+    
+    if action == "Delete":
+        done = firebase.bulk_delete_transactions([t["id"] for t in transactions], on_progress, previous)
+    elif action == "Change category":
+        done = firebase.bulk_update_transactions({t["id"]: {"category": value} for t in transactions}, on_progress, previous)
+    elif action == "Move to notebook":
+        done = firebase.bulk_update_transactions({t["id"]: {"notebook_id": value} for t in transactions}, on_progress, previous)
+    elif action == "Toggle recurring":
+        done = firebase.bulk_update_transactions(
+            {t["id"]: {"recurring": not t.get("recurring", False)} for t in transactions}, on_progress, previous
+        )
+    else:
+        st.error(f"Unknown action: {action}")
+        return
+    
+    if done == len(transactions):
+        st.rerun()
+
+def export_transactions(export_format: str, start_date=None, end_date=None, notebook_id=None, keep=None):
+    """Stream matching transactions into a file and offer it for download"""
+    try:
+        with st.spinner("Exporting transactions..."):
+            path, count = export_to_tempfile(firebase, export_format, start_date, end_date, notebook_id, keep)
+    except FirestoreUnavailable as e:
+        st.error(f"Export failed, please try again later: {e}")
+        return
+    
+    if not count:
+        os.remove(path)
+        st.info("No transactions to export")
+        return
+    writer = EXPORT_FORMATS[export_format]
+    # The file is streamed from disk by the download route in server.py, never read into the session
+    code = get_export_downloads().issue(
+        path,
+        firebase.user_id,
+        f"transactions-{date.today().isoformat()}.{writer.extension}",
+        writer.mime
+    )
+    st.link_button(f"Download {count} transactions", export_url(code))
+
+def save_rules(rows: List[Dict[str, Any]]):
+    """Validate and store the auto-categorization rules"""
+    try:
+        rules = parse_rules(rows)
+        if firebase.save_categorization_rules([rule.to_dict() for rule in rules]):
+            st.success("Rules saved successfully!")
             st.rerun()
         else:
-            st.error("Failed to save asset")
+            st.error("Failed to save rules")
+    except ValueError as e:
+        st.error(str(e))
+
+def delete_asset(asset: Dict[str, Any], assets: List[Dict[str, Any]]):
+    """Delete an asset and record the new net worth"""
+    try:
+        if firebase.delete_asset(asset["id"]):
+            record_snapshot(firebase, [a for a in assets if a.get("id") != asset["id"]])
+        else:
+            st.error("Failed to delete asset")
     except Exception as e:
-        st.error(f"Error saving asset: {str(e)}")
+        st.error(f"Error deleting asset: {str(e)}")
 
 def delete_notebook(notebook_id: str):
     """Delete a notebook and its transactions"""
@@ -256,14 +443,33 @@ def main():
     render_auth_ui()
     
     # Only show content for authenticated users
-    if "user_id" not in st.session_state:
+    if not st.session_state.get("user_id"):
         return
     
-    # Load data
-    data = load_data()
+    # Initialize Firebase
+    global firebase
+    try:
+        firebase = get_firebase_instance()
+        firebase.user_id = st.session_state.user_id
+    except Exception as e:
+        st.error(f"Failed to initialize Firebase: {str(e)}")
+        st.stop()
+    
+    # Render straight from the last known data when there is any; Firestore is checked in the background
+    data = load_cached_data() or load_prefetched_data() or load_data()
     if not data:
         return
     
+    # Reprice investment holdings; quotes are cached across sessions
+    revalued = refresh_asset_values(firebase, data["assets"])
+    if revalued is not None:
+        data["assets"] = revalued
+        record_snapshot(firebase, revalued)
+    
+    # Notebooks from before counters were maintained are counted once from the loaded transactions
+    if firebase.zombie_notebooks or any("transaction_count" not in n for n in data["notebooks"]):
+        firebase.backfill_notebook_counters(data["notebooks"], data["transactions"])
+    
     # Render sidebar
     render_sidebar_dashboard(
         notebooks=data["notebooks"],
@@ -272,26 +478,32 @@ def main():
         on_edit_notebook=lambda n: setattr(st.session_state, "edit_notebook", n),
         on_delete_notebook=delete_notebook
     )
+    render_write_status(get_write_tracker())
+    render_sync_status(get_sync_status())
+    watch_for_changes()
+    render_usage(firebase.meter)
     
     # Handle forms
     if st.session_state.show_transaction_form:
+        categorizer = get_categorizer(data["rules"], data["notebooks"], data["transactions"])
         transaction_form(
             data["notebooks"],
-            data["categories"],
+            data["category_service"],
             st.session_state.edit_transaction,
-            lambda form_data: handle_transaction_form(form_data, data["notebooks"], data["categories"])
+            lambda form_data: handle_transaction_form(form_data, data["notebooks"], data["category_service"]),
+            categorizer.categorize
         )
     
     if st.session_state.show_notebook_form:
         notebook_form(
-            data["categories"],
+            data["category_service"],
             st.session_state.edit_notebook,
-            lambda form_data: handle_notebook_form(form_data, data["categories"])
+            lambda form_data: handle_notebook_form(form_data, data["category_service"])
         )
     
     if st.session_state.show_budget_form:
         budget_form(
-            data["categories"],
+            data["category_service"],
             data["budgets"],
             st.session_state.edit_budget,
             lambda form_data: handle_budget_form(form_data, data["budgets"])
@@ -299,19 +511,20 @@ def main():
     
     if st.session_state.show_asset_form:
         asset_form(
-            data["categories"],
+            data["category_service"],
             st.session_state.edit_asset,
-            lambda form_data: handle_asset_form(form_data, data["categories"])
+            lambda form_data: handle_asset_form(form_data, data["assets"], data["category_service"])
         )
     
     # Display tabs
-    tab1, tab2, tab3, tab4 = st.tabs(["Overview", "Budget", "Assets", "Transactions"])
+    tab1, tab2, tab_notebooks, tab3, tab4 = st.tabs(["Overview", "Budget", "Notebooks", "Assets", "Transactions"])
     
     with tab1:
         display_overview_tab(
             data["transactions"],
             data["notebooks"],
-            data["budgets"]
+            data["budgets"],
+            data["version"]
         )
     
     with tab2:
@@ -319,7 +532,8 @@ def main():
             data["transactions"],
             data["budgets"],
             lambda: setattr(st.session_state, "show_budget_form", True),
-            lambda b: setattr(st.session_state, "edit_budget", b)
+            lambda b: setattr(st.session_state, "edit_budget", b),
+            data["version"]
         )
     
     with tab3:
@@ -328,17 +542,26 @@ def main():
             data["categories"],
             lambda: setattr(st.session_state, "show_asset_form", True),
             lambda a: setattr(st.session_state, "edit_asset", a),
-            lambda a: firebase.delete_asset(a["id"])
+            lambda a: delete_asset(a, data["assets"]),
+            load_net_worth_history
         )
     
+    with tab_notebooks:
+        display_notebooks_tab(data["notebooks"], data["transactions"], data["version"])
+    
     with tab4:
         display_transactions_tab(
             data["transactions"],
             data["notebooks"],
             data["categories"],
-            lambda transaction: firebase.delete_transaction(transaction["id"]),
-            lambda transaction: setattr(st.session_state, "edit_transaction", transaction)
+            edit_transaction,
+            apply_bulk_action,
+            data["rules"],
+            save_rules,
+            export_transactions
         )
 
 if __name__ == "__main__":
-    main()
+    with trace_rerun():
+        main()
+    render_profiler_panel()
@@ -0,0 +1,11 @@
+"""Serve app.py together with the routes that set and clear the session cookie
+and stream prepared exports.
+
+    streamlit run server.py
+"""
+import streamlit as st
+
+from src.services.auth_routes import ROUTES as AUTH_ROUTES
+from src.services.export_routes import ROUTES as EXPORT_ROUTES
+
+app = st.App("app.py", routes=AUTH_ROUTES + EXPORT_ROUTES)
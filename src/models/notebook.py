@@ -14,6 +14,11 @@ class Notebook:
     end_date: Optional[str] = None
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
+    # Maintained with increments by every transaction write; never written from here
+    transaction_count: int = 0
+    expense_total: float = 0.0
+    earning_total: float = 0.0
+    last_activity: Optional[datetime] = None
 
     @classmethod
     def from_dict(cls, id: str, data: dict) -> 'Notebook':
@@ -27,7 +32,11 @@ class Notebook:
             start_date=data.get('start_date'),
             end_date=data.get('end_date'),
             created_at=data.get('created_at'),
-            updated_at=data.get('updated_at')
+            updated_at=data.get('updated_at'),
+            transaction_count=int(data.get('transaction_count', 0)),
+            expense_total=float(data.get('expense_total', 0)),
+            earning_total=float(data.get('earning_total', 0)),
+            last_activity=data.get('last_activity')
         )
 
     def to_dict(self) -> dict:
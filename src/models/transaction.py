@@ -2,6 +2,8 @@ from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional
 
+from ..utils.dates import date_fields, day_ordinal
+
 @dataclass
 class Transaction:
     """Transaction model representing both expenses and earnings"""
@@ -9,12 +11,17 @@ class Transaction:
     description: str
     amount: float  # Negative for expenses, positive for earnings
     category: str
-    date: str
+    date: str  # "YYYY-MM-DD", for display; queries and calculations use day
     notebook_id: Optional[str] = None
     recurring: bool = False
     notes: Optional[str] = None
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
+    day: Optional[int] = None  # Day ordinal of date
+
+    def __post_init__(self):
+        if self.day is None:
+            self.day = day_ordinal(self.date)
 
     @property
     def is_expense(self) -> bool:
@@ -34,7 +41,8 @@ class Transaction:
             recurring=data.get('recurring', False),
             notes=data.get('notes'),
             created_at=data.get('created_at'),
-            updated_at=data.get('updated_at')
+            updated_at=data.get('updated_at'),
+            day=data.get('day')
         )
 
     def to_dict(self) -> dict:
@@ -44,7 +52,8 @@ class Transaction:
             'amount': self.amount,
             'category': self.category,
             'date': self.date,
-            'recurring': self.recurring
+            'recurring': self.recurring,
+            **date_fields(self.day if self.day is not None else self.date)
         }
         
         if self.notebook_id:
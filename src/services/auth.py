@@ -1,19 +1,94 @@
 import streamlit as st
-import requests
+import streamlit.components.v1 as components
 import json
-import os
+import secrets
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Set
+
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from .http_client import get_http_session
+from .auth_routes import SESSION_ROUTE, SIGN_OUT_ROUTE
+from .session_store import SESSION_COOKIE, get_session_store
+from .sync import start_prefetch
+from .token_refresh import TokenRefresher, token_expiry
 
 # Firebase configuration
 FIREBASE_WEB_API_KEY = ""  # From Firebase Console
 FIREBASE_AUTH_DOMAIN = "streamlit-finance-tracker-2.firebaseapp.com"
 SESSION_EXPIRY_DAYS = 7
 
-def get_auth_cache_path() -> str:
-    """Get the path to the auth cache file"""
-    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    return os.path.join(base_dir, '.auth_cache.json')
+_token_refresher = None
+
+def _script_session_id() -> Optional[str]:
+    """ID of the Streamlit session running this script, if any"""
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else None
+
+
+def _session_in_use(auth_data: Dict[str, Any], owners: Set[str]) -> bool:
+    """Keep refreshing a record only while its session is stored and a browser session still uses it"""
+    if not get_session_store().is_live(auth_data):
+        return False
+    if not owners or not runtime.exists():
+        return True
+    instance = runtime.get_instance()
+    return any(instance.is_active_session(owner) for owner in owners)
+
+
+def get_token_refresher() -> TokenRefresher:
+    """Get the process-wide background token refresher"""
+    global _token_refresher
+    if _token_refresher is None:
+        _token_refresher = TokenRefresher(
+            FIREBASE_WEB_API_KEY,
+            on_refresh=get_session_store().persist,
+            is_live=_session_in_use
+        )
+    return _token_refresher
+
+# Session-state entries holding one user's data, dropped whenever the signed-in user changes
+USER_SCOPED_KEYS = (
+    "auth_data", "session_token", "session_handoff", "prefetch", "firebase_instance",
+    "write_tracker", "sync_status", "category_service", "categorizer", "budget_engine",
+    "recurring_index", "notebook_budgets", "forecast_rollup"
+)
+# Form state app.py seeds at startup; open forms may hold the previous user's documents
+FORM_DEFAULTS = {
+    "show_transaction_form": False,
+    "show_notebook_form": False,
+    "show_budget_form": False,
+    "show_asset_form": False,
+    "edit_transaction": None,
+    "edit_notebook": None,
+    "edit_budget": None,
+    "edit_asset": None
+}
+
+
+def _reset_session_state():
+    """Drop the user-scoped caches and close any open form, so no data carries over between users"""
+    for key in USER_SCOPED_KEYS:
+        st.session_state.pop(key, None)
+    for key, value in FORM_DEFAULTS.items():
+        st.session_state[key] = value
+
+
+def start_session(auth_data: Dict[str, Any]):
+    """Register a signed-in user in the session store and bind it to this browser"""
+    token = secrets.token_urlsafe(32)
+    get_session_store().put(token, auth_data)
+    _reset_session_state()
+    st.session_state.auth_data = auth_data
+    st.session_state.user_id = auth_data["user_id"]
+    st.session_state.session_token = token
+    # The browser trades this code for an HttpOnly cookie on the next render, so the
+    # token itself never reaches the page or a URL
+    st.session_state.session_handoff = get_session_store().issue_handoff(token)
+    get_token_refresher().schedule(auth_data, owner=_script_session_id())
+    # Start reading the user's data during the rerun that follows sign-in
+    start_prefetch(auth_data["user_id"])
 
 
 def sign_in_with_email_password(email: str, password: str) -> Optional[Dict[str, Any]]:
@@ -23,7 +98,7 @@ def sign_in_with_email_password(email: str, password: str) -> Optional[Dict[str,
     
     try:
         st.write("Signing in...")
-        response = requests.post(url, json={
+        response = get_http_session().post(url, json={
             "email": email,
             "password": password,
             "returnSecureToken": True
@@ -43,15 +118,12 @@ def sign_in_with_email_password(email: str, password: str) -> Optional[Dict[str,
             auth_data = {
                 "user_id": data["localId"],
                 "id_token": data["idToken"],
+                "refresh_token": data.get("refreshToken"),
+                "token_expires_at": token_expiry(data.get("expiresIn")),
                 "email": data["email"],
                 "expires_at": (datetime.now() + timedelta(days=SESSION_EXPIRY_DAYS)).isoformat()
             }
-            st.session_state.auth_data = auth_data
-            st.session_state.user_id = data["localId"]
-            
-            # Save to local storage
-            with open(get_auth_cache_path(), "w") as f:
-                json.dump(auth_data, f)
+            start_session(auth_data)
             
             return data
         else:
@@ -82,7 +154,7 @@ def create_user(email: str, password: str, display_name: str = None) -> Optional
     
     try:
         print("Making request to:", url)  # Debug print
-        response = requests.post(url, json={
+        response = get_http_session().post(url, json={
             "email": email,
             "password": password,
             "displayName": display_name,
@@ -101,16 +173,13 @@ def create_user(email: str, password: str, display_name: str = None) -> Optional
             auth_data = {
                 "user_id": data["localId"],
                 "id_token": data["idToken"],
+                "refresh_token": data.get("refreshToken"),
+                "token_expires_at": token_expiry(data.get("expiresIn")),
                 "email": data["email"],
                 "display_name": display_name,
                 "expires_at": (datetime.now() + timedelta(days=SESSION_EXPIRY_DAYS)).isoformat()
             }
-            st.session_state.auth_data = auth_data
-            st.session_state.user_id = data["localId"]
-            
-            # Save to local storage
-            with open(get_auth_cache_path(), "w") as f:
-                json.dump(auth_data, f)
+            start_session(auth_data)
             
             return data
         else:
@@ -138,17 +207,25 @@ def create_user(email: str, password: str, display_name: str = None) -> Optional
 def sign_out():
     """Sign out the current user"""
     if "auth_data" in st.session_state:
-        del st.session_state.auth_data
-    if "user_id" in st.session_state:
-        del st.session_state.user_id
+        get_token_refresher().cancel(st.session_state.auth_data)
     
-    # Remove cached auth data
-    try:
-        cache_path = get_auth_cache_path()
-        if os.path.exists(cache_path):
-            os.remove(cache_path)
-    except Exception:
-        pass
+    # Drop the server-side session, and have the browser clear its cookie
+    token = st.session_state.get("session_token") or st.context.cookies.get(SESSION_COOKIE)
+    if token:
+        get_session_store().delete(token)
+    # Cached data, forms and trackers all belong to the user signing out
+    _reset_session_state()
+    st.session_state.user_id = None
+    st.session_state.clear_session_cookie = True
+
+
+def _post_from_browser(path: str, body: Dict[str, Any]):
+    """Send a same-origin POST from the browser, which is what sets or clears the HttpOnly cookie"""
+    components.html(
+        f"<script>fetch({json.dumps(path)}, {{method: 'POST', credentials: 'same-origin', "
+        f"headers: {{'Content-Type': 'application/json'}}, body: {json.dumps(json.dumps(body))}}});</script>",
+        height=0
+    )
 
 def check_auth_state() -> bool:
     """Check if user is authenticated and session is valid"""
@@ -159,36 +236,37 @@ def check_auth_state() -> bool:
             if datetime.now() < expires_at:
                 return True
         
-        # If not in session state, check local storage
-        cache_path = get_auth_cache_path()
-        if not os.path.exists(cache_path):
+        # If not in session state, look up the browser's session cookie
+        token = st.context.cookies.get(SESSION_COOKIE)
+        auth_data = get_session_store().get(token)
+        if not auth_data:
+            if token:
+                st.session_state.clear_session_cookie = True
             return False
         
-        with open(cache_path, "r") as f:
-            auth_data = json.load(f)
-        
-        # Check if cached session is still valid
-        if "expires_at" in auth_data:
-            expires_at = datetime.fromisoformat(auth_data["expires_at"])
-            if datetime.now() < expires_at:
-                # Restore session state
-                st.session_state.auth_data = auth_data
-                st.session_state.user_id = auth_data["user_id"]
-                return True
-        
-        # Clear invalid cache
-        os.remove(cache_path)
-        return False
+        # Restore session state
+        _reset_session_state()
+        st.session_state.auth_data = auth_data
+        st.session_state.user_id = auth_data["user_id"]
+        st.session_state.session_token = token
+        get_token_refresher().schedule(auth_data, owner=_script_session_id())
+        start_prefetch(auth_data["user_id"])
+        return True
     except Exception:
         return False
 
 def render_auth_ui():
     """Render the authentication UI"""
-    if "user_id" in st.session_state:
+    if st.session_state.get("user_id") or check_auth_state():
+        handoff = st.session_state.pop("session_handoff", None)
+        if handoff:
+            _post_from_browser(SESSION_ROUTE, {"code": handoff})
         # Show sign out button in sidebar
         with st.sidebar:
             st.button("Sign Out", on_click=sign_out, type="secondary")
     else:
+        if st.session_state.pop("clear_session_cookie", False):
+            _post_from_browser(SIGN_OUT_ROUTE, {})
         # Authentication form
         st.markdown("""
         <div style="text-align: center; padding: 2rem;">
@@ -0,0 +1,64 @@
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+from .session_store import SESSION_COOKIE, SESSION_COOKIE_SECURE, get_session_store
+
+# Paths the browser calls to set and clear its session cookie
+SESSION_ROUTE = "/auth/session"
+SIGN_OUT_ROUTE = "/auth/sign-out"
+
+
+def _same_origin(request: Request) -> bool:
+    """Reject cross-site posts, so another site cannot sign a browser in or out"""
+    origin = request.headers.get("origin")
+    return not origin or urlsplit(origin).netloc == request.headers.get("host")
+
+
+async def claim_session(request: Request) -> Response:
+    """Trade a one-time handoff code for an HttpOnly session cookie"""
+    if not _same_origin(request):
+        return Response(status_code=403)
+    try:
+        body = await request.json()
+    except ValueError:
+        body = None
+    code = body.get("code") if isinstance(body, dict) else None
+    store = get_session_store()
+    token = store.redeem_handoff(code) if isinstance(code, str) else None
+    auth_data = store.get(token) if token else None
+    if auth_data is None:
+        return Response(status_code=400)
+
+    # The cookie lives as long as the session it carries
+    expires_at = datetime.fromisoformat(auth_data["expires_at"])
+    response = Response(status_code=204)
+    response.set_cookie(
+        SESSION_COOKIE, token,
+        max_age=max(int((expires_at - datetime.now()).total_seconds()), 0),
+        httponly=True,
+        secure=SESSION_COOKIE_SECURE,
+        samesite="strict"
+    )
+    return response
+
+
+async def end_session(request: Request) -> Response:
+    """Drop the cookie's session and clear the cookie"""
+    if not _same_origin(request):
+        return Response(status_code=403)
+    token = request.cookies.get(SESSION_COOKIE)
+    if token:
+        get_session_store().delete(token)
+    response = Response(status_code=204)
+    response.delete_cookie(SESSION_COOKIE, httponly=True, secure=SESSION_COOKIE_SECURE, samesite="strict")
+    return response
+
+
+ROUTES = [
+    Route(SESSION_ROUTE, claim_session, methods=["POST"]),
+    Route(SIGN_OUT_ROUTE, end_session, methods=["POST"]),
+]
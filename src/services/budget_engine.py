@@ -0,0 +1,193 @@
+import calendar
+import hashlib
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import List, Dict, Any, Optional, Tuple
+
+import streamlit as st
+
+from ..utils.dates import days_to_datetimes, transaction_day
+from ..utils.lazy import lazy_import
+from ..utils.profiling import traced
+
+pd = lazy_import("pandas")
+np = lazy_import("numpy")
+
+# Timeframe labels shown in the UI mapped to engine period names
+TIMEFRAMES = {
+    "Current Month": "month",
+    "Current Week": "week",
+    "Current Quarter": "quarter",
+    "YTD": "ytd",
+    "Custom": "custom"
+}
+
+
+@dataclass
+class PeriodResult:
+    """Budgets and actual spend per category for one period"""
+    start: date
+    end: date
+    budgets: Dict[str, float] = field(default_factory=dict)
+    actuals: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def total_budget(self) -> float:
+        return sum(self.budgets.values())
+
+    @property
+    def total_spent(self) -> float:
+        return sum(self.actuals.values())
+
+
+def period_bounds(today: date) -> Dict[str, Tuple[date, date]]:
+    """Get the to-date range of each standard period"""
+    quarter_month = 3 * ((today.month - 1) // 3) + 1
+    return {
+        "week": (today - timedelta(days=today.weekday()), today),
+        "month": (date(today.year, today.month, 1), today),
+        "quarter": (date(today.year, quarter_month, 1), today),
+        "ytd": (date(today.year, 1, 1), today)
+    }
+
+
+def monthly_factor(start: date, end: date) -> float:
+    """Number of months covered by a date range, counting partial months by their days"""
+    factor = 0.0
+    current = date(start.year, start.month, 1)
+    while current <= end:
+        days_in_month = calendar.monthrange(current.year, current.month)[1]
+        month_end = date(current.year, current.month, days_in_month)
+        overlap = (min(end, month_end) - max(start, current)).days + 1
+        factor += overlap / days_in_month
+        current = month_end + timedelta(days=1)
+    return factor
+
+
+def annual_factor(start: date, end: date) -> float:
+    """Fraction of a year covered by a date range, using each year's real length"""
+    factor = 0.0
+    for year in range(start.year, end.year + 1):
+        year_start = max(start, date(year, 1, 1))
+        year_end = min(end, date(year, 12, 31))
+        days_in_year = 366 if calendar.isleap(year) else 365
+        factor += ((year_end - year_start).days + 1) / days_in_year
+    return factor
+
+
+def budget_period(period: str, start: date, end: date, today: date) -> Tuple[date, date]:
+    """Get the full budgeting window of a period (the whole week, month or quarter)"""
+    if period == "week":
+        return start, start + timedelta(days=6)
+    if period == "month":
+        return start, date(today.year, today.month, calendar.monthrange(today.year, today.month)[1])
+    if period == "quarter":
+        last_month = start.month + 2
+        return start, date(today.year, last_month, calendar.monthrange(today.year, last_month)[1])
+    if period == "ytd":
+        return start, date(today.year, 12, 31)
+    return start, end
+
+
+def apply_budget_update(budgets: Dict[str, Any], category: str, monthly: float, annual: float) -> Dict[str, Any]:
+    """Set one category's budgets and adjust the stored totals by the difference"""
+    for key, value in (("monthly", monthly), ("annual", annual)):
+        section = budgets.setdefault(key, {"total": 0, "categories": {}})
+        section.setdefault("categories", {})
+        previous = section["categories"].get(category, 0)
+        section["categories"][category] = value
+        section["total"] = section.get("total", 0) - previous + value
+    return budgets
+
+
+class BudgetEngine:
+    """Evaluates every budget period for all categories from one pass over the expenses"""
+
+    def __init__(self, transactions: List[Dict[str, Any]], budgets: Dict[str, Any], today: Optional[date] = None):
+        self.today = today or date.today()
+        self.monthly = dict((budgets or {}).get("monthly", {}).get("categories", {}))
+        self.annual = dict((budgets or {}).get("annual", {}).get("categories", {}))
+        self._results: Dict[Optional[Tuple[date, date]], Dict[str, PeriodResult]] = {}
+
+        expenses = [
+            (t.get("category", ""), -t["amount"], transaction_day(t))
+            for t in transactions
+            if t.get("amount", 0) < 0
+        ]
+        self.expenses = pd.DataFrame(expenses, columns=["category", "amount", "ordinal"])
+        self.expenses["day"] = days_to_datetimes(self.expenses["ordinal"])
+
+    def _budgets_for(self, period: str, start: date, end: date) -> Dict[str, float]:
+        """Calendar-correct budget of every category for a period"""
+        if period == "ytd":
+            return {c: float(v) for c, v in self.annual.items()}
+
+        window_start, window_end = budget_period(period, start, end, self.today)
+        years = annual_factor(window_start, window_end)
+        if period == "month":
+            # Monthly budgets apply as set
+            budgets = {c: float(v) for c, v in self.monthly.items()}
+        else:
+            months = monthly_factor(window_start, window_end)
+            budgets = {c: float(v) * months for c, v in self.monthly.items() if v}
+        # Categories with only an annual budget are prorated by day
+        for category, value in self.annual.items():
+            if value and not budgets.get(category):
+                budgets[category] = float(value) * years
+        return budgets
+
+    @traced("budget_engine.evaluate")
+    def evaluate(self, custom_range: Optional[Tuple[date, date]] = None) -> Dict[str, PeriodResult]:
+        """Compute budgets and actuals for every period in a single group-by"""
+        if custom_range in self._results:
+            return self._results[custom_range]
+
+        bounds = period_bounds(self.today)
+        if custom_range:
+            bounds["custom"] = custom_range
+
+        days = self.expenses["day"].values
+        amounts = self.expenses["amount"].to_numpy(dtype=float)
+        columns = {}
+        for period, (start, end) in bounds.items():
+            mask = (days >= np.datetime64(start)) & (days <= np.datetime64(end))
+            columns[period] = np.where(mask, amounts, 0.0)
+        actuals = pd.DataFrame(columns).groupby(self.expenses["category"].to_numpy()).sum()
+
+        results = {}
+        for period, (start, end) in bounds.items():
+            spent = actuals[period] if period in actuals else pd.Series(dtype=float)
+            results[period] = PeriodResult(
+                start=start,
+                end=end,
+                budgets=self._budgets_for(period, start, end),
+                actuals={c: float(v) for c, v in spent.items() if v}
+            )
+
+        self._results[custom_range] = results
+        return results
+
+
+def _data_key(transactions: List[Dict[str, Any]], budgets: Dict[str, Any]) -> str:
+    """Cheap fingerprint of the inputs used to reuse an engine across reruns"""
+    digest = hashlib.blake2b(digest_size=16)
+    for t in transactions:
+        digest.update(f"{t.get('id')}|{t.get('date')}|{t.get('amount')}|{t.get('category')}\n".encode("utf-8"))
+    digest.update(repr(sorted(((budgets or {}).get("monthly", {}).get("categories", {})).items())).encode("utf-8"))
+    digest.update(repr(sorted(((budgets or {}).get("annual", {}).get("categories", {})).items())).encode("utf-8"))
+    digest.update(date.today().isoformat().encode("utf-8"))
+    return digest.hexdigest()
+
+
+def get_budget_engine(transactions: List[Dict[str, Any]], budgets: Dict[str, Any], version: Optional[str] = None) -> BudgetEngine:
+    """Get the session's budget engine, rebuilding it only when the data changed
+
+    With a data version the check is free; without one the inputs are fingerprinted.
+    """
+    key = (version, date.today()) if version else _data_key(transactions, budgets)
+    cached = st.session_state.get("budget_engine")
+    if cached and cached[0] == key:
+        return cached[1]
+    engine = BudgetEngine(transactions, budgets)
+    st.session_state.budget_engine = (key, engine)
+    return engine
@@ -0,0 +1,160 @@
+import heapq
+import re
+from collections import Counter
+from typing import List, Dict, Any, Optional, Iterable, Set
+
+import streamlit as st
+
+from ..utils.profiling import traced
+
+# Categories form a hierarchy through their names, e.g. "Food/Groceries"
+SEPARATOR = "/"
+
+_WORD_START = re.compile(r"(?:^|[\s/&\-_])(?=\w)")
+
+
+def split_path(name: str) -> List[str]:
+    """Segments of a hierarchical category name"""
+    return [part.strip() for part in name.split(SEPARATOR) if part.strip()]
+
+
+class CategoryTrie:
+    """Prefix trie over category names; every word of a name is a possible match start"""
+
+    def __init__(self):
+        self._root: Dict[str, Any] = {}
+
+    def insert(self, name: str):
+        """Index a name under the start of each of its words"""
+        key = name.lower()
+        for match in _WORD_START.finditer(key):
+            node = self._root
+            for char in key[match.end():]:
+                node = node.setdefault(char, {})
+                node.setdefault("", set()).add(name)
+
+    def matches(self, prefix: str) -> Set[str]:
+        """Every name with a word starting with the prefix"""
+        node = self._root
+        for char in prefix.lower():
+            node = node.get(char)
+            if node is None:
+                return set()
+        return node.get("", set())
+
+
+class CategoryTaxonomy:
+    """Parent and child relations implied by hierarchical category names"""
+
+    def __init__(self, names: Iterable[str] = ()):
+        self.children: Dict[str, Set[str]] = {}
+        self.parents: Dict[str, Optional[str]] = {}
+        for name in names:
+            self.add(name)
+
+    def add(self, name: str):
+        """Add a category and any missing ancestors"""
+        parent = None
+        segments = split_path(name)
+        for depth in range(1, len(segments) + 1):
+            path = SEPARATOR.join(segments[:depth])
+            if path not in self.parents:
+                self.parents[path] = parent
+                self.children.setdefault(path, set())
+                if parent:
+                    self.children[parent].add(path)
+            parent = path
+
+    def roots(self) -> List[str]:
+        return sorted(name for name, parent in self.parents.items() if parent is None)
+
+    def ancestors(self, name: str) -> List[str]:
+        """Parents of a category, nearest first"""
+        found = []
+        parent = self.parents.get(name)
+        while parent:
+            found.append(parent)
+            parent = self.parents.get(parent)
+        return found
+
+    def rollup(self, amounts: Dict[str, float]) -> Dict[str, float]:
+        """Add each category's amount to all of its ancestors"""
+        totals = Counter()
+        for name, amount in amounts.items():
+            totals[name] += amount
+            for ancestor in self.ancestors(name):
+                totals[ancestor] += amount
+        return dict(totals)
+
+
+class CategoryService:
+    """Categories of a user with usage-ranked autocomplete"""
+
+    def __init__(self, categories: Iterable[str], transactions: Iterable[Dict[str, Any]] = ()):
+        self.usage = Counter(t.get("category") for t in transactions if t.get("category"))
+        self._names: Set[str] = set()
+        self._lower: Dict[str, str] = {}
+        self.trie = CategoryTrie()
+        self.taxonomy = CategoryTaxonomy()
+        for name in list(categories) + list(self.usage):
+            self._add(name)
+
+    def _add(self, name: str):
+        if not name or name in self._names:
+            return
+        self._names.add(name)
+        self._lower.setdefault(name.lower(), name)
+        self.trie.insert(name)
+        self.taxonomy.add(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._names
+
+    def ranked(self) -> List[str]:
+        """All categories, most used first"""
+        return sorted(self._names, key=lambda name: (-self.usage[name], name.lower()))
+
+    def suggest(self, prefix: str, limit: int = 8) -> List[str]:
+        """Categories with a word starting with the prefix, most used first"""
+        prefix = prefix.strip()
+        if not prefix:
+            return self.ranked()[:limit]
+        return heapq.nsmallest(limit, self.trie.matches(prefix), key=lambda name: (-self.usage[name], name.lower()))
+
+    def resolve(self, name: str) -> str:
+        """Existing spelling of a category typed in another case, or the name itself"""
+        name = name.strip()
+        return self._lower.get(name.lower(), name)
+
+    def claim(self, name: str) -> bool:
+        """Count a use of a category and add it locally; True if it still has to be stored"""
+        self.usage[name] += 1
+        if name in self._names:
+            return False
+        self._add(name)
+        return True
+
+    @traced("categories.ensure")
+    def ensure(self, firebase, name: str) -> bool:
+        """Store a category if it is new, appending it atomically instead of rewriting the list"""
+        if name in self._names:
+            self.usage[name] += 1
+            return False
+        if firebase.add_categories([name]):
+            self.claim(name)
+            return True
+        return False
+
+
+def get_category_service(categories: List[str], transactions: Optional[List[Dict[str, Any]]] = None) -> CategoryService:
+    """Get the session's category service, rebuilding it only when its inputs changed
+
+    Without transactions, the cached service is reused as long as the categories match.
+    """
+    # Usage counts are refreshed when transactions are added or removed; edits only shift ranking slightly
+    cached = st.session_state.get("category_service")
+    if cached and cached[0][0] == tuple(categories) and (transactions is None or cached[0][1] == len(transactions)):
+        return cached[1]
+    service = CategoryService(categories, transactions or ())
+    st.session_state.category_service = ((tuple(categories), len(transactions or ())), service)
+    return service
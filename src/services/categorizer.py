@@ -0,0 +1,217 @@
+import math
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass, asdict
+from typing import List, Dict, Any, Optional, Tuple
+
+import streamlit as st
+
+from .recurring import normalize_description
+from ..utils.profiling import traced
+
+# Minimum share of the posterior the learned model needs before its guess is used
+MIN_CONFIDENCE = 0.6
+
+# References to a group by number: \1 to \99 and (?(1)...) conditionals; three-digit escapes are octal
+_NUMBERED_GROUP_REFERENCE = re.compile(r"(?<!\\)(?:\\\\)*(?:\\[1-9](?![0-7]{2})|\(\?\(\d)")
+
+
+def uses_group_number(pattern: str) -> bool:
+    """Whether a pattern refers to one of its groups by number
+
+    Rule patterns are combined into one regex, where every rule's groups are
+    renumbered, so such a reference would point at another rule's group.
+    """
+    return bool(_NUMBERED_GROUP_REFERENCE.search(pattern))
+
+
+@dataclass
+class Rule:
+    """A user rule mapping matching transactions to a category; earlier rules win"""
+    category: str
+    pattern: str = ""
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+    notebook_id: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Rule":
+        return cls(
+            category=data.get("category", ""),
+            pattern=data.get("pattern", "") or "",
+            min_amount=data.get("min_amount"),
+            max_amount=data.get("max_amount"),
+            notebook_id=data.get("notebook_id") or None
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def accepts(self, amount: float, notebook_id: Optional[str]) -> bool:
+        """Check the non-regex conditions; amounts are compared by magnitude"""
+        magnitude = abs(amount)
+        if self.min_amount is not None and magnitude < self.min_amount:
+            return False
+        if self.max_amount is not None and magnitude > self.max_amount:
+            return False
+        return not self.notebook_id or self.notebook_id == notebook_id
+
+
+class RuleMatcher:
+    """All rule patterns compiled into one regex that reports the first matching rule"""
+
+    def __init__(self, rules: List[Rule]):
+        # parse_rules refuses numbered references; stored rules are filtered the same way
+        self.rules = [r for r in rules if r.category and not uses_group_number(r.pattern)]
+        self._matchers: Dict[int, Any] = {}
+
+    def _matcher(self, start: int):
+        """Combined regex over the rules from a position on, built on first use"""
+        if start not in self._matchers:
+            # Each rule is a lookahead branch; branches are tried in order at the start
+            # of the description, so the first rule that matches anywhere wins
+            branches = "|".join(
+                f"(?=.*?(?P<r{i}>{rule.pattern}))" for i, rule in enumerate(self.rules[start:], start)
+            )
+            self._matchers[start] = re.compile(f"^(?:{branches})", re.IGNORECASE | re.DOTALL) if branches else None
+        return self._matchers[start]
+
+    def match(self, description: str, amount: float = 0.0, notebook_id: Optional[str] = None) -> Optional[str]:
+        """Category of the first rule accepting a transaction"""
+        start = 0
+        while start < len(self.rules):
+            found = self._matcher(start).match(description or "")
+            if not found:
+                return None
+            index = int(found.lastgroup[1:])
+            if self.rules[index].accepts(amount, notebook_id):
+                return self.rules[index].category
+            # The regex matched but the amount or notebook did not; try the rules after it
+            start = index + 1
+        return None
+
+
+class DescriptionModel:
+    """Multinomial naive Bayes over description words, trained on past transactions"""
+
+    def __init__(self, transactions: List[Dict[str, Any]] = ()):
+        self.exact: Dict[str, Counter] = defaultdict(Counter)
+        self.word_counts: Dict[str, Counter] = defaultdict(Counter)
+        self.category_counts: Counter = Counter()
+        self.category_words: Counter = Counter()
+        for transaction in transactions:
+            self.learn(transaction.get("description", ""), transaction.get("category", ""))
+
+    def learn(self, description: str, category: str):
+        """Add one labelled example"""
+        if not category:
+            return
+        normalized = normalize_description(description)
+        if not normalized:
+            return
+        self.exact[normalized][category] += 1
+        self.category_counts[category] += 1
+        for word in normalized.split():
+            self.word_counts[word][category] += 1
+            self.category_words[category] += 1
+
+    def predict(self, description: str) -> Optional[Tuple[str, float]]:
+        """Most likely category and its posterior probability"""
+        normalized = normalize_description(description)
+        if not normalized or not self.category_counts:
+            return None
+
+        # A description seen before is decided by its own history
+        seen = self.exact.get(normalized)
+        if seen:
+            category, count = seen.most_common(1)[0]
+            return category, count / sum(seen.values())
+
+        words = [w for w in normalized.split() if w in self.word_counts]
+        if not words:
+            return None
+        vocabulary = len(self.word_counts)
+        total = sum(self.category_counts.values())
+        scores = {}
+        for category, count in self.category_counts.items():
+            denominator = self.category_words[category] + vocabulary
+            scores[category] = math.log(count / total) + sum(
+                math.log((self.word_counts[w][category] + 1) / denominator) for w in words
+            )
+        best = max(scores, key=scores.get)
+        norm = sum(math.exp(s - scores[best]) for s in scores.values())
+        return best, 1 / norm
+
+
+class Categorizer:
+    """Suggests categories from user rules, notebook defaults and past transactions"""
+
+    def __init__(self, rules: List[Rule], notebooks: List[Dict[str, Any]], transactions: List[Dict[str, Any]]):
+        self.matcher = RuleMatcher(rules)
+        self.notebook_defaults = {n["id"]: n.get("category") for n in notebooks if n.get("id") and n.get("category")}
+        self.model = DescriptionModel(transactions)
+        self._bounds = sorted({b for r in self.matcher.rules for b in (r.min_amount, r.max_amount) if b is not None})
+
+    def categorize(self, description: str, amount: float = 0.0, notebook_id: Optional[str] = None) -> Optional[str]:
+        """Category for one transaction, or None when nothing is confident enough"""
+        category = self.matcher.match(description, amount, notebook_id)
+        if category:
+            return category
+        if notebook_id in self.notebook_defaults:
+            return self.notebook_defaults[notebook_id]
+        predicted = self.model.predict(description)
+        if predicted and predicted[1] >= MIN_CONFIDENCE:
+            return predicted[0]
+        return None
+
+    @traced("categorizer.categorize_many")
+    def categorize_many(self, transactions: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """Categories for a batch; repeated descriptions are only evaluated once"""
+        memo: Dict[tuple, Optional[str]] = {}
+        results = []
+        for t in transactions:
+            amount = t.get("amount", 0)
+            # Amount only matters to rules with ranges, so bucket it by those bounds
+            key = (t.get("description", ""), t.get("notebook_id"), self._amount_bucket(amount))
+            if key not in memo:
+                memo[key] = self.categorize(key[0], amount, key[1])
+            results.append(memo[key])
+        return results
+
+    def _amount_bucket(self, amount: float) -> int:
+        """Position of an amount among the rule bounds; amounts in the same position satisfy the same rules"""
+        magnitude = abs(amount)
+        return sum(1 for b in self._bounds if magnitude > b) * 2 + sum(1 for b in self._bounds if magnitude == b)
+
+
+def parse_rules(rows: List[Dict[str, Any]]) -> List[Rule]:
+    """Validate rules entered by the user, raising ValueError on a bad pattern"""
+    rules = []
+    for row in rows:
+        rule = Rule.from_dict(row)
+        if not rule.category:
+            continue
+        try:
+            re.compile(rule.pattern)
+        except re.error as e:
+            raise ValueError(f"Invalid pattern '{rule.pattern}': {e}")
+        if uses_group_number(rule.pattern):
+            raise ValueError(f"Invalid pattern '{rule.pattern}': refer to groups by name, e.g. (?P<word>\\w+) and (?P=word)")
+        rules.append(rule)
+    # Patterns are combined into one regex, so they must also compile side by side
+    try:
+        RuleMatcher(rules)._matcher(0)
+    except re.error as e:
+        raise ValueError(f"Patterns cannot be combined: {e}")
+    return rules
+
+
+def get_categorizer(rules: List[Dict[str, Any]], notebooks: List[Dict[str, Any]], transactions: List[Dict[str, Any]]) -> Categorizer:
+    """Get the session's categorizer, retraining it only when its inputs changed"""
+    key = (repr(rules), tuple(sorted((n.get("id"), n.get("category")) for n in notebooks)), len(transactions))
+    cached = st.session_state.get("categorizer")
+    if cached and cached[0] == key:
+        return cached[1]
+    categorizer = Categorizer([Rule.from_dict(r) for r in rules], notebooks, transactions)
+    st.session_state.categorizer = (key, categorizer)
+    return categorizer
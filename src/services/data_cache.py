@@ -0,0 +1,109 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from ..utils.metrics import REGISTRY
+
+# Total estimated size of the documents held for all users
+DATA_CACHE_MAX_BYTES = int(os.environ.get("DATA_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+_entries = REGISTRY.gauge(
+    "finance_tracker_data_cache_entries",
+    "Collections held in the shared data cache"
+)
+_bytes = REGISTRY.gauge(
+    "finance_tracker_data_cache_bytes",
+    "Estimated size of the collections held in the shared data cache"
+)
+_evictions = REGISTRY.counter(
+    "finance_tracker_data_cache_evictions",
+    "Collections evicted from the shared data cache to stay within its byte budget"
+)
+_lookups = REGISTRY.counter(
+    "finance_tracker_data_cache_lookups",
+    "Shared data cache lookups",
+    ["result"]
+)
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate memory held by a tree of loaded documents"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set)):
+        size += sum(estimate_size(v) for v in value)
+    return size
+
+
+class SharedDataCache:
+    """Loaded collections shared by every session of a user, bounded by a global byte budget
+
+    Entries are keyed by user and collection and carry the collection's version
+    counter; a lookup with any other version misses. Cached documents are shared
+    between sessions and must be treated as read-only.
+    """
+
+    def __init__(self, max_bytes: int = DATA_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Any, Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        return self._bytes
+
+    def get(self, user_id: str, collection: str, version: Any) -> Optional[Any]:
+        """Documents of a collection loaded at exactly this version, or None"""
+        with self._lock:
+            entry = self._entries.get((user_id, collection))
+            if entry is None or entry[0] != version:
+                _lookups.inc(result="miss")
+                return None
+            self._entries.move_to_end((user_id, collection))
+        _lookups.inc(result="hit")
+        return entry[1]
+
+    def put(self, user_id: str, collection: str, version: Any, value: Any):
+        """Store a collection, replacing older versions and evicting the least recently used"""
+        size = estimate_size(value)
+        with self._lock:
+            self._remove((user_id, collection))
+            # A collection larger than the whole budget is not worth holding
+            if size <= self.max_bytes:
+                self._entries[(user_id, collection)] = (version, value, size)
+                self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                _evictions.inc()
+            self._publish()
+
+    def invalidate(self, user_id: str):
+        """Drop every collection of a user"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_id]:
+                self._remove(key)
+            self._publish()
+
+    def _remove(self, key: Tuple[str, str]):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def _publish(self):
+        _entries.set(len(self._entries))
+        _bytes.set(self._bytes)
+
+
+_shared_cache = SharedDataCache()
+
+
+def get_shared_cache() -> SharedDataCache:
+    """Get the process-wide data cache"""
+    return _shared_cache
@@ -0,0 +1,200 @@
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import date, datetime, timezone
+from typing import List, Dict, Any, Iterable, Callable, Optional, Tuple
+
+from ..utils.lazy import lazy_import
+from ..utils.profiling import traced
+
+pa = lazy_import("pyarrow")
+pq = lazy_import("pyarrow.parquet")
+
+# Documents fetched per query page; each page is written out before the next is read
+EXPORT_PAGE_SIZE = 500
+
+EXPORT_COLUMNS = [
+    "id", "date", "description", "amount", "category",
+    "notebook_id", "recurring", "notes", "created_at", "updated_at"
+]
+
+
+def _as_date(value: Any) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str) and value:
+        return date.fromisoformat(value[:10])
+    return None
+
+
+def _naive_utc(value: Any) -> Optional[datetime]:
+    """Firestore timestamps are timezone-aware; Parquet columns hold naive UTC"""
+    if not isinstance(value, datetime):
+        return None
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+
+def _as_text(value: Any) -> Any:
+    """Plain representation of a Firestore value for text formats"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def export_row(transaction: Dict[str, Any]) -> Dict[str, Any]:
+    """A transaction restricted to the exported columns"""
+    return {column: transaction.get(column) for column in EXPORT_COLUMNS}
+
+
+class CSVExportWriter:
+    """Writes pages of transactions as CSV"""
+    extension = "csv"
+    mime = "text/csv"
+
+    def __init__(self, fileobj):
+        self._text = io.TextIOWrapper(fileobj, encoding="utf-8", newline="")
+        self._writer = csv.DictWriter(self._text, fieldnames=EXPORT_COLUMNS)
+        self._writer.writeheader()
+
+    def write_page(self, rows: List[Dict[str, Any]]):
+        self._writer.writerows({k: _as_text(v) for k, v in row.items()} for row in rows)
+
+    def close(self):
+        self._text.flush()
+        # Leave the underlying file open for the caller
+        self._text.detach()
+
+
+class JSONLExportWriter:
+    """Writes pages of transactions as one JSON object per line"""
+    extension = "jsonl"
+    mime = "application/x-ndjson"
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+
+    def write_page(self, rows: List[Dict[str, Any]]):
+        self._fileobj.write("".join(json.dumps(row, default=_as_text) + "\n" for row in rows).encode("utf-8"))
+
+    def close(self):
+        self._fileobj.flush()
+
+
+class ParquetExportWriter:
+    """Writes each page of transactions as a compressed Parquet row group"""
+    extension = "parquet"
+    mime = "application/vnd.apache.parquet"
+
+    def __init__(self, fileobj, compression: str = "zstd"):
+        self.schema = pa.schema([
+            ("id", pa.string()),
+            ("date", pa.date32()),
+            ("description", pa.string()),
+            ("amount", pa.float64()),
+            ("category", pa.string()),
+            ("notebook_id", pa.string()),
+            ("recurring", pa.bool_()),
+            ("notes", pa.string()),
+            ("created_at", pa.timestamp("us")),
+            ("updated_at", pa.timestamp("us"))
+        ])
+        self._writer = pq.ParquetWriter(fileobj, self.schema, compression=compression)
+
+    def write_page(self, rows: List[Dict[str, Any]]):
+        columns = {column: [row[column] for row in rows] for column in EXPORT_COLUMNS}
+        columns["date"] = [_as_date(v) for v in columns["date"]]
+        columns["amount"] = [None if v is None else float(v) for v in columns["amount"]]
+        columns["recurring"] = [bool(v) for v in columns["recurring"]]
+        for column in ("created_at", "updated_at"):
+            columns[column] = [_naive_utc(v) for v in columns[column]]
+        self._writer.write_table(pa.Table.from_pydict(columns, schema=self.schema))
+
+    def close(self):
+        self._writer.close()
+
+
+EXPORT_FORMATS = {
+    "CSV": CSVExportWriter,
+    "Parquet": ParquetExportWriter,
+    "JSONL": JSONLExportWriter
+}
+
+
+@traced("export.export_transactions")
+def export_transactions(
+    pages: Iterable[List[Dict[str, Any]]],
+    export_format: str,
+    fileobj,
+    keep: Optional[Callable[[Dict[str, Any]], bool]] = None
+) -> int:
+    """Stream pages of transactions into a binary file, holding one page in memory at a time"""
+    writer = EXPORT_FORMATS[export_format](fileobj)
+    count = 0
+    try:
+        for page in pages:
+            rows = [export_row(t) for t in page if keep is None or keep(t)]
+            if rows:
+                writer.write_page(rows)
+                count += len(rows)
+    finally:
+        writer.close()
+    return count
+
+
+def export_to_tempfile(firebase, export_format: str, start_date=None, end_date=None, notebook_id=None,
+                       keep: Optional[Callable[[Dict[str, Any]], bool]] = None) -> Tuple[str, int]:
+    """Export the current user's transactions to a temporary file on disk
+
+    Returns the file's path and the number of rows; the caller removes the file.
+    """
+    with tempfile.NamedTemporaryFile(prefix="export-", suffix=f".{EXPORT_FORMATS[export_format].extension}", delete=False) as fileobj:
+        try:
+            pages = firebase.iter_transaction_pages(start_date, end_date, notebook_id, page_size=EXPORT_PAGE_SIZE)
+            count = export_transactions(pages, export_format, fileobj, keep)
+        except BaseException:
+            fileobj.close()
+            os.remove(fileobj.name)
+            raise
+    return fileobj.name, count
+
+
+def main():
+    """Export one user's transactions from the command line"""
+    import argparse
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+    from .firebase import FirebaseService
+
+    parser = argparse.ArgumentParser(description="Stream a user's transactions to a file")
+    parser.add_argument("--user", required=True, help="User ID")
+    parser.add_argument("--format", choices=[f.lower() for f in EXPORT_FORMATS], default="csv")
+    parser.add_argument("--out", required=True, help="Output file")
+    parser.add_argument("--key", default="firestore-key.json", help="Service account key")
+    parser.add_argument("--start", help="First date (YYYY-MM-DD)")
+    parser.add_argument("--end", help="Last date (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    app = firebase_admin.initialize_app(credentials.Certificate(args.key))
+    service = FirebaseService(firestore.client(app))
+    service.user_id = args.user
+    export_format = next(f for f in EXPORT_FORMATS if f.lower() == args.format)
+
+    with open(args.out, "wb") as f:
+        count = export_transactions(
+            service.iter_transaction_pages(
+                start_date=_as_date(args.start),
+                end_date=_as_date(args.end),
+                page_size=EXPORT_PAGE_SIZE
+            ),
+            export_format,
+            f
+        )
+    print(f"Exported {count} transactions to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
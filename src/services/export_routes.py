@@ -0,0 +1,115 @@
+import os
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from starlette.background import BackgroundTask
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response
+from starlette.routing import Route
+
+from .session_store import SESSION_COOKIE, get_session_store
+
+# Path a finished export is downloaded from; the code names one prepared file
+EXPORT_ROUTE = "/export/{code}"
+# How long a prepared export waits to be downloaded before its file is removed
+EXPORT_DOWNLOAD_SECONDS = int(os.environ.get("EXPORT_DOWNLOAD_SECONDS", "600"))
+
+
+@dataclass
+class PreparedExport:
+    """An export file on disk waiting for its owner to download it"""
+    path: str
+    user_id: str
+    file_name: str
+    mime: str
+    issued: float
+
+
+class ExportDownloads:
+    """Prepared export files by single-use download code
+
+    Exports are written to disk by the script thread and streamed from there by
+    the download route, so a file is never held in memory whole.
+    """
+
+    def __init__(self, ttl: float = EXPORT_DOWNLOAD_SECONDS):
+        self.ttl = ttl
+        self._exports: Dict[str, PreparedExport] = {}
+        self._lock = threading.Lock()
+
+    def issue(self, path: str, user_id: str, file_name: str, mime: str) -> str:
+        """Register a finished export file and get the code that downloads it once"""
+        code = secrets.token_urlsafe(24)
+        now = time.monotonic()
+        with self._lock:
+            stale = [c for c, export in self._exports.items() if now - export.issued > self.ttl]
+            expired = [self._exports.pop(c) for c in stale]
+            self._exports[code] = PreparedExport(path, user_id, file_name, mime, now)
+        for export in expired:
+            _remove(export.path)
+        return code
+
+    def redeem(self, code: str) -> Optional[PreparedExport]:
+        """The export for a code, once, if it has not expired"""
+        with self._lock:
+            export = self._exports.pop(code, None)
+        if export is None:
+            return None
+        if time.monotonic() - export.issued > self.ttl:
+            _remove(export.path)
+            return None
+        return export
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+_downloads = None
+_downloads_lock = threading.Lock()
+
+
+def get_export_downloads() -> ExportDownloads:
+    """Get the process-wide registry of prepared exports"""
+    global _downloads
+    if _downloads is None:
+        with _downloads_lock:
+            if _downloads is None:
+                _downloads = ExportDownloads()
+    return _downloads
+
+
+def export_url(code: str) -> str:
+    """Download path for a prepared export"""
+    return EXPORT_ROUTE.replace("{code}", code)
+
+
+async def download_export(request: Request) -> Response:
+    """Stream a prepared export to the signed-in user it was made for, then remove it"""
+    token = request.cookies.get(SESSION_COOKIE)
+    auth_data = get_session_store().get(token) if token else None
+    if auth_data is None:
+        return Response(status_code=403)
+    export = get_export_downloads().redeem(request.path_params["code"])
+    if export is None:
+        return Response(status_code=404)
+    if auth_data.get("user_id") != export.user_id:
+        _remove(export.path)
+        return Response(status_code=403)
+    return FileResponse(
+        export.path,
+        media_type=export.mime,
+        filename=export.file_name,
+        background=BackgroundTask(_remove, export.path)
+    )
+
+
+ROUTES = [
+    Route(EXPORT_ROUTE, download_export, methods=["GET"]),
+]
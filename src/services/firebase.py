@@ -1,12 +1,27 @@
+from __future__ import annotations
+
 from datetime import datetime
-from typing import List, Optional, Dict, Any
-import firebase_admin
-from firebase_admin import credentials, firestore
+from typing import List, Optional, Dict, Any, Callable, Iterable, Iterator, Set
 import os
 import streamlit as st
 
 from ..models.transaction import Transaction
 from ..models.notebook import Notebook
+from ..utils.dates import date_fields, day_ordinal, iso_day, with_typed_date
+from ..utils.lazy import lazy_import
+from ..utils.profiling import traced, span, record_documents
+from . import resilience
+from .resilience import FirestoreUnavailable
+from .metering import UsageMeter, batch_writes, documents_read
+from .migrations import migration_verified
+from .notebook_counters import CounterDeltas, empty_counters, recount
+from .write_queue import MAX_BATCH_WRITES, WriteOp, db_version_ref, get_write_queue, get_write_tracker, version_bump
+
+# The Admin SDK and Firestore client are only imported once a signed-in user
+# needs them, keeping them off the sign-in page's import path
+firebase_admin = lazy_import("firebase_admin")
+credentials = lazy_import("firebase_admin.credentials")
+firestore = lazy_import("firebase_admin.firestore")
 
 def get_firebase_instance() -> 'FirebaseService':
     """Get or create a Firebase service instance"""
@@ -44,6 +59,12 @@ class FirebaseService:
     def __init__(self, db: firestore.Client):
         self.db = db
         self._user_id = None
+        # Writes committed directly from this session, so cached renders know they are behind
+        self.write_count = 0
+        # Documents this session read and wrote, checked against its quotas
+        self.meter = UsageMeter()
+        # Notebook documents left with counters only, removed by the next backfill
+        self.zombie_notebooks: Set[str] = set()
     
     @property
     def user_id(self) -> Optional[str]:
@@ -59,6 +80,7 @@ class FirebaseService:
             raise ValueError("User ID not set")
         return self.db.collection('users').document(self.user_id).collection(collection_name)
     
+    @traced("firebase.get_transactions")
     def get_transactions(
         self,
         start_date: Optional[datetime] = None,
@@ -71,20 +93,15 @@ class FirebaseService:
         
         if notebook_id:
             query = query.where('notebook_id', '==', notebook_id)
-        if start_date:
-            query = query.where('date', '>=', start_date.strftime('%Y-%m-%d'))
-        if end_date:
-            query = query.where('date', '<=', end_date.strftime('%Y-%m-%d'))
+        query, date_field = self._filter_dates(query, start_date, end_date)
         
         # Order by date and then by creation time
-        query = query.order_by('date', direction=firestore.Query.DESCENDING)
+        query = query.order_by(date_field, direction=firestore.Query.DESCENDING)
         
-        transactions = []
-        for doc in query.stream():
-            transaction = Transaction.from_dict(doc.id, doc.to_dict())
-            transactions.append(transaction)
-        
-        return transactions
+        docs = self._call("get_transactions", lambda timeout: list(query.stream(retry=None, timeout=timeout)))
+        data = [doc.to_dict() for doc in docs]
+        record_documents(data)
+        return [Transaction.from_dict(doc.id, fields) for doc, fields in zip(docs, data)]
     
     def add_transaction(self, transaction: Transaction) -> Optional[str]:
         """Add a new transaction"""
@@ -117,17 +134,16 @@ class FirebaseService:
         except Exception:
             return False
     
+    @traced("firebase.get_notebooks")
     def get_notebooks(self) -> List[Notebook]:
         """Get all notebooks"""
         collection = self._get_user_collection('notebooks')
         query = collection.order_by('created_at', direction=firestore.Query.DESCENDING)
         
-        notebooks = []
-        for doc in query.stream():
-            notebook = Notebook.from_dict(doc.id, doc.to_dict())
-            notebooks.append(notebook)
-        
-        return notebooks
+        docs = self._call("get_notebooks", lambda timeout: list(query.stream(retry=None, timeout=timeout)))
+        data = [doc.to_dict() for doc in docs]
+        record_documents(data)
+        return [Notebook.from_dict(doc.id, fields) for doc, fields in zip(docs, data)]
     
     def add_notebook(self, notebook: Notebook) -> Optional[str]:
         """Add a new notebook"""
@@ -175,8 +191,7 @@ class FirebaseService:
     
     def get_categories(self) -> List[str]:
         """Get all categories"""
-        doc = self._get_user_collection('metadata').document('categories').get()
-        return doc.to_dict().get('categories', []) if doc.exists else []
+        return self.fetch_categories()
     
     def update_categories(self, categories: List[str]) -> bool:
         """Update the list of categories"""
@@ -189,10 +204,16 @@ class FirebaseService:
         except Exception:
             return False
     
+    @traced("firebase.get_budgets")
     def get_budgets(self) -> Dict[str, Any]:
         """Get budget settings"""
-        doc = self._get_user_collection('metadata').document('budgets').get()
-        return doc.to_dict() if doc.exists else {
+        budgets_ref = self._get_user_collection('metadata').document('budgets')
+        doc = self._call("get_budgets", lambda timeout: budgets_ref.get(retry=None, timeout=timeout))
+        if doc.exists:
+            budgets = doc.to_dict()
+            record_documents([budgets])
+            return budgets
+        return {
             'monthly': {'total': 0, 'categories': {}},
             'annual': {'total': 0, 'categories': {}}
         }
@@ -208,11 +229,139 @@ class FirebaseService:
 
     def get_user_collection_ref(self, collection_name: str):
         """Get a reference to a user-specific collection"""
-        if "user_id" not in st.session_state:
+        # The service's own user also works on background threads, which have no session state
+        user_id = self.user_id or st.session_state.get("user_id")
+        if not user_id:
+            return None
+        return self.db.collection("users").document(user_id).collection(collection_name)
+
+    # Resilience
+    def _call(self, operation: str, fn, idempotent: bool = True):
+        """Run a Firestore read with a deadline, retries and the circuit breaker, metering the documents read"""
+        self.meter.check("read", operation)
+        result = resilience.call(operation, fn, idempotent=idempotent)
+        self.meter.record(self.user_id, operation, "read", documents_read(result))
+        return result
+
+    def _commit(self, batch, operation: str = "commit"):
+        """Commit a batch; batches carry increments, so they are only retried when rejected outright"""
+        self.meter.check("write", operation)
+        writes, deletes = batch_writes(batch)
+        result = resilience.call(operation, lambda timeout: batch.commit(retry=None, timeout=timeout), idempotent=False)
+        self.meter.record(self.user_id, operation, "write", writes)
+        self.meter.record(self.user_id, operation, "delete", deletes)
+        return result
+
+    # Data version
+    def _version_ref(self):
+        return db_version_ref(self.db, self.user_id)
+
+    def _bump_version(self, batch, *collections: str):
+        """Bump the user's data version in the same batch as the writes it covers"""
+        batch.set(self._version_ref(), version_bump(collections), merge=True)
+        self.write_count += 1
+
+    def _commit_write(self, collection: str, write, counters: Optional[CounterDeltas] = None) -> None:
+        """Commit one document write together with its version bump and any notebook counter changes"""
+        batch = self.db.batch()
+        write(batch)
+        if counters:
+            self._apply_counters(batch, counters)
+            self._bump_version(batch, collection, "notebooks")
+        else:
+            self._bump_version(batch, collection)
+        self._commit(batch)
+
+    # Notebook counters
+    # Counters are applied with update, so a notebook deleted in the meantime fails
+    # the write instead of coming back as a document with counters only
+    def _apply_counters(self, batch, counters: CounterDeltas):
+        """Add notebook counter increments to a batch"""
+        notebooks_ref = self.get_user_collection_ref("notebooks")
+        for notebook_id, fields in counters.fields().items():
+            batch.update(notebooks_ref.document(notebook_id), fields)
+
+    def notebook_counter_ops(self, counters: CounterDeltas, notebook_ids: Optional[Iterable[str]] = None) -> List[WriteOp]:
+        """Writes applying notebook counter increments, to queue with the transaction writes
+
+        With notebook_ids, notebooks no longer among them are skipped.
+        """
+        present = set(notebook_ids) if notebook_ids is not None else None
+        return [
+            self.write_op("notebooks", notebook_id, fields, kind="update")
+            for notebook_id, fields in counters.fields().items()
+            if present is None or notebook_id in present
+        ]
+
+    @traced("firebase.backfill_notebook_counters")
+    def backfill_notebook_counters(self, notebooks: List[Dict[str, Any]], transactions: List[Dict[str, Any]]) -> int:
+        """Store counters on notebooks created before they were maintained, from already loaded transactions"""
+        notebooks_ref = self.get_user_collection_ref("notebooks")
+        missing = [n for n in notebooks if n.get("id") and "transaction_count" not in n]
+        if not notebooks_ref or not (missing or self.zombie_notebooks):
+            return 0
+        
+        try:
+            # Documents resurrected by counter writes racing a delete are removed
+            zombies = sorted(self.zombie_notebooks)[:MAX_BATCH_WRITES - 1]
+            counters = list(recount(missing, transactions).items())[:MAX_BATCH_WRITES - 1 - len(zombies)]
+            batch = self.db.batch()
+            for notebook_id in zombies:
+                batch.delete(notebooks_ref.document(notebook_id))
+            for notebook_id, fields in counters:
+                batch.update(notebooks_ref.document(notebook_id), fields)
+            self._bump_version(batch, "notebooks")
+            self._commit(batch)
+            self.zombie_notebooks.difference_update(zombies)
+            return len(counters)
+        except Exception as e:
+            st.error(f"Error counting notebook transactions: {str(e)}")
+            return 0
+
+    @traced("firebase.fetch_data_version")
+    def fetch_data_version(self) -> Optional[Dict[str, Any]]:
+        """Read the user's data version: one small document that changes with every write"""
+        if not self.user_id:
+            return None
+        
+        try:
+            doc = self._call("fetch_data_version", lambda timeout: self._version_ref().get(retry=None, timeout=timeout))
+            if not doc.exists:
+                # Nothing has been written since versioning was introduced
+                return {"version": 0, "collections": {}, "updated_at": None}
+            version = doc.to_dict()
+            record_documents([version])
+            # The document's update time tells which background batches a load includes
+            return {"version": version.get("version", 0), "collections": version.get("collections", {}),
+                    "updated_at": doc.update_time}
+        except FirestoreUnavailable:
+            raise
+        except Exception as e:
+            st.error(f"Error fetching data version: {str(e)}")
             return None
-        return self.db.collection("users").document(st.session_state.user_id).collection(collection_name)
+
+    # Background writes
+    def write_op(self, collection_name: str, doc_id: Optional[str] = None, data: Optional[Dict[str, Any]] = None,
+                 kind: str = "set", merge: bool = False) -> WriteOp:
+        """Describe a write to one of the current user's documents; new documents get their ID here"""
+        if not self.user_id:
+            raise ValueError("User ID not set")
+        if doc_id is None:
+            doc_id = self.db.collection("users").document(self.user_id).collection(collection_name).document().id
+        if collection_name == "transactions":
+            data = with_typed_date(data or {})
+        return WriteOp(self.user_id, collection_name, doc_id, kind, data or {}, merge)
+
+    def submit_writes(self, ops: List[WriteOp], label: str) -> int:
+        """Queue writes to be committed together in the background"""
+        self.meter.check("write", label)
+        deletes = sum(1 for op in ops if op.kind == "delete")
+        self.meter.record(self.user_id, "write_queue", "write", len(ops) - deletes)
+        self.meter.record(self.user_id, "write_queue", "delete", deletes)
+        return get_write_queue(self.db).submit(ops, label, get_write_tracker())
 
     # Asset Management
+    @traced("firebase.fetch_assets")
     def fetch_assets(self) -> List[Dict[str, Any]]:
         """Fetch all assets for the current user"""
         if not self.user_id:
@@ -222,16 +371,21 @@ class FirebaseService:
             assets_ref = self.db.collection("users").document(self.user_id).collection("assets")
             assets = []
             
-            for doc in assets_ref.stream():
+            docs = self._call("fetch_assets", lambda timeout: list(assets_ref.stream(retry=None, timeout=timeout)))
+            for doc in docs:
                 asset = doc.to_dict()
                 asset["id"] = doc.id
                 assets.append(asset)
             
+            record_documents(assets)
             return sorted(assets, key=lambda x: x.get("name", ""))
+        except FirestoreUnavailable:
+            raise
         except Exception as e:
             st.error(f"Error fetching assets: {str(e)}")
             return []
 
+    @traced("firebase.add_asset")
     def add_asset(self, asset_data: Dict[str, Any]) -> Optional[str]:
         """Add a new asset"""
         if not self.user_id:
@@ -243,12 +397,14 @@ class FirebaseService:
             asset_data["updated_at"] = datetime.now()
             
             # Add the asset
-            doc_ref = self.db.collection("users").document(self.user_id).collection("assets").add(asset_data)
-            return doc_ref[1].id
+            doc_ref = self.db.collection("users").document(self.user_id).collection("assets").document()
+            self._commit_write("assets", lambda batch: batch.set(doc_ref, asset_data))
+            return doc_ref.id
         except Exception as e:
             st.error(f"Error adding asset: {str(e)}")
             return None
 
+    @traced("firebase.update_asset")
     def update_asset(self, asset_id: str, asset_data: Dict[str, Any]) -> bool:
         """Update an existing asset"""
         if not self.user_id:
@@ -259,42 +415,194 @@ class FirebaseService:
             asset_data["updated_at"] = datetime.now()
             
             # Update the asset
-            self.db.collection("users").document(self.user_id).collection("assets").document(asset_id).update(asset_data)
+            asset_ref = self.db.collection("users").document(self.user_id).collection("assets").document(asset_id)
+            self._commit_write("assets", lambda batch: batch.update(asset_ref, asset_data))
             return True
         except Exception as e:
             st.error(f"Error updating asset: {str(e)}")
             return False
 
+    @traced("firebase.delete_asset")
     def delete_asset(self, asset_id: str) -> bool:
         """Delete an asset"""
         if not self.user_id:
             return False
         
         try:
-            self.db.collection("users").document(self.user_id).collection("assets").document(asset_id).delete()
+            asset_ref = self.db.collection("users").document(self.user_id).collection("assets").document(asset_id)
+            self._commit_write("assets", lambda batch: batch.delete(asset_ref))
             return True
         except Exception as e:
             st.error(f"Error deleting asset: {str(e)}")
             return False
 
+    @traced("firebase.update_asset_values")
+    def update_asset_values(self, values: Dict[str, float]) -> bool:
+        """Write recomputed values for several assets in one batch"""
+        if not self.user_id:
+            return False
+        
+        try:
+            assets_ref = self.db.collection("users").document(self.user_id).collection("assets")
+            batch = self.db.batch()
+            for asset_id, value in values.items():
+                batch.update(assets_ref.document(asset_id), {"value": value, "updated_at": datetime.now()})
+            self._bump_version(batch, "assets")
+            self._commit(batch)
+            return True
+        except Exception as e:
+            st.error(f"Error updating asset values: {str(e)}")
+            return False
+
+    # Net Worth History
+    @traced("firebase.fetch_net_worth_chunks")
+    def fetch_net_worth_chunks(self, month_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch monthly net worth history chunks by month in one batched read"""
+        history_ref = self.get_user_collection_ref("net_worth_history")
+        if not history_ref or not month_ids:
+            return {}
+        
+        try:
+            refs = [history_ref.document(month_id) for month_id in month_ids]
+            docs = self._call("fetch_net_worth_chunks", lambda timeout: list(self.db.get_all(refs, retry=None, timeout=timeout)))
+            chunks = {doc.id: doc.to_dict() for doc in docs if doc.exists}
+            record_documents(list(chunks.values()))
+            return chunks
+        except FirestoreUnavailable:
+            raise
+        except Exception as e:
+            st.error(f"Error fetching net worth history: {str(e)}")
+            return {}
+
+    @traced("firebase.fetch_net_worth_chunk_before")
+    def fetch_net_worth_chunk_before(self, month_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch the latest history chunk older than a month"""
+        history_ref = self.get_user_collection_ref("net_worth_history")
+        if not history_ref:
+            return None
+        
+        try:
+            query = (
+                history_ref.where("month", "<", month_id)
+                .order_by("month", direction=firestore.Query.DESCENDING)
+                .limit(1)
+            )
+            for doc in self._call("fetch_net_worth_chunk_before", lambda timeout: list(query.stream(retry=None, timeout=timeout))):
+                chunk = doc.to_dict()
+                record_documents([chunk])
+                return chunk
+            return None
+        except FirestoreUnavailable:
+            raise
+        except Exception as e:
+            st.error(f"Error fetching net worth history: {str(e)}")
+            return None
+
+    @traced("firebase.update_net_worth_chunk")
+    def update_net_worth_chunk(self, month_id: str, build: Callable[[Optional[Dict[str, Any]]], Dict[str, Any]]) -> bool:
+        """Rebuild one monthly net worth history chunk from its stored version in a transaction
+
+        build receives the stored chunk (None when there is none) and returns the new one;
+        it may run more than once if another write to the chunk gets in first.
+        """
+        history_ref = self.get_user_collection_ref("net_worth_history")
+        if not history_ref:
+            return False
+        chunk_ref = history_ref.document(month_id)
+
+        @firestore.transactional
+        def rebuild(transaction, timeout: float):
+            snapshot = chunk_ref.get(transaction=transaction, timeout=timeout)
+            existing = snapshot.to_dict() if snapshot.exists else None
+            record_documents([existing] if existing else [])
+            chunk = build(existing)
+            chunk["updated_at"] = datetime.now()
+            transaction.set(chunk_ref, chunk)
+            transaction.set(self._version_ref(), version_bump(["net_worth_history"]), merge=True)
+
+        try:
+            self.meter.check("write", "update_net_worth_chunk")
+            # The version bump is an increment, so the commit is only retried when rejected outright
+            resilience.call(
+                "update_net_worth_chunk",
+                lambda timeout: rebuild(self.db.transaction(), timeout),
+                idempotent=False
+            )
+            self.meter.record(self.user_id, "update_net_worth_chunk", "read", 1)
+            self.meter.record(self.user_id, "update_net_worth_chunk", "write", 2)
+            self.write_count += 1
+            return True
+        except FirestoreUnavailable:
+            raise
+        except Exception as e:
+            st.error(f"Error saving net worth history: {str(e)}")
+            return False
+
     # Transaction Management
+    def _filter_dates(self, query, start_date=None, end_date=None):
+        """Add date bounds to a transactions query; returns the query and the date field to order by
+
+        A query on day silently drops transactions without one, so day is only used once a
+        verify pass of the typed_dates migration found every transaction migrated. Until
+        then the date string, which every transaction has, is compared as "YYYY-MM-DD".
+        """
+        if migration_verified(self.db, "typed_dates"):
+            field, bound = "day", day_ordinal
+        else:
+            field, bound = "date", iso_day
+        if start_date:
+            query = query.where(field, ">=", bound(start_date))
+        if end_date:
+            query = query.where(field, "<=", bound(end_date))
+        return query, field
+
+    @traced("firebase.fetch_transactions")
     def fetch_transactions(self, start_date=None, end_date=None, notebook_id=None) -> List[Dict[str, Any]]:
         """Fetch transactions for the current user with optional date and notebook filtering"""
         transactions_ref = self.get_user_collection_ref("transactions")
         if not transactions_ref:
             return []
         
-        query = transactions_ref
-        if start_date:
-            query = query.where("date", ">=", start_date)
-        if end_date:
-            query = query.where("date", "<=", end_date)
+        query, _ = self._filter_dates(transactions_ref, start_date, end_date)
         if notebook_id:
             query = query.where("notebook_id", "==", notebook_id)
         
-        transactions = query.stream()
-        return [{"id": doc.id, **doc.to_dict()} for doc in transactions]
+        docs = self._call("fetch_transactions", lambda timeout: list(query.stream(retry=None, timeout=timeout)))
+        transactions = [{"id": doc.id, **doc.to_dict()} for doc in docs]
+        # Documents the date migration has not reached yet get their day here, so nothing downstream parses dates
+        for transaction in transactions:
+            if "day" not in transaction:
+                transaction["day"] = day_ordinal(transaction.get("date"))
+        record_documents(transactions)
+        return transactions
+
+    def iter_transaction_pages(self, start_date=None, end_date=None, notebook_id=None,
+                               page_size: int = 500) -> Iterator[List[Dict[str, Any]]]:
+        """Yield the current user's transactions newest first, one query page at a time
+
+        Filters run in Firestore, and each page resumes after the last document of the
+        previous one, so only one page is held in memory.
+        """
+        query = self._get_user_collection("transactions")
+        if notebook_id:
+            query = query.where("notebook_id", "==", notebook_id)
+        query, date_field = self._filter_dates(query, start_date, end_date)
+        query = query.order_by(date_field, direction=firestore.Query.DESCENDING).limit(page_size)
+        
+        last = None
+        while True:
+            with span("firebase.transactions_page"):
+                page_query = query.start_after(last) if last else query
+                docs = self._call("transactions_page", lambda timeout: list(page_query.stream(retry=None, timeout=timeout)))
+                page = [{"id": doc.id, **doc.to_dict()} for doc in docs]
+                record_documents(page)
+            if page:
+                yield page
+            if len(docs) < page_size:
+                return
+            last = docs[-1]
 
+    @traced("firebase.add_transaction")
     def add_transaction(self, transaction_data: Dict[str, Any]) -> Optional[str]:
         """Add a new transaction"""
         transactions_ref = self.get_user_collection_ref("transactions")
@@ -308,16 +616,22 @@ class FirebaseService:
             else:  # expense
                 transaction_data["amount"] = -abs(transaction_data["amount"])
             
+            transaction_data.update(date_fields(transaction_data.get("date")))
             transaction_data["created_at"] = datetime.now()
             transaction_data["updated_at"] = datetime.now()
-            doc_ref = transactions_ref.add(transaction_data)
-            return doc_ref[1].id
+            doc_ref = transactions_ref.document()
+            counters = CounterDeltas()
+            counters.add(None, transaction_data)
+            self._commit_write("transactions", lambda batch: batch.set(doc_ref, transaction_data), counters)
+            return doc_ref.id
         except Exception as e:
             st.error(f"Error adding transaction: {str(e)}")
             return None
 
-    def update_transaction(self, transaction_id: str, transaction_data: Dict[str, Any]) -> bool:
-        """Update an existing transaction"""
+    @traced("firebase.update_transaction")
+    def update_transaction(self, transaction_id: str, transaction_data: Dict[str, Any],
+                           previous: Optional[Dict[str, Any]] = None) -> bool:
+        """Update an existing transaction; previous is the stored version, read here if not given"""
         transactions_ref = self.get_user_collection_ref("transactions")
         if not transactions_ref:
             return False
@@ -330,27 +644,120 @@ class FirebaseService:
                 else:  # expense
                     transaction_data["amount"] = -abs(transaction_data["amount"])
             
+            if "date" in transaction_data:
+                transaction_data.update(date_fields(transaction_data["date"]))
             transaction_data["updated_at"] = datetime.now()
-            transactions_ref.document(transaction_id).update(transaction_data)
+            doc_ref = transactions_ref.document(transaction_id)
+            if previous is None:
+                previous = self._call("fetch_transaction", lambda timeout: doc_ref.get(retry=None, timeout=timeout)).to_dict() or {}
+                record_documents([previous])
+            counters = CounterDeltas()
+            counters.add(previous, {**previous, **transaction_data})
+            self._commit_write("transactions", lambda batch: batch.update(doc_ref, transaction_data), counters)
             return True
         except Exception as e:
             st.error(f"Error updating transaction: {str(e)}")
             return False
 
-    def delete_transaction(self, transaction_id: str) -> bool:
-        """Delete a transaction"""
+    @traced("firebase.delete_transaction")
+    def delete_transaction(self, transaction_id: str, previous: Optional[Dict[str, Any]] = None) -> bool:
+        """Delete a transaction; previous is the stored version, read here if not given"""
         transactions_ref = self.get_user_collection_ref("transactions")
         if not transactions_ref:
             return False
         
         try:
-            transactions_ref.document(transaction_id).delete()
+            doc_ref = transactions_ref.document(transaction_id)
+            if previous is None:
+                previous = self._call("fetch_transaction", lambda timeout: doc_ref.get(retry=None, timeout=timeout)).to_dict()
+                record_documents([previous or {}])
+            counters = CounterDeltas()
+            counters.add(previous, None)
+            self._commit_write("transactions", lambda batch: batch.delete(doc_ref), counters)
             return True
         except Exception as e:
             st.error(f"Error deleting transaction: {str(e)}")
             return False
 
+    def _commit_chunked(self, count: int, writes, label: str,
+                        on_progress: Optional[Callable[[int, int], None]] = None) -> int:
+        """Commit transaction writes in batches of at most MAX_BATCH_WRITES, reporting progress after each
+
+        writes yields (write, before, after) with the transaction before and after the
+        write, so each batch also carries the notebook counter changes it implies.
+        Returns how many writes were committed; chunks already committed stay committed if a later one fails.
+        """
+        done = 0
+        try:
+            batch, in_batch, counters = self.db.batch(), 0, CounterDeltas()
+            for pending, (write, before, after) in enumerate(writes, start=1):
+                write(batch)
+                counters.add(before, after)
+                in_batch += 1
+                # Keep room for the next write, the two notebooks it may touch and the version bump
+                if in_batch + len(counters) + 4 > MAX_BATCH_WRITES or pending == count:
+                    self._apply_counters(batch, counters)
+                    self._bump_version(batch, "transactions", "notebooks")
+                    self._commit(batch)
+                    done = pending
+                    if on_progress:
+                        on_progress(done, count)
+                    batch, in_batch, counters = self.db.batch(), 0, CounterDeltas()
+        except Exception as e:
+            st.error(f"Error {label} after {done} of {count}: {str(e)}")
+        return done
+
+    @traced("firebase.bulk_update_transactions")
+    def bulk_update_transactions(self, updates: Dict[str, Dict[str, Any]],
+                                 on_progress: Optional[Callable[[int, int], None]] = None,
+                                 previous: Optional[Dict[str, Dict[str, Any]]] = None) -> int:
+        """Update many transactions, each with its own fields, in chunked batches
+
+        previous maps transaction IDs to their stored versions, for the notebook counters.
+        """
+        transactions_ref = self.get_user_collection_ref("transactions")
+        if not transactions_ref or not updates:
+            return 0
+        
+        now = datetime.now()
+        previous = previous or {}
+        writes = (
+            (
+                lambda batch, transaction_id=transaction_id, fields=fields: batch.update(
+                    transactions_ref.document(transaction_id), {**with_typed_date(fields), "updated_at": now}
+                ),
+                previous.get(transaction_id),
+                {**previous[transaction_id], **fields} if transaction_id in previous else None
+            )
+            for transaction_id, fields in updates.items()
+        )
+        return self._commit_chunked(len(updates), writes, "updating transactions", on_progress)
+
+    @traced("firebase.bulk_delete_transactions")
+    def bulk_delete_transactions(self, transaction_ids: List[str],
+                                 on_progress: Optional[Callable[[int, int], None]] = None,
+                                 previous: Optional[Dict[str, Dict[str, Any]]] = None) -> int:
+        """Delete many transactions in chunked batches
+
+        previous maps transaction IDs to their stored versions, for the notebook counters.
+        """
+        transactions_ref = self.get_user_collection_ref("transactions")
+        if not transactions_ref or not transaction_ids:
+            return 0
+        
+        previous = previous or {}
+        writes = (
+            (
+                lambda batch, transaction_id=transaction_id: batch.delete(transactions_ref.document(transaction_id)),
+                previous.get(transaction_id),
+                None
+            )
+            for transaction_id in transaction_ids
+        )
+        return self._commit_chunked(len(transaction_ids), writes, "deleting transactions", on_progress)
+
     # Budget Management
+    @traced("firebase.fetch_budgets")
     def fetch_budgets(self) -> Optional[Dict[str, Any]]:
         """Fetch budgets for the current user"""
         budgets_ref = self.get_user_collection_ref("budgets")
@@ -358,14 +765,19 @@ class FirebaseService:
             return None
         
         try:
-            budgets_doc = budgets_ref.document("current").get()
+            budgets_doc = self._call("fetch_budgets", lambda timeout: budgets_ref.document("current").get(retry=None, timeout=timeout))
             if budgets_doc.exists:
-                return budgets_doc.to_dict()
+                budgets = budgets_doc.to_dict()
+                record_documents([budgets])
+                return budgets
             return None
+        except FirestoreUnavailable:
+            raise
         except Exception as e:
             st.error(f"Error fetching budgets: {str(e)}")
             return None
 
+    @traced("firebase.update_budgets")
     def update_budgets(self, budget_data: Dict[str, Any]) -> bool:
         """Update budgets for the current user"""
         budgets_ref = self.get_user_collection_ref("budgets")
@@ -374,13 +786,14 @@ class FirebaseService:
         
         try:
             budget_data["updated_at"] = datetime.now()
-            budgets_ref.document("current").set(budget_data)
+            self._commit_write("budgets", lambda batch: batch.set(budgets_ref.document("current"), budget_data))
             return True
         except Exception as e:
             st.error(f"Error updating budgets: {str(e)}")
             return False
 
     # Category Management
+    @traced("firebase.fetch_categories")
     def fetch_categories(self) -> List[str]:
         """Fetch all categories for the current user"""
         categories_ref = self.get_user_collection_ref("categories")
@@ -388,14 +801,47 @@ class FirebaseService:
             return []
         
         try:
-            categories = categories_ref.document("current").get()
-            if categories.exists:
-                return categories.to_dict().get("categories", [])
-            return []
+            # Older accounts kept categories in metadata/categories; both documents
+            # are read in one round trip and merged, with categories/current first
+            refs = [categories_ref.document("current"), self.get_user_collection_ref("metadata").document("categories")]
+            found = self._call("fetch_categories", lambda timeout: list(self.db.get_all(refs, retry=None, timeout=timeout)))
+            docs = {doc.reference.path: doc.to_dict() for doc in found if doc.exists}
+            record_documents(list(docs.values()))
+            
+            categories = []
+            for ref in refs:
+                for category in docs.get(ref.path, {}).get("categories", []):
+                    if category not in categories:
+                        categories.append(category)
+            return categories
+        except FirestoreUnavailable:
+            raise
         except Exception as e:
             st.error(f"Error fetching categories: {str(e)}")
             return []
 
+    def category_append_op(self, categories: List[str]) -> WriteOp:
+        """Write appending categories atomically without rewriting the stored list"""
+        return self.write_op("categories", "current", {
+            "categories": firestore.ArrayUnion(list(categories)),
+            "updated_at": datetime.now()
+        }, merge=True)
+
+    @traced("firebase.add_categories")
+    def add_categories(self, categories: List[str]) -> bool:
+        """Append categories atomically without rewriting the stored list"""
+        if not self.user_id or not categories:
+            return False
+        
+        try:
+            op = self.category_append_op(categories)
+            self._commit_write("categories", lambda batch: batch.set(op.reference(self.db), op.data, merge=True))
+            return True
+        except Exception as e:
+            st.error(f"Error adding categories: {str(e)}")
+            return False
+
+    @traced("firebase.update_categories")
     def update_categories(self, categories: List[str]) -> bool:
         """Update categories for the current user"""
         categories_ref = self.get_user_collection_ref("categories")
@@ -403,25 +849,69 @@ class FirebaseService:
             return False
         
         try:
-            categories_ref.document("current").set({
+            self._commit_write("categories", lambda batch: batch.set(categories_ref.document("current"), {
                 "categories": list(set(categories)),  # Ensure unique categories
                 "updated_at": datetime.now()
-            })
+            }))
             return True
         except Exception as e:
             st.error(f"Error updating categories: {str(e)}")
             return False
 
+    @traced("firebase.fetch_categorization_rules")
+    def fetch_categorization_rules(self) -> List[Dict[str, Any]]:
+        """Fetch the user's auto-categorization rules in priority order"""
+        categories_ref = self.get_user_collection_ref("categories")
+        if not categories_ref:
+            return []
+        
+        try:
+            rules = self._call("fetch_categorization_rules", lambda timeout: categories_ref.document("rules").get(retry=None, timeout=timeout))
+            if rules.exists:
+                rules_data = rules.to_dict()
+                record_documents([rules_data])
+                return rules_data.get("rules", [])
+            return []
+        except FirestoreUnavailable:
+            raise
+        except Exception as e:
+            st.error(f"Error fetching categorization rules: {str(e)}")
+            return []
+
+    @traced("firebase.save_categorization_rules")
+    def save_categorization_rules(self, rules: List[Dict[str, Any]]) -> bool:
+        """Replace the user's auto-categorization rules"""
+        categories_ref = self.get_user_collection_ref("categories")
+        if not categories_ref:
+            return False
+        
+        try:
+            self._commit_write("categories", lambda batch: batch.set(categories_ref.document("rules"), {
+                "rules": rules,
+                "updated_at": datetime.now()
+            }))
+            return True
+        except Exception as e:
+            st.error(f"Error saving categorization rules: {str(e)}")
+            return False
+
     # Notebook Management
+    @traced("firebase.fetch_notebooks")
     def fetch_notebooks(self) -> List[Dict[str, Any]]:
         """Fetch all notebooks for the current user"""
         notebooks_ref = self.get_user_collection_ref("notebooks")
         if not notebooks_ref:
             return []
         
-        notebooks = notebooks_ref.stream()
-        return [{"id": doc.id, **doc.to_dict()} for doc in notebooks]
+        docs = self._call("fetch_notebooks", lambda timeout: list(notebooks_ref.stream(retry=None, timeout=timeout)))
+        notebooks = [{"id": doc.id, **doc.to_dict()} for doc in docs]
+        record_documents(notebooks)
+        # Counter writes from before they used update could race a notebook delete and
+        # leave a document with counters only; those are hidden until the backfill removes them
+        self.zombie_notebooks = {n["id"] for n in notebooks if "name" not in n}
+        return [n for n in notebooks if "name" in n]
 
+    @traced("firebase.add_notebook")
     def add_notebook(self, notebook_data: Dict[str, Any]) -> Optional[str]:
         """Add a new notebook"""
         notebooks_ref = self.get_user_collection_ref("notebooks")
@@ -429,14 +919,17 @@ class FirebaseService:
             return None
         
         try:
+            notebook_data = {**empty_counters(), **notebook_data}
             notebook_data["created_at"] = datetime.now()
             notebook_data["updated_at"] = datetime.now()
-            doc_ref = notebooks_ref.add(notebook_data)
-            return doc_ref[1].id
+            doc_ref = notebooks_ref.document()
+            self._commit_write("notebooks", lambda batch: batch.set(doc_ref, notebook_data))
+            return doc_ref.id
         except Exception as e:
             st.error(f"Error adding notebook: {str(e)}")
             return None
 
+    @traced("firebase.update_notebook")
     def update_notebook(self, notebook_id: str, notebook_data: Dict[str, Any]) -> bool:
         """Update an existing notebook"""
         notebooks_ref = self.get_user_collection_ref("notebooks")
@@ -445,12 +938,13 @@ class FirebaseService:
         
         try:
             notebook_data["updated_at"] = datetime.now()
-            notebooks_ref.document(notebook_id).update(notebook_data)
+            self._commit_write("notebooks", lambda batch: batch.update(notebooks_ref.document(notebook_id), notebook_data))
             return True
         except Exception as e:
             st.error(f"Error updating notebook: {str(e)}")
             return False
 
+    @traced("firebase.delete_notebook")
     def delete_notebook(self, notebook_id: str) -> bool:
         """Delete a notebook and all its transactions"""
         notebooks_ref = self.get_user_collection_ref("notebooks")
@@ -468,17 +962,21 @@ class FirebaseService:
             # Delete all transactions in this notebook
             transactions_ref = self.get_user_collection_ref("transactions")
             if transactions_ref:
-                transactions = transactions_ref.where("notebook_id", "==", notebook_id).stream()
+                query = transactions_ref.where("notebook_id", "==", notebook_id)
+                transactions = self._call("fetch_notebook_transactions", lambda timeout: list(query.stream(retry=None, timeout=timeout)))
+                record_documents([transaction.to_dict() for transaction in transactions])
                 for transaction in transactions:
                     batch.delete(transaction.reference)
             
             # Commit the batch
-            batch.commit()
+            self._bump_version(batch, "notebooks", "transactions")
+            self._commit(batch)
             return True
         except Exception as e:
             st.error(f"Error deleting notebook: {str(e)}")
             return False
 
+    @traced("firebase.get_notebook_summary")
     def get_notebook_summary(self, notebook_id: str, start_date=None, end_date=None) -> Dict[str, Any]:
         """Get summary statistics for a notebook"""
         transactions = self.fetch_transactions(start_date, end_date, notebook_id)
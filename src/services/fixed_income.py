@@ -0,0 +1,113 @@
+from datetime import date, datetime
+from typing import List, Dict, Any, Optional
+
+from ..utils.lazy import lazy_import
+from ..utils.profiling import traced
+
+pd = lazy_import("pandas")
+np = lazy_import("numpy")
+
+
+def is_cd(asset: Dict[str, Any]) -> bool:
+    """Return True if an asset has the fields needed for a CD projection"""
+    return bool(asset.get("interest_rate") is not None and asset.get("maturity_date"))
+
+
+def _to_ordinal(value: Any, default: date) -> int:
+    """Day ordinal of a date, datetime or ISO date string"""
+    if isinstance(value, datetime):
+        return value.date().toordinal()
+    if isinstance(value, date):
+        return value.toordinal()
+    if isinstance(value, str) and value:
+        return date.fromisoformat(value[:10]).toordinal()
+    return default.toordinal()
+
+
+class CDArrays:
+    """Column arrays describing every CD of a portfolio"""
+
+    def __init__(self, assets: List[Dict[str, Any]], today: date):
+        cds = [a for a in assets if is_cd(a)]
+        self.ids = [a.get("id") for a in cds]
+        self.names = [a.get("name", "") for a in cds]
+        self.principal = np.array([float(a.get("value", 0) or 0) for a in cds], dtype=float)
+        # Rates are annual percentage yields, e.g. 4.5 for 4.5%
+        self.rate = np.array([float(a["interest_rate"]) / 100 for a in cds], dtype=float)
+        self.opened = np.array(
+            [_to_ordinal(a.get("opened_date") or a.get("created_at"), today) for a in cds],
+            dtype=np.int64
+        )
+        self.maturity = np.array([_to_ordinal(a["maturity_date"], today) for a in cds], dtype=np.int64)
+        self.maturity = np.maximum(self.maturity, self.opened)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def value_on(self, day_ordinals) -> Any:
+        """Value of every CD on each given day; shape (cds, days)"""
+        days = np.atleast_1d(np.asarray(day_ordinals, dtype=np.int64))
+        elapsed = np.clip(days[None, :], self.opened[:, None], self.maturity[:, None]) - self.opened[:, None]
+        return self.principal[:, None] * np.power(1 + self.rate[:, None], elapsed / 365.0)
+
+
+@traced("fixed_income.project_cds")
+def project_cds(assets: List[Dict[str, Any]], today: Optional[date] = None):
+    """Accrued value, value at maturity and days left for every CD"""
+    today = today or date.today()
+    cds = CDArrays(assets, today)
+    if not len(cds):
+        return pd.DataFrame(columns=["id", "name", "principal", "rate", "opened", "maturity",
+                                     "accrued_value", "maturity_value", "days_to_maturity"])
+
+    accrued = cds.value_on([today.toordinal()])[:, 0]
+    at_maturity = cds.principal * np.power(1 + cds.rate, (cds.maturity - cds.opened) / 365.0)
+    return pd.DataFrame({
+        "id": cds.ids,
+        "name": cds.names,
+        "principal": cds.principal,
+        "rate": cds.rate * 100,
+        "opened": [date.fromordinal(int(d)) for d in cds.opened],
+        "maturity": [date.fromordinal(int(d)) for d in cds.maturity],
+        "accrued_value": accrued.round(2),
+        "maturity_value": at_maturity.round(2),
+        "days_to_maturity": np.maximum(cds.maturity - today.toordinal(), 0)
+    })
+
+
+@traced("fixed_income.maturity_ladder")
+def maturity_ladder(assets: List[Dict[str, Any]], today: Optional[date] = None):
+    """Month-by-month projected CD value and cash maturing, from now to the last maturity"""
+    today = today or date.today()
+    cds = CDArrays(assets, today)
+    if not len(cds):
+        return pd.DataFrame(columns=["month", "value", "maturing"])
+
+    last_maturity = date.fromordinal(int(max(cds.maturity.max(), today.toordinal())))
+    months = pd.period_range(start=today, end=last_maturity, freq="M")
+    month_ordinals = np.array([p.end_time.date().toordinal() for p in months], dtype=np.int64)
+
+    values = cds.value_on(month_ordinals)
+    # Cash out of a CD lands in the month it matures
+    at_maturity = cds.principal * np.power(1 + cds.rate, (cds.maturity - cds.opened) / 365.0)
+    month_index = np.searchsorted(month_ordinals, cds.maturity)
+    maturing = np.zeros(len(month_ordinals))
+    in_range = (month_index < len(month_ordinals)) & (cds.maturity >= today.toordinal())
+    np.add.at(maturing, month_index[in_range], at_maturity[in_range])
+
+    return pd.DataFrame({
+        "month": months.astype(str),
+        "value": values.sum(axis=0).round(2),
+        "maturing": maturing.round(2)
+    })
+
+
+def current_values(assets: List[Dict[str, Any]], today: Optional[date] = None) -> Dict[str, float]:
+    """Today's value of every asset, using accrued value for CDs"""
+    today = today or date.today()
+    values = {a["id"]: float(a.get("value", 0) or 0) for a in assets if a.get("id")}
+    cds = CDArrays(assets, today)
+    if len(cds):
+        accrued = cds.value_on([today.toordinal()])[:, 0]
+        values.update({asset_id: round(float(v), 2) for asset_id, v in zip(cds.ids, accrued) if asset_id})
+    return values
@@ -0,0 +1,175 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+from typing import List, Dict, Any, Optional, Tuple
+
+from ..utils.dates import days_to_datetimes, transaction_day
+from ..utils.lazy import lazy_import
+from ..utils.metrics import REGISTRY
+from ..utils.profiling import traced
+
+pd = lazy_import("pandas")
+np = lazy_import("numpy")
+
+FORECAST_WORKERS = int(os.environ.get("FORECAST_WORKERS", "2"))
+FORECAST_CACHE_USERS = int(os.environ.get("FORECAST_CACHE_USERS", "256"))
+# How often a page waiting on a background fit checks whether it finished
+FORECAST_POLL_SECONDS = float(os.environ.get("FORECAST_POLL_SECONDS", "2"))
+
+# Series name used for earnings in the monthly rollup; every other series is an expense category
+EARNINGS_KEY = "_earnings"
+MIN_HISTORY_MONTHS = 3
+# Seasonal indexes need two full years to be more than noise
+SEASONAL_HISTORY_MONTHS = 24
+# Trend damping, so long horizons do not extrapolate a short-lived trend forever
+DAMPING = 0.9
+ALPHAS = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9]
+BETAS = [0.0, 0.05, 0.1, 0.2]
+
+_fits = REGISTRY.counter(
+    "finance_tracker_forecast_fits",
+    "Background forecast model fits",
+    ["result"]
+)
+
+
+def monthly_rollup(transactions: List[Dict[str, Any]], today: Optional[date] = None):
+    """Earnings and per-category expenses for every complete month, one column per series"""
+    today = today or date.today()
+    df = pd.DataFrame(
+        [(transaction_day(t), t.get("category", ""), t.get("amount", 0)) for t in transactions],
+        columns=["ordinal", "category", "amount"]
+    )
+    df["month"] = days_to_datetimes(df["ordinal"]).dt.to_period("M")
+    df = df[df["month"].notna()]
+    current = pd.Period(today, freq="M")
+    # The current month is still incomplete and would drag every level down
+    df = df[df["month"] < current]
+    if df.empty:
+        return pd.DataFrame()
+
+    df["series"] = np.where(df["amount"] > 0, EARNINGS_KEY, df["category"])
+    df["amount"] = df["amount"].abs()
+    rollup = df.pivot_table(index="month", columns="series", values="amount", aggfunc="sum", fill_value=0.0)
+    return rollup.reindex(pd.period_range(rollup.index.min(), current - 1, freq="M"), fill_value=0.0)
+
+
+def rollup_key(rollup) -> str:
+    """Version of a rollup; a model fitted to the same rollup never needs refitting"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update("|".join(map(str, rollup.columns)).encode("utf-8"))
+    digest.update("|".join(map(str, rollup.index)).encode("utf-8"))
+    digest.update(rollup.to_numpy(dtype=float).tobytes())
+    return digest.hexdigest()
+
+
+@dataclass
+class ForecastModel:
+    """Fitted damped-trend exponential smoothing parameters for every series of a user"""
+    series: List[str]
+    last_month: str
+    level: Any
+    trend: Any
+    seasonal: Any
+    alpha: Any
+    beta: Any
+
+    def predict(self, horizon: int):
+        """Forecast every series for the next months; rows are months, columns are series"""
+        steps = np.arange(1, horizon + 1)
+        damped = np.cumsum(DAMPING ** steps)
+        months = pd.period_range(pd.Period(self.last_month, freq="M") + 1, periods=horizon, freq="M")
+        seasonal = self.seasonal[:, months.month.to_numpy() - 1]
+        values = self.level[:, None] + self.trend[:, None] * damped[None, :] + seasonal
+        return pd.DataFrame(np.maximum(values, 0).T.round(2), index=months.astype(str), columns=self.series)
+
+
+@traced("forecast.fit_model")
+def fit_model(rollup) -> ForecastModel:
+    """Fit every series at once, choosing smoothing parameters by one-step-ahead error"""
+    values = rollup.to_numpy(dtype=float).T
+    series_count, months = values.shape
+    month_of_year = rollup.index.month.to_numpy() - 1
+
+    seasonal = np.zeros((series_count, 12))
+    if months >= SEASONAL_HISTORY_MONTHS:
+        centered = values - values.mean(axis=1, keepdims=True)
+        for month in range(12):
+            seasonal[:, month] = centered[:, month_of_year == month].mean(axis=1)
+    adjusted = values - seasonal[:, month_of_year]
+
+    # Every (alpha, beta) pair is evaluated side by side for every series
+    alpha, beta = (grid.ravel() for grid in np.meshgrid(ALPHAS, BETAS))
+    level = np.repeat(adjusted[:, :1], len(alpha), axis=1)
+    trend = np.zeros_like(level)
+    sse = np.zeros_like(level)
+    for t in range(1, months):
+        predicted = level + DAMPING * trend
+        error = adjusted[:, t:t + 1] - predicted
+        sse += error ** 2
+        level = predicted + alpha * error
+        trend = DAMPING * trend + alpha * beta * error
+
+    best = sse.argmin(axis=1)
+    rows = np.arange(series_count)
+    return ForecastModel(
+        series=[str(c) for c in rollup.columns],
+        last_month=str(rollup.index[-1]),
+        level=level[rows, best],
+        trend=trend[rows, best],
+        seasonal=seasonal,
+        alpha=alpha[best],
+        beta=beta[best]
+    )
+
+
+class ForecastCache:
+    """Fitted models per user and rollup version, refitted by a background worker pool"""
+
+    def __init__(self, max_users: int = FORECAST_CACHE_USERS, workers: int = FORECAST_WORKERS):
+        self.max_users = max_users
+        self._models: "OrderedDict[str, Tuple[str, ForecastModel]]" = OrderedDict()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="forecast")
+
+    def get(self, user_id: str, rollup) -> Tuple[Optional[ForecastModel], bool]:
+        """Get the user's model and whether it matches the rollup; stale models are refitted in the background"""
+        key = rollup_key(rollup)
+        with self._lock:
+            cached = self._models.get(user_id)
+            if cached:
+                self._models.move_to_end(user_id)
+                if cached[0] == key:
+                    return cached[1], True
+            if (user_id, key) not in self._pending:
+                self._pending.add((user_id, key))
+                self._executor.submit(self._fit, user_id, key, rollup)
+        return (cached[1] if cached else None), False
+
+    def _fit(self, user_id: str, key: str, rollup):
+        try:
+            model = fit_model(rollup)
+            with self._lock:
+                self._models[user_id] = (key, model)
+                self._models.move_to_end(user_id)
+                while len(self._models) > self.max_users:
+                    self._models.popitem(last=False)
+            _fits.inc(result="ok")
+        except Exception:
+            _fits.inc(result="error")
+        finally:
+            with self._lock:
+                self._pending.discard((user_id, key))
+
+
+_forecast_cache = ForecastCache()
+
+
+def get_forecast(user_id: str, rollup) -> Tuple[Optional[ForecastModel], bool]:
+    """Get a user's forecast model without blocking on a fit"""
+    return _forecast_cache.get(user_id, rollup)
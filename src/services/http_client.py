@@ -0,0 +1,71 @@
+import os
+import threading
+
+# Timeouts are in seconds; every request made through the shared session gets
+# them unless the caller passes its own
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("AUTH_HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.environ.get("AUTH_HTTP_READ_TIMEOUT", "10"))
+HTTP_RETRIES = int(os.environ.get("AUTH_HTTP_RETRIES", "3"))
+HTTP_BACKOFF_FACTOR = float(os.environ.get("AUTH_HTTP_BACKOFF", "0.3"))
+HTTP_POOL_SIZE = int(os.environ.get("AUTH_HTTP_POOL_SIZE", "10"))
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# A POST is resent only when the answer says it was not processed
+POST_RETRY_STATUSES = (429, 503)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _build_session():
+    """Create a keep-alive session with pooled connections, retries and default timeouts"""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    class _TimeoutAdapter(HTTPAdapter):
+        """HTTP adapter that never sends a request without a timeout"""
+
+        def send(self, request, **kwargs):
+            if kwargs.get("timeout") is None:
+                kwargs["timeout"] = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+            return super().send(request, **kwargs)
+
+    class _Retry(Retry):
+        """Retry that resends a POST on connect errors and 429/503 answers only"""
+
+        def is_retry(self, method, status_code, has_retry_after=False):
+            if method.upper() == "POST" and status_code not in POST_RETRY_STATUSES:
+                return False
+            return super().is_retry(method, status_code, has_retry_after)
+
+    # Only connection failures and throttling/5xx answers are retried; a read
+    # timeout may mean the server already acted on a non-idempotent call, and
+    # other 5xx answers to a POST (e.g. signUp) may have come after it did
+    retry = _Retry(
+        total=HTTP_RETRIES,
+        connect=HTTP_RETRIES,
+        read=0,
+        status=HTTP_RETRIES,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(["GET", "POST"]),
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = _TimeoutAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_http_session():
+    """Get the process-wide HTTP session shared by the auth REST calls"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
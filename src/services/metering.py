@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Dict, Optional, Tuple
+
+from .resilience import FirestoreUnavailable
+from ..utils.metrics import REGISTRY
+
+# Documents a session may read or write per rolling minute; 0 turns a limit off.
+# Past the soft limit the dashboard serves cached data, past the hard limit calls are refused.
+SOFT_READS_PER_MINUTE = int(os.environ.get("FIRESTORE_SOFT_READS_PER_MINUTE", "2000"))
+HARD_READS_PER_MINUTE = int(os.environ.get("FIRESTORE_HARD_READS_PER_MINUTE", "10000"))
+SOFT_WRITES_PER_MINUTE = int(os.environ.get("FIRESTORE_SOFT_WRITES_PER_MINUTE", "500"))
+HARD_WRITES_PER_MINUTE = int(os.environ.get("FIRESTORE_HARD_WRITES_PER_MINUTE", "2000"))
+WINDOW_SECONDS = 60
+
+_documents = REGISTRY.counter(
+    "finance_tracker_firestore_documents",
+    "Firestore documents read, written and deleted",
+    ["kind", "operation", "user"]
+)
+_quota_events = REGISTRY.counter(
+    "finance_tracker_firestore_quota_events",
+    "Firestore calls made past a session's soft quota or refused at its hard quota",
+    ["level", "kind"]
+)
+
+
+class QuotaExceeded(FirestoreUnavailable):
+    """A session used up its hard Firestore quota; callers fall back like during an outage"""
+
+
+def documents_read(result: Any) -> int:
+    """Billed reads for a call result: one per document, and one for a query with no results"""
+    if isinstance(result, list):
+        return max(len(result), 1)
+    return 1
+
+
+def batch_writes(batch) -> Tuple[int, int]:
+    """Writes and deletes queued in a Firestore batch"""
+    pbs = getattr(batch, "_write_pbs", None) or []
+    deletes = sum(1 for pb in pbs if getattr(pb, "delete", ""))
+    return len(pbs) - deletes, deletes
+
+
+class UsageMeter:
+    """Firestore documents used by one session, in total and over the last minute"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.totals: Counter = Counter()
+        self._window: "deque[Tuple[float, str, int]]" = deque()
+        self._recent: Counter = Counter()
+
+    def record(self, user_id: Optional[str], operation: str, kind: str, count: int):
+        """Count documents of a kind ("read", "write" or "delete") used by an operation"""
+        if count <= 0:
+            return
+        _documents.inc(count, kind=kind, operation=operation, user=user_id or "")
+        now = time.monotonic()
+        # Deletes are billed as writes, so they count towards the write quota
+        quota_kind = "read" if kind == "read" else "write"
+        with self._lock:
+            self.totals[(operation, kind)] += count
+            self._window.append((now, quota_kind, count))
+            self._recent[quota_kind] += count
+            self._expire(now)
+
+    def _expire(self, now: float):
+        while self._window and now - self._window[0][0] > WINDOW_SECONDS:
+            _, kind, count = self._window.popleft()
+            self._recent[kind] -= count
+
+    def per_minute(self, kind: str) -> int:
+        """Reads or writes over the last minute"""
+        with self._lock:
+            self._expire(time.monotonic())
+            return self._recent[kind]
+
+    def level(self, kind: str = "read") -> str:
+        """"ok", "soft" or "hard" for reads or writes"""
+        soft, hard = (
+            (SOFT_READS_PER_MINUTE, HARD_READS_PER_MINUTE) if kind == "read"
+            else (SOFT_WRITES_PER_MINUTE, HARD_WRITES_PER_MINUTE)
+        )
+        used = self.per_minute(kind)
+        if hard and used >= hard:
+            return "hard"
+        if soft and used >= soft:
+            return "soft"
+        return "ok"
+
+    @property
+    def degraded(self) -> bool:
+        """Past the soft read quota: serve cached data instead of reading"""
+        return self.level("read") != "ok"
+
+    def check(self, kind: str, operation: str):
+        """Refuse a call past the hard quota"""
+        level = self.level(kind)
+        if level == "ok":
+            return
+        _quota_events.inc(level=level, kind=kind)
+        if level == "hard":
+            raise QuotaExceeded(f"{operation} refused: too many Firestore {kind}s from this session, try again in a minute")
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        """Documents used per operation and kind"""
+        with self._lock:
+            table: Dict[str, Dict[str, int]] = {}
+            for (operation, kind), count in self.totals.items():
+                table.setdefault(operation, {})[kind] = count
+            return table
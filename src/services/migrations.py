@@ -0,0 +1,413 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from . import resilience
+from .write_queue import MAX_BATCH_WRITES, WriteOp, db_version_ref, version_bump
+from ..utils.dates import date_fields
+from ..utils.lazy import lazy_import
+from ..utils.metrics import REGISTRY
+
+firestore = lazy_import("firebase_admin.firestore")
+
+# Documents read per page; each page's writes are committed before the next page is read
+MIGRATION_PAGE_SIZE = int(os.environ.get("MIGRATION_PAGE_SIZE", "300"))
+MIGRATION_WORKERS = int(os.environ.get("MIGRATION_WORKERS", "8"))
+# Ranges of the collection group walked in parallel; more than workers evens out skew
+MIGRATION_PARTITIONS = int(os.environ.get("MIGRATION_PARTITIONS", "32"))
+# Writes per second across all workers; 0 for no limit
+MIGRATION_WRITES_PER_SECOND = float(os.environ.get("MIGRATION_WRITES_PER_SECOND", "500"))
+
+MODES = ("dry-run", "apply", "verify")
+
+# How often the app rereads a migration marker that is not verified yet, in seconds
+MIGRATION_MARKER_RECHECK_SECONDS = float(os.environ.get("MIGRATION_MARKER_RECHECK_SECONDS", "600"))
+
+_documents = REGISTRY.counter(
+    "finance_tracker_migration_documents",
+    "Documents visited by schema migrations",
+    ["migration", "mode", "result"]
+)
+
+
+@dataclass
+class Migration:
+    """A rewrite of every user's documents in one collection
+
+    plan receives a document's user ID, ID and data and returns the writes that bring
+    it up to date, or nothing when it already is; running it twice must be harmless.
+    verify reports whether a document is up to date, by default when plan has nothing to do.
+    """
+    name: str
+    collection: str
+    description: str
+    plan: Callable[[str, str, Dict[str, Any]], List[WriteOp]]
+    verify: Optional[Callable[[str, str, Dict[str, Any]], bool]] = None
+    # Collections whose data version is bumped for touched users, so sessions reload what was rewritten
+    bump_collections: Tuple[str, ...] = ()
+
+    def is_current(self, user_id: str, doc_id: str, data: Dict[str, Any]) -> bool:
+        if self.verify:
+            return self.verify(user_id, doc_id, data)
+        return not self.plan(user_id, doc_id, data)
+
+
+MIGRATIONS: Dict[str, Migration] = {}
+
+
+def register(migration: Migration) -> Migration:
+    MIGRATIONS[migration.name] = migration
+    return migration
+
+
+class RateLimiter:
+    """Token bucket shared by all workers, refilled at a fixed number of writes per second"""
+
+    def __init__(self, per_second: float):
+        self.per_second = per_second
+        self._tokens = per_second
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, count: int):
+        if self.per_second <= 0 or count <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.per_second, self._tokens + (now - self._updated) * self.per_second)
+            self._updated = now
+            self._tokens -= count
+            # Callers queue behind the lock, so one sleep pays off the debt in order
+            if self._tokens < 0:
+                time.sleep(-self._tokens / self.per_second)
+
+
+def marker_ref(db, name: str):
+    """Reference to the migrations/{name} document recording the last complete verify pass"""
+    return db.collection("migrations").document(name)
+
+
+_markers: Dict[str, Tuple[bool, float]] = {}
+_markers_lock = threading.Lock()
+
+
+def migration_verified(db, name: str) -> bool:
+    """Whether the last complete verify pass of a migration found every document migrated
+
+    Read once per process once verified, and at most every MIGRATION_MARKER_RECHECK_SECONDS
+    before that; an unreadable marker counts as not verified.
+    """
+    with _markers_lock:
+        cached = _markers.get(name)
+    if cached and (cached[0] or time.monotonic() - cached[1] < MIGRATION_MARKER_RECHECK_SECONDS):
+        return cached[0]
+    try:
+        doc = resilience.call("migration.marker", lambda timeout: marker_ref(db, name).get(retry=None, timeout=timeout))
+        verified = bool(doc.exists and (doc.to_dict() or {}).get("verified"))
+    except Exception:
+        verified = False
+    with _markers_lock:
+        _markers[name] = (verified, time.monotonic())
+    return verified
+
+
+def _cursor_path(cursor: Any) -> Optional[str]:
+    """Document path of a partition cursor, to store it in the checkpoint"""
+    if cursor is None:
+        return None
+    if isinstance(cursor, dict):
+        cursor = next(iter(cursor.values()), None)
+    elif isinstance(cursor, (list, tuple)):
+        cursor = cursor[0] if cursor else None
+    path = getattr(cursor, "path", cursor)
+    return path if isinstance(path, str) else None
+
+
+def _user_of(path: str) -> Optional[str]:
+    """User ID of a users/{uid}/{collection}/{doc} path; None for documents outside users/*"""
+    parts = path.split("/")
+    return parts[1] if len(parts) == 4 and parts[0] == "users" else None
+
+
+class Checkpoint:
+    """Partitions of a run and how far each got, saved after every page so a rerun resumes where it stopped"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.partitions: List[Dict[str, Any]] = []
+        if os.path.exists(path):
+            with open(path) as f:
+                self.partitions = json.load(f).get("partitions", [])
+
+    def start(self, bounds: List[tuple]):
+        self.partitions = [
+            {"start": start, "end": end, "after": None, "done": False,
+             "scanned": 0, "changed": 0, "writes": 0, "stale": 0}
+            for start, end in bounds
+        ]
+        self.save()
+
+    def save(self):
+        with self._lock:
+            # Write then rename, so a crash never leaves a half-written checkpoint
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({"partitions": self.partitions, "saved_at": datetime.now().isoformat()}, f)
+            os.replace(tmp, self.path)
+
+    def totals(self) -> Dict[str, int]:
+        keys = ("scanned", "changed", "writes", "stale")
+        totals = {key: sum(p[key] for p in self.partitions) for key in keys}
+        totals["partitions"] = len(self.partitions)
+        totals["done"] = sum(1 for p in self.partitions if p["done"])
+        return totals
+
+
+class MigrationRunner:
+    """Walks a migration's collection across all users in parallel, checkpointed ranges
+
+    The collection group is split into document ID ranges with a partition query; each
+    worker pages through one range in document ID order, plans each page's writes and
+    commits them in batches, under a shared write rate limit. In dry-run mode writes are
+    only counted; in verify mode documents that are not up to date are counted as stale.
+    """
+
+    def __init__(self, db, migration: Migration, mode: str = "dry-run", checkpoint_path: Optional[str] = None,
+                 user_id: Optional[str] = None, workers: int = MIGRATION_WORKERS,
+                 partitions: int = MIGRATION_PARTITIONS, writes_per_second: float = MIGRATION_WRITES_PER_SECOND,
+                 page_size: int = MIGRATION_PAGE_SIZE, time_limit: Optional[float] = None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode {mode}; expected one of {', '.join(MODES)}")
+        self.db = db
+        self.migration = migration
+        self.mode = mode
+        self.user_id = user_id
+        self.workers = workers
+        self.partition_count = partitions
+        self.page_size = min(page_size, MAX_BATCH_WRITES)
+        self.limiter = RateLimiter(writes_per_second)
+        self.checkpoint = Checkpoint(checkpoint_path or f"migration-{migration.name}-{mode}.json")
+        self.stale_examples: List[str] = []
+        self._deadline = time.monotonic() + time_limit if time_limit else None
+
+    def _base_query(self):
+        if self.user_id:
+            return self.db.collection("users").document(self.user_id).collection(self.migration.collection)
+        return self.db.collection_group(self.migration.collection)
+
+    def _partition_bounds(self) -> List[tuple]:
+        """Document ID ranges to walk in parallel; a single user's collection is one range"""
+        if self.user_id or self.partition_count <= 1:
+            return [(None, None)]
+        partitions = resilience.call(
+            "migration.partition",
+            lambda timeout: list(self._base_query().get_partitions(self.partition_count, retry=None, timeout=timeout))
+        )
+        return [(_cursor_path(p.start_at), _cursor_path(p.end_at)) for p in partitions] or [(None, None)]
+
+    def _range_query(self, partition: Dict[str, Any]):
+        query = self._base_query().order_by("__name__")
+        if partition["after"]:
+            query = query.start_after({"__name__": self.db.document(partition["after"])})
+        elif partition["start"]:
+            query = query.start_at({"__name__": self.db.document(partition["start"])})
+        if partition["end"]:
+            query = query.end_before({"__name__": self.db.document(partition["end"])})
+        return query.limit(self.page_size)
+
+    def _commit(self, ops: List[WriteOp]):
+        """Commit planned writes in batches, each with the version bump of the users it touches"""
+        batch, size, users = self.db.batch(), 0, set()
+        for index, op in enumerate(ops):
+            ref = op.reference(self.db)
+            if op.kind == "delete":
+                batch.delete(ref)
+            elif op.kind == "update":
+                batch.update(ref, op.data)
+            else:
+                batch.set(ref, op.data, merge=op.merge)
+            size += 1
+            users.add(op.user_id)
+            # Room for the next write and a version bump for every user so far
+            if index == len(ops) - 1 or size + len(users) + 2 > MAX_BATCH_WRITES:
+                if self.migration.bump_collections:
+                    for user_id in users:
+                        batch.set(db_version_ref(self.db, user_id), version_bump(self.migration.bump_collections), merge=True)
+                self.limiter.acquire(size)
+                # Version bumps are increments, so those batches are only resent when rejected outright
+                resilience.call("migration.commit", lambda timeout, batch=batch: batch.commit(retry=None, timeout=timeout),
+                                idempotent=not self.migration.bump_collections)
+                batch, size, users = self.db.batch(), 0, set()
+
+    def _run_partition(self, partition: Dict[str, Any]) -> Dict[str, Any]:
+        name = self.migration.name
+        while not partition["done"]:
+            if self._deadline and time.monotonic() > self._deadline:
+                return partition
+            query = self._range_query(partition)
+            docs = resilience.call("migration.read", lambda timeout: list(query.stream(retry=None, timeout=timeout)))
+
+            ops: List[WriteOp] = []
+            changed = stale = 0
+            for doc in docs:
+                user_id = _user_of(doc.reference.path)
+                if user_id is None:
+                    continue
+                data = doc.to_dict() or {}
+                if self.mode == "verify":
+                    if not self.migration.is_current(user_id, doc.id, data):
+                        stale += 1
+                        if len(self.stale_examples) < 20:
+                            self.stale_examples.append(doc.reference.path)
+                        _documents.inc(migration=name, mode=self.mode, result="stale")
+                    else:
+                        _documents.inc(migration=name, mode=self.mode, result="current")
+                    continue
+                planned = self.migration.plan(user_id, doc.id, data)
+                if planned:
+                    changed += 1
+                    ops.extend(planned)
+                _documents.inc(migration=name, mode=self.mode, result="changed" if planned else "current")
+
+            # In dry-run mode the writes are counted as if they had been made
+            if ops and self.mode == "apply":
+                self._commit(ops)
+            # Progress only moves once the page is committed, so a failed page is redone whole
+            partition["writes"] += len(ops)
+            partition["changed"] += changed
+            partition["stale"] += stale
+            partition["scanned"] += len(docs)
+            if docs:
+                partition["after"] = docs[-1].reference.path
+            partition["done"] = len(docs) < self.page_size
+            self.checkpoint.save()
+        return partition
+
+    def run(self, on_progress: Optional[Callable[[Dict[str, int]], None]] = None) -> Dict[str, int]:
+        """Walk every range that is not done yet; returns totals across the whole run so far
+
+        Raises nothing for a failed range: it keeps its checkpoint and is counted as
+        failed, so running again picks it up.
+        """
+        if not self.checkpoint.partitions:
+            self.checkpoint.start(self._partition_bounds())
+
+        failed = 0
+        pending = [p for p in self.checkpoint.partitions if not p["done"]]
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"migration-{self.migration.name}") as pool:
+            futures = [pool.submit(self._run_partition, partition) for partition in pending]
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"A range failed and will resume from its checkpoint: {e}")
+                if on_progress:
+                    on_progress(self.checkpoint.totals())
+
+        totals = self.checkpoint.totals()
+        totals["failed"] = failed
+        # Only a complete pass over every user can vouch for the whole collection
+        if self.mode == "verify" and not self.user_id and not failed and totals["done"] == totals["partitions"]:
+            marker_ref(self.db, self.migration.name).set({
+                "verified": totals["stale"] == 0,
+                "stale": totals["stale"],
+                "scanned": totals["scanned"],
+                "verified_at": datetime.now()
+            })
+        return totals
+
+
+# Migrations
+def _typed_date_plan(user_id: str, doc_id: str, data: Dict[str, Any]) -> List[WriteOp]:
+    """Add date_ts and day next to a transaction's date string"""
+    fields = date_fields(data.get("date"))
+    if not fields or all(data.get(name) == value for name, value in fields.items()):
+        return []
+    return [WriteOp(user_id, "transactions", doc_id, "update", fields)]
+
+
+register(Migration(
+    name="typed_dates",
+    collection="transactions",
+    description="Store transaction dates as Firestore timestamps and day ordinals",
+    plan=_typed_date_plan
+))
+
+
+def _legacy_categories_plan(user_id: str, doc_id: str, data: Dict[str, Any]) -> List[WriteOp]:
+    """Fold metadata/categories into categories/current and remove it"""
+    if doc_id != "categories":
+        return []
+    ops = []
+    if data.get("categories"):
+        ops.append(WriteOp(user_id, "categories", "current", "set", {
+            "categories": firestore.ArrayUnion(list(data["categories"])),
+            "updated_at": datetime.now()
+        }, merge=True))
+    ops.append(WriteOp(user_id, "metadata", "categories", "delete"))
+    return ops
+
+
+register(Migration(
+    name="unify_categories",
+    collection="metadata",
+    description="Merge legacy metadata/categories documents into categories/current",
+    plan=_legacy_categories_plan,
+    verify=lambda user_id, doc_id, data: doc_id != "categories",
+    bump_collections=("categories",)
+))
+
+
+def main():
+    """Run a registered migration from the command line"""
+    import argparse
+    import firebase_admin
+    from firebase_admin import credentials
+
+    parser = argparse.ArgumentParser(description="Rewrite every user's documents for a schema change")
+    parser.add_argument("migration", choices=sorted(MIGRATIONS), help="Migration to run")
+    parser.add_argument("--mode", choices=MODES, default="dry-run",
+                        help="dry-run counts the writes, apply makes them, verify counts documents not yet migrated")
+    parser.add_argument("--key", default="firestore-key.json", help="Service account key")
+    parser.add_argument("--user", help="Only walk this user's documents")
+    parser.add_argument("--workers", type=int, default=MIGRATION_WORKERS, help="Ranges walked in parallel")
+    parser.add_argument("--partitions", type=int, default=MIGRATION_PARTITIONS, help="Ranges to split the collection into")
+    parser.add_argument("--writes-per-second", type=float, default=MIGRATION_WRITES_PER_SECOND)
+    parser.add_argument("--time-limit", type=float, help="Stop after this many seconds; rerun to continue")
+    parser.add_argument("--checkpoint", help="Progress file to resume from (default migration-<name>-<mode>.json)")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start from the beginning")
+    args = parser.parse_args()
+
+    migration = MIGRATIONS[args.migration]
+    checkpoint = args.checkpoint or f"migration-{migration.name}-{args.mode}.json"
+    if args.restart and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+    app = firebase_admin.initialize_app(credentials.Certificate(args.key))
+    runner = MigrationRunner(
+        firestore.client(app), migration, args.mode, checkpoint, args.user, args.workers,
+        args.partitions, args.writes_per_second, time_limit=args.time_limit
+    )
+    print(f"{migration.name}: {migration.description} ({args.mode})")
+    totals = runner.run(lambda t: print(f"  {t['done']}/{t['partitions']} ranges, {t['scanned']} documents scanned"))
+
+    if args.mode == "verify":
+        print(f"{totals['stale']} of {totals['scanned']} documents are not migrated")
+        for path in runner.stale_examples:
+            print(f"  {path}")
+    else:
+        verb = "Would make" if args.mode == "dry-run" else "Made"
+        print(f"{verb} {totals['writes']} writes for {totals['changed']} of {totals['scanned']} documents")
+    if totals["failed"] or totals["done"] < totals["partitions"]:
+        print(f"{totals['partitions'] - totals['done']} ranges unfinished; run the same command again to resume")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import zlib
+from datetime import date, timedelta
+from typing import List, Dict, Any, Optional, Tuple
+
+from .fixed_income import current_values
+from .resilience import FirestoreUnavailable
+from ..utils.lazy import lazy_import
+from ..utils.profiling import traced
+
+pd = lazy_import("pandas")
+
+# Series key holding the net worth total in each chunk
+TOTAL_KEY = "_total"
+
+HISTORY_RANGES = ["1W", "1M", "YTD", "1Y", "3Y"]
+
+
+def _encode_series(cents: List[int]) -> bytes:
+    """Delta-encode integer cents as zigzag varints and compress them"""
+    out = bytearray()
+    previous = 0
+    for value in cents:
+        delta = value - previous
+        previous = value
+        zigzag = delta * 2 if delta >= 0 else -delta * 2 - 1
+        while zigzag >= 0x80:
+            out.append((zigzag & 0x7F) | 0x80)
+            zigzag >>= 7
+        out.append(zigzag)
+    return zlib.compress(bytes(out), 9)
+
+
+def _decode_series(blob: bytes) -> List[int]:
+    """Inverse of _encode_series"""
+    data = zlib.decompress(blob)
+    values = []
+    previous = 0
+    zigzag = 0
+    shift = 0
+    for byte in data:
+        zigzag |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        delta = zigzag // 2 if zigzag % 2 == 0 else -(zigzag + 1) // 2
+        previous += delta
+        values.append(previous)
+        zigzag = 0
+        shift = 0
+    return values
+
+
+def month_id(day: date) -> str:
+    """Document ID of the chunk holding a day"""
+    return f"{day.year:04d}-{day.month:02d}"
+
+
+def month_ids_between(start: date, end: date) -> List[str]:
+    """IDs of every monthly chunk overlapping a date range"""
+    ids = []
+    current = date(start.year, start.month, 1)
+    while current <= end:
+        ids.append(month_id(current))
+        current = date(current.year + current.month // 12, current.month % 12 + 1, 1)
+    return ids
+
+
+def decode_chunk(chunk: Dict[str, Any]) -> Tuple[int, Dict[str, List[int]]]:
+    """Decode a stored chunk into its first day ordinal and dense daily cents per series"""
+    series = {key: _decode_series(bytes(blob)) for key, blob in chunk.get("series", {}).items()}
+    return chunk.get("start_day", 0), series
+
+
+def encode_chunk(month: str, start_day: int, series: Dict[str, List[int]], names: Dict[str, str]) -> Dict[str, Any]:
+    """Build the Firestore document for a monthly chunk"""
+    return {
+        "month": month,
+        "start_day": start_day,
+        "days": max((len(values) for values in series.values()), default=0),
+        "series": {key: _encode_series(values) for key, values in series.items()},
+        "names": names
+    }
+
+
+def history_range(selection: str, today: Optional[date] = None) -> Tuple[date, date]:
+    """Date range covered by a history range selector"""
+    today = today or date.today()
+    if selection == "1W":
+        return today - timedelta(days=7), today
+    if selection == "1M":
+        return today - timedelta(days=30), today
+    if selection == "YTD":
+        return date(today.year, 1, 1), today
+    if selection == "1Y":
+        return today - timedelta(days=365), today
+    return today - timedelta(days=3 * 365), today
+
+
+def snapshot_chunk(month: str, existing: Optional[Dict[str, Any]], assets: List[Dict[str, Any]], today: date) -> Dict[str, Any]:
+    """A month's chunk with today's net worth and per-asset values recorded into it"""
+    if existing:
+        start_day, series = decode_chunk(existing)
+        names = dict(existing.get("names", {}))
+    else:
+        start_day, series, names = today.toordinal(), {}, {}
+
+    length = today.toordinal() - start_day + 1
+    # CDs are recorded at their accrued value rather than the principal
+    today_values = {asset_id: round(value * 100) for asset_id, value in current_values(assets, today).items()}
+    today_values[TOTAL_KEY] = sum(today_values.values())
+    names.update({a["id"]: a.get("name", "") for a in assets if a.get("id")})
+
+    for key in set(series) | set(today_values):
+        values = series.get(key, [])
+        # Carry the last value forward over days without a snapshot; assets that
+        # are new this month start at zero and removed assets drop to zero
+        filler = values[-1] if values else 0
+        values = values[:length - 1] + [filler] * (length - 1 - len(values))
+        values.append(today_values.get(key, 0))
+        series[key] = values
+
+    return encode_chunk(month, start_day, series, names)
+
+
+@traced("net_worth_history.record_snapshot")
+def record_snapshot(firebase, assets: List[Dict[str, Any]], today: Optional[date] = None) -> bool:
+    """Record today's net worth and per-asset values into the current month's chunk"""
+    today = today or date.today()
+    month = month_id(today)
+    try:
+        # Read and rewritten in one transaction, so snapshots from two sessions both land
+        return firebase.update_net_worth_chunk(month, lambda existing: snapshot_chunk(month, existing, assets, today))
+    except FirestoreUnavailable:
+        return False
+
+
+def series_labels(names: Dict[str, str]) -> Dict[str, str]:
+    """Unique column labels for asset series: the asset's name, or "name (id)" where that is ambiguous"""
+    reserved = {"date", "Net Worth"}
+    counts: Dict[str, int] = {}
+    for name in names.values():
+        counts[name] = counts.get(name, 0) + 1
+    return {
+        asset_id: name if name and counts[name] == 1 and name not in reserved else f"{name} ({asset_id})"
+        for asset_id, name in names.items()
+    }
+
+
+@traced("net_worth_history.load_history")
+def load_history(firebase, start: date, end: date):
+    """Load the daily net worth series for a date range from the overlapping chunks only"""
+    month_ids = month_ids_between(start, end)
+    chunks = firebase.fetch_net_worth_chunks(month_ids)
+
+    # Seed the range with the last known values if it starts before the first snapshot
+    first_chunk = chunks.get(month_ids[0])
+    if not first_chunk or first_chunk.get("start_day", 0) > start.toordinal():
+        previous = firebase.fetch_net_worth_chunk_before(month_ids[0])
+        if previous:
+            chunks[previous["month"]] = previous
+
+    frames = []
+    names = {}
+    for chunk in chunks.values():
+        start_day, series = decode_chunk(chunk)
+        names.update(chunk.get("names", {}))
+        if not series:
+            continue
+        length = max(len(values) for values in series.values())
+        index = pd.to_datetime([date.fromordinal(start_day + i) for i in range(length)])
+        frames.append(pd.DataFrame(
+            {key: pd.Series(values, index=index[:len(values)]) for key, values in series.items()},
+            index=index
+        ))
+
+    if not frames:
+        return pd.DataFrame(columns=["date", "Net Worth"])
+
+    # A chunk holds every asset that existed during its month, so one missing from a
+    # chunk was added later or already removed; either way it is worth nothing there
+    columns = sorted(set().union(*(frame.columns for frame in frames)))
+    frames = [frame.reindex(columns=columns, fill_value=0) for frame in frames]
+    df = pd.concat(frames).sort_index()
+    df = df[~df.index.duplicated(keep="last")]
+    df = df.reindex(pd.date_range(df.index.min(), pd.Timestamp(end), freq="D")).ffill().fillna(0)
+    df = df[df.index >= pd.Timestamp(start)] / 100
+
+    df = df.rename(columns={TOTAL_KEY: "Net Worth", **series_labels(names)})
+    df.index.name = "date"
+    return df.reset_index()
@@ -0,0 +1,186 @@
+import hashlib
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import List, Dict, Any, Optional
+
+import streamlit as st
+
+from ..utils.dates import days_to_datetimes, transaction_day
+from ..utils.lazy import lazy_import
+from ..utils.profiling import traced
+
+pd = lazy_import("pandas")
+
+
+def _parse_day(value: Any) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str) and value:
+        try:
+            return date.fromisoformat(value[:10])
+        except ValueError:
+            return None
+    return None
+
+
+@dataclass
+class NotebookBudget:
+    """Spend of one budgeted notebook over its date window"""
+    notebook_id: str
+    name: str
+    budget: float
+    start: date
+    end: Optional[date]
+    today: date
+    spent: float
+    # Remaining budget at the end of each day of the window so far
+    burn_down: Any
+
+    @property
+    def status(self) -> str:
+        if self.start > self.today:
+            return "upcoming"
+        if self.end and self.end < self.today:
+            return "ended"
+        return "active"
+
+    @property
+    def remaining(self) -> float:
+        return self.budget - self.spent
+
+    @property
+    def elapsed_days(self) -> int:
+        last = min(self.today, self.end) if self.end else self.today
+        return max((last - self.start).days + 1, 0)
+
+    @property
+    def days_left(self) -> Optional[int]:
+        """Days of the window after today; None for open-ended notebooks"""
+        if not self.end:
+            return None
+        return max((self.end - max(self.today, self.start - timedelta(days=1))).days, 0)
+
+    @property
+    def daily_rate(self) -> float:
+        """Average spend per elapsed day"""
+        return self.spent / self.elapsed_days if self.elapsed_days else 0.0
+
+    @property
+    def projected(self) -> Optional[float]:
+        """Spend at the end of the window if the daily rate holds"""
+        if self.days_left is None:
+            return None
+        return self.spent + self.daily_rate * self.days_left
+
+    @property
+    def projected_overrun(self) -> Optional[float]:
+        """How far the projection exceeds the budget; negative when it stays under"""
+        return None if self.projected is None else self.projected - self.budget
+
+    @property
+    def expected_overrun(self) -> float:
+        """Projected overrun, or the current one for open-ended notebooks"""
+        overrun = self.projected_overrun
+        return self.spent - self.budget if overrun is None else overrun
+
+    @property
+    def ideal_daily(self) -> Optional[float]:
+        """Daily spend that would use the budget exactly by the end of the window"""
+        if not self.end:
+            return None
+        return self.budget / ((self.end - self.start).days + 1)
+
+
+@traced("notebook_budgets.summarize")
+def summarize_notebooks(
+    notebooks: List[Dict[str, Any]],
+    transactions: List[Dict[str, Any]],
+    today: Optional[date] = None
+) -> Dict[str, NotebookBudget]:
+    """Budget summaries of every notebook with a budget, from one grouped pass over the expenses
+
+    A notebook without a start date starts at its first transaction, or when it was created.
+    """
+    today = today or date.today()
+    budgeted = {n["id"]: n for n in notebooks if n.get("id") and float(n.get("budget") or 0) > 0}
+    if not budgeted:
+        return {}
+
+    expenses = pd.DataFrame(
+        [
+            (t["notebook_id"], transaction_day(t), -t["amount"])
+            for t in transactions
+            if t.get("notebook_id") in budgeted and t.get("amount", 0) < 0
+        ],
+        columns=["notebook_id", "ordinal", "amount"]
+    )
+    expenses["day"] = days_to_datetimes(expenses["ordinal"]).dt.date
+    first_day = expenses.groupby("notebook_id")["day"].min().to_dict() if len(expenses) else {}
+
+    windows = {}
+    for notebook_id, notebook in budgeted.items():
+        start = (
+            _parse_day(notebook.get("start_date"))
+            or first_day.get(notebook_id)
+            or _parse_day(notebook.get("created_at"))
+            or today
+        )
+        windows[notebook_id] = (start, _parse_day(notebook.get("end_date")))
+
+    # Daily spend of every notebook inside its own window, in one groupby
+    if len(expenses):
+        bounds = pd.DataFrame(
+            [(notebook_id, start, end or date.max) for notebook_id, (start, end) in windows.items()],
+            columns=["notebook_id", "start", "end"]
+        )
+        expenses = expenses.merge(bounds, on="notebook_id")
+        expenses = expenses[(expenses["day"] >= expenses["start"]) & (expenses["day"] <= expenses["end"])]
+    daily = expenses.groupby(["notebook_id", "day"])["amount"].sum() if len(expenses) else pd.Series(dtype=float)
+    spent = daily.groupby(level=0).sum().to_dict() if len(daily) else {}
+
+    summaries = {}
+    for notebook_id, (start, end) in windows.items():
+        budget = float(budgeted[notebook_id]["budget"])
+        last = min(today, end) if end else today
+        days = pd.Index([start + timedelta(days=i) for i in range(max((last - start).days + 1, 0))], name="day")
+        notebook_daily = daily.xs(notebook_id, level=0) if notebook_id in spent else pd.Series(dtype=float)
+        burn_down = budget - notebook_daily.reindex(days, fill_value=0.0).cumsum()
+        summaries[notebook_id] = NotebookBudget(
+            notebook_id=notebook_id,
+            name=budgeted[notebook_id].get("name", ""),
+            budget=budget,
+            start=start,
+            end=end,
+            today=today,
+            spent=float(spent.get(notebook_id, 0.0)),
+            burn_down=burn_down
+        )
+    return summaries
+
+
+def _board_key(notebooks: List[Dict[str, Any]], transactions: List[Dict[str, Any]]) -> str:
+    """Cheap fingerprint of the inputs used to reuse summaries across reruns"""
+    digest = hashlib.blake2b(digest_size=16)
+    for n in notebooks:
+        digest.update(f"{n.get('id')}|{n.get('budget')}|{n.get('start_date')}|{n.get('end_date')}\n".encode("utf-8"))
+    for t in transactions:
+        digest.update(f"{t.get('id')}|{t.get('notebook_id')}|{t.get('date')}|{t.get('amount')}\n".encode("utf-8"))
+    digest.update(date.today().isoformat().encode("utf-8"))
+    return digest.hexdigest()
+
+
+def get_notebook_budgets(
+    notebooks: List[Dict[str, Any]],
+    transactions: List[Dict[str, Any]],
+    version: Optional[str] = None
+) -> Dict[str, NotebookBudget]:
+    """Get the session's notebook budget summaries, recomputing them only when the data changed"""
+    key = (version, date.today()) if version else _board_key(notebooks, transactions)
+    cached = st.session_state.get("notebook_budgets")
+    if cached and cached[0] == key:
+        return cached[1]
+    summaries = summarize_notebooks(notebooks, transactions)
+    st.session_state.notebook_budgets = (key, summaries)
+    return summaries
@@ -0,0 +1,83 @@
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+from ..utils.lazy import lazy_import
+
+firestore = lazy_import("firebase_admin.firestore")
+
+# Totals each notebook document carries, kept current by every transaction write
+COUNTER_FIELDS = ("transaction_count", "expense_total", "earning_total")
+
+
+def empty_counters() -> Dict[str, Any]:
+    """Counter fields of a notebook without transactions"""
+    return {"transaction_count": 0, "expense_total": 0.0, "earning_total": 0.0, "last_activity": None}
+
+
+def _contribution(transaction: Optional[Dict[str, Any]]) -> Optional[Tuple[str, Dict[str, float]]]:
+    """The notebook a transaction counts towards and what it adds to each counter"""
+    notebook_id = transaction.get("notebook_id") if transaction else None
+    if not notebook_id:
+        return None
+    amount = float(transaction.get("amount") or 0)
+    return notebook_id, {
+        "transaction_count": 1,
+        "expense_total": -amount if amount < 0 else 0.0,
+        "earning_total": amount if amount > 0 else 0.0
+    }
+
+
+class CounterDeltas:
+    """Changes to notebook counters implied by a set of transaction writes"""
+
+    def __init__(self):
+        self._deltas: Dict[str, Dict[str, float]] = {}
+
+    def __len__(self) -> int:
+        """Notebooks touched, i.e. extra writes needed in the batch"""
+        return len(self._deltas)
+
+    def add(self, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+        """Account for one transaction going from before to after; None means absent"""
+        for transaction, sign in ((before, -1), (after, 1)):
+            contribution = _contribution(transaction)
+            if contribution is None:
+                continue
+            notebook_id, values = contribution
+            delta = self._deltas.setdefault(notebook_id, dict.fromkeys(COUNTER_FIELDS, 0))
+            for name, value in values.items():
+                delta[name] += sign * value
+
+    def fields(self) -> Dict[str, Dict[str, Any]]:
+        """Increment fields per notebook; touched notebooks also get a new last_activity"""
+        now = datetime.now()
+        updates = {}
+        for notebook_id, delta in self._deltas.items():
+            # Amounts are rounded to cents so repeated increments do not drift
+            fields = {
+                name: firestore.Increment(round(value, 2) if name != "transaction_count" else int(value))
+                for name, value in delta.items() if round(value, 2)
+            }
+            fields["last_activity"] = now
+            updates[notebook_id] = fields
+        return updates
+
+
+def recount(notebooks: List[Dict[str, Any]], transactions: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Counter values of each notebook computed from its transactions"""
+    counters = {n["id"]: empty_counters() for n in notebooks if n.get("id")}
+    for transaction in transactions:
+        contribution = _contribution(transaction)
+        if contribution is None or contribution[0] not in counters:
+            continue
+        notebook_id, values = contribution
+        for name, value in values.items():
+            counters[notebook_id][name] += value
+        activity = transaction.get("updated_at") or transaction.get("created_at")
+        last = counters[notebook_id]["last_activity"]
+        if isinstance(activity, datetime) and (last is None or activity.replace(tzinfo=None) > last.replace(tzinfo=None)):
+            counters[notebook_id]["last_activity"] = activity
+    for values in counters.values():
+        values["expense_total"] = round(values["expense_total"], 2)
+        values["earning_total"] = round(values["earning_total"], 2)
+    return counters
@@ -0,0 +1,282 @@
+import calendar
+import math
+import re
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from statistics import median
+from typing import List, Dict, Any, Optional, Tuple, Iterator, Set
+
+import streamlit as st
+
+from ..utils.dates import transaction_day
+from ..utils.profiling import traced
+
+# Frequency name -> (typical interval in days, tolerance in days)
+FREQUENCIES = {
+    "weekly": (7, 2),
+    "biweekly": (14, 3),
+    "monthly": (30.44, 4),
+    "annual": (365.25, 12)
+}
+MIN_OCCURRENCES = {"weekly": 3, "biweekly": 3, "monthly": 3, "annual": 2}
+# How each frequency reads after an amount, e.g. "$12.99/month"
+PERIODS = {"weekly": "week", "biweekly": "2 weeks", "monthly": "month", "annual": "year"}
+
+# Amounts of one merchant within 15% of the next closest amount belong to the same series
+AMOUNT_CLUSTER_RATIO = 1.15
+
+_NOISE = re.compile(r"[^a-z ]+")
+_NOISE_WORDS = {"pos", "debit", "credit", "purchase", "payment", "ach", "card", "ref", "inc", "llc", "co"}
+
+# Normalized description and the series' median amount
+SeriesKey = Tuple[str, float]
+
+
+def normalize_description(description: str) -> str:
+    """Strip digits, punctuation and boilerplate words so variants of a merchant match"""
+    words = _NOISE.sub(" ", (description or "").lower()).split()
+    return " ".join(w for w in words if w not in _NOISE_WORDS)
+
+
+def _sign(amount: float) -> int:
+    return 0 if abs(amount) < 0.01 else (1 if amount > 0 else -1)
+
+
+def amount_clusters(members: Dict[str, tuple]) -> List[Dict[str, tuple]]:
+    """Split one merchant's transactions into runs of similar amounts
+
+    Amounts are sorted and a new run starts only where the gap to the previous
+    amount exceeds AMOUNT_CLUSTER_RATIO, so there are no fixed band boundaries
+    for a steady charge to straddle. Expenses and earnings never mix.
+    """
+    clusters: List[Dict[str, tuple]] = []
+    previous = None
+    for transaction_id, row in sorted(members.items(), key=lambda item: item[1][1]):
+        amount = row[1]
+        if (
+            previous is None
+            or _sign(amount) != _sign(previous)
+            or (_sign(amount) and max(abs(amount), abs(previous)) > AMOUNT_CLUSTER_RATIO * min(abs(amount), abs(previous)))
+        ):
+            clusters.append({})
+        clusters[-1][transaction_id] = row
+        previous = amount
+    return clusters
+
+
+def _add_months(day: date, months: int, anchor_day: int) -> date:
+    """Move a date by whole months, keeping the anchor day where the month allows"""
+    month_index = day.month - 1 + months
+    year = day.year + month_index // 12
+    month = month_index % 12 + 1
+    return date(year, month, min(anchor_day, calendar.monthrange(year, month)[1]))
+
+
+@dataclass
+class RecurringSeries:
+    """A detected periodic transaction"""
+    key: SeriesKey
+    description: str
+    category: str
+    amount: float
+    frequency: str
+    first_date: date
+    last_date: date
+    occurrences: int
+    transaction_ids: List[str] = field(default_factory=list)
+
+    @property
+    def is_expense(self) -> bool:
+        return self.amount < 0
+
+    @property
+    def period(self) -> str:
+        return PERIODS[self.frequency]
+
+    def _step(self, day: date, n: int) -> date:
+        if self.frequency == "weekly":
+            return day + timedelta(days=7 * n)
+        if self.frequency == "biweekly":
+            return day + timedelta(days=14 * n)
+        if self.frequency == "monthly":
+            return _add_months(day, n, self.last_date.day)
+        return _add_months(day, 12 * n, self.last_date.day)
+
+    def next_date(self, after: Optional[date] = None) -> date:
+        """First expected occurrence after a date (default: after the last occurrence)"""
+        after = after or self.last_date
+        n = 1
+        candidate = self._step(self.last_date, n)
+        while candidate <= after:
+            n += 1
+            candidate = self._step(self.last_date, n)
+        return candidate
+
+    def is_active(self, today: date) -> bool:
+        """A series is active until it misses roughly two expected occurrences"""
+        interval, tolerance = FREQUENCIES[self.frequency]
+        return (today - self.last_date).days <= 2 * interval + tolerance
+
+    def occurrences_between(self, start: date, end: date) -> Iterator[date]:
+        """Expected dates in a range, lazily"""
+        day = self.next_date(max(self.last_date, start - timedelta(days=1)))
+        while day <= end:
+            yield day
+            day = self.next_date(day)
+
+
+def detect_series(key: SeriesKey, members: Dict[str, tuple]) -> Optional[RecurringSeries]:
+    """Classify one group of similar transactions as a recurring series, if it is one"""
+    rows = sorted(members.values())
+    days = sorted({row[0] for row in rows})
+    flagged = any(row[4] for row in rows)
+
+    frequency = None
+    if len(days) >= 2:
+        intervals = [b - a for a, b in zip(days, days[1:])]
+        typical = median(intervals)
+        for name, (expected, tolerance) in FREQUENCIES.items():
+            if abs(typical - expected) > tolerance or len(days) < MIN_OCCURRENCES[name]:
+                continue
+            # Most gaps must fit the period; a single skipped or doubled payment is tolerated
+            regular = sum(1 for i in intervals if abs(i - expected) <= tolerance)
+            if regular >= max(1, math.ceil(len(intervals) * 2 / 3)):
+                frequency = name
+                break
+
+    # Transactions the user marked as recurring count as monthly even without history
+    if frequency is None and flagged:
+        frequency = "monthly"
+    if frequency is None:
+        return None
+
+    last = rows[-1]
+    return RecurringSeries(
+        key=key,
+        description=last[2],
+        category=last[3],
+        amount=round(median(row[1] for row in rows), 2),
+        frequency=frequency,
+        first_date=date.fromordinal(days[0]),
+        last_date=date.fromordinal(days[-1]),
+        occurrences=len(days),
+        transaction_ids=[transaction_id for transaction_id in members]
+    )
+
+
+class RecurringIndex:
+    """Hash index of transactions by normalized description
+
+    Only groups touched by new, changed or removed transactions are re-evaluated;
+    each group is split into series by amount when it is.
+    """
+
+    def __init__(self):
+        self.version: Optional[str] = None
+        self._groups: Dict[str, Dict[str, tuple]] = {}
+        self._keys: Dict[str, Tuple[str, tuple]] = {}
+        self._series: Dict[str, List[RecurringSeries]] = {}
+
+    def _insert(self, transaction_id: str, transaction: Dict[str, Any], dirty: Set[str]):
+        day = transaction_day(transaction)
+        if day is None:
+            return
+        row = (
+            day,
+            float(transaction.get("amount", 0)),
+            transaction.get("description", ""),
+            transaction.get("category", ""),
+            bool(transaction.get("recurring", False))
+        )
+        previous = self._keys.get(transaction_id)
+        if previous and previous[1] == row:
+            return
+        if previous:
+            self._remove(transaction_id, dirty)
+
+        key = normalize_description(transaction.get("description", ""))
+        self._groups.setdefault(key, {})[transaction_id] = row
+        self._keys[transaction_id] = (key, row)
+        dirty.add(key)
+
+    def _remove(self, transaction_id: str, dirty: Set[str]):
+        key, _ = self._keys.pop(transaction_id)
+        group = self._groups.get(key, {})
+        group.pop(transaction_id, None)
+        if not group:
+            self._groups.pop(key, None)
+        dirty.add(key)
+
+    def _refresh(self, dirty: Set[str]):
+        for key in dirty:
+            found = []
+            for members in amount_clusters(self._groups.get(key, {})):
+                amount = round(median(row[1] for row in members.values()), 2)
+                series = detect_series((key, amount), members)
+                if series:
+                    found.append(series)
+            if found:
+                self._series[key] = found
+            else:
+                self._series.pop(key, None)
+
+    @traced("recurring.add")
+    def add(self, transactions: List[Dict[str, Any]]) -> Set[str]:
+        """Index new or edited transactions and re-evaluate only their groups"""
+        dirty = set()
+        for transaction in transactions:
+            if transaction.get("id"):
+                self._insert(transaction["id"], transaction, dirty)
+        self._refresh(dirty)
+        return dirty
+
+    @traced("recurring.sync")
+    def sync(self, transactions: List[Dict[str, Any]]) -> Set[str]:
+        """Bring the index in line with the full transaction list"""
+        dirty = set()
+        current_ids = set()
+        for transaction in transactions:
+            transaction_id = transaction.get("id")
+            if transaction_id:
+                current_ids.add(transaction_id)
+                self._insert(transaction_id, transaction, dirty)
+        for transaction_id in set(self._keys) - current_ids:
+            self._remove(transaction_id, dirty)
+        self._refresh(dirty)
+        return dirty
+
+    def series(self, today: Optional[date] = None, active_only: bool = True) -> List[RecurringSeries]:
+        """Detected series, largest first"""
+        today = today or date.today()
+        found = [s for group in self._series.values() for s in group if not active_only or s.is_active(today)]
+        return sorted(found, key=lambda s: abs(s.amount), reverse=True)
+
+    def upcoming(self, start: date, end: date, expenses_only: bool = False) -> Iterator[Dict[str, Any]]:
+        """Lazily materialize expected transactions between two dates"""
+        for series in self.series(start):
+            if expenses_only and not series.is_expense:
+                continue
+            for day in series.occurrences_between(start, end):
+                yield {
+                    "id": f"projected:{series.key[0]}:{series.key[1]}:{day.isoformat()}",
+                    "description": series.description,
+                    "amount": series.amount,
+                    "category": series.category,
+                    "date": day.strftime("%Y-%m-%d"),
+                    "recurring": True,
+                    "projected": True
+                }
+
+
+def get_recurring_index(transactions: List[Dict[str, Any]], version: Optional[str] = None) -> RecurringIndex:
+    """Get the session's recurring index, synced with the current transactions
+
+    When the data version is unchanged the transactions are not even scanned.
+    """
+    index = st.session_state.get("recurring_index")
+    if index is None:
+        index = st.session_state.recurring_index = RecurringIndex()
+    if version is None or index.version != version:
+        index.sync(transactions)
+        index.version = version
+    return index
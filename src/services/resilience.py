@@ -0,0 +1,159 @@
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from ..utils.metrics import REGISTRY
+
+# Total time one operation may take across all of its attempts, in seconds
+FIRESTORE_DEADLINE_SECONDS = float(os.environ.get("FIRESTORE_DEADLINE_SECONDS", "10"))
+FIRESTORE_RETRIES = int(os.environ.get("FIRESTORE_RETRIES", "3"))
+FIRESTORE_BACKOFF_SECONDS = float(os.environ.get("FIRESTORE_BACKOFF_SECONDS", "0.2"))
+FIRESTORE_BACKOFF_MAX_SECONDS = float(os.environ.get("FIRESTORE_BACKOFF_MAX_SECONDS", "2"))
+# Consecutive failed operations that open the circuit, and how long it stays open
+BREAKER_FAILURES = int(os.environ.get("FIRESTORE_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.environ.get("FIRESTORE_BREAKER_RESET_SECONDS", "30"))
+
+# Shorter deadlines for operations that sit on the render path
+DEADLINES = {
+    "fetch_data_version": 3.0
+}
+
+# Errors worth another attempt; the request may still have been applied
+TRANSIENT_ERRORS = {
+    "DeadlineExceeded", "ServiceUnavailable", "ResourceExhausted", "Aborted",
+    "InternalServerError", "GatewayTimeout", "RetryError", "TimeoutError", "ConnectionError"
+}
+# Errors where the server is known not to have applied the request
+REJECTED_ERRORS = {"ResourceExhausted", "Aborted"}
+
+_latency = REGISTRY.histogram(
+    "finance_tracker_firestore_seconds",
+    "Firestore operation latency including retries",
+    ["operation", "result"]
+)
+_retries = REGISTRY.counter(
+    "finance_tracker_firestore_retries",
+    "Firestore attempts retried after a transient error",
+    ["operation", "error"]
+)
+_rejected = REGISTRY.counter(
+    "finance_tracker_firestore_short_circuited",
+    "Firestore operations refused because the circuit was open",
+    ["operation"]
+)
+_breaker_state = REGISTRY.gauge(
+    "finance_tracker_firestore_circuit_open",
+    "1 while the Firestore circuit breaker is open"
+)
+
+
+class FirestoreUnavailable(RuntimeError):
+    """Firestore could not serve an operation; callers should fall back to cached data"""
+
+
+class CircuitOpenError(FirestoreUnavailable):
+    """The circuit breaker is open and the operation was not attempted"""
+
+
+def _error_name(error: BaseException) -> str:
+    return type(error).__name__
+
+
+def is_transient(error: BaseException) -> bool:
+    return _error_name(error) in TRANSIENT_ERRORS
+
+
+class CircuitBreaker:
+    """Stops calling Firestore after repeated failures, letting one trial call through after a pause"""
+
+    def __init__(self, failures: int = BREAKER_FAILURES, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self._consecutive = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        """Whether an operation may go ahead; after the pause one trial is let through"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial_running or time.monotonic() - self._opened_at < self.reset_seconds:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = None
+            self._trial_running = False
+        _breaker_state.set(0)
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._consecutive >= self.failures:
+                self._opened_at = time.monotonic()
+                _breaker_state.set(1)
+
+
+_breaker = CircuitBreaker()
+
+
+def get_breaker() -> CircuitBreaker:
+    """Get the process-wide Firestore circuit breaker"""
+    return _breaker
+
+
+def _backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff before the given retry"""
+    return random.uniform(0, min(FIRESTORE_BACKOFF_MAX_SECONDS, FIRESTORE_BACKOFF_SECONDS * 2 ** attempt))
+
+
+def call(operation: str, fn: Callable[[float], Any], idempotent: bool = True,
+         deadline: Optional[float] = None, breaker: Optional[CircuitBreaker] = None) -> Any:
+    """Run a Firestore call under a deadline, with retries and the circuit breaker
+
+    fn receives the seconds left before the deadline and should pass them to the
+    client as its timeout. Idempotent calls are retried on any transient error;
+    others only when the server rejected them outright. Transient failures raise
+    FirestoreUnavailable, other errors propagate unchanged.
+    """
+    breaker = breaker or _breaker
+    if not breaker.allow():
+        _rejected.inc(operation=operation)
+        raise CircuitOpenError(f"Firestore is unavailable; {operation} was not attempted")
+
+    started = time.monotonic()
+    expires = started + (deadline or DEADLINES.get(operation, FIRESTORE_DEADLINE_SECONDS))
+    attempt = 0
+    while True:
+        try:
+            result = fn(max(expires - time.monotonic(), 0.1))
+        except Exception as e:
+            retryable = is_transient(e) and (idempotent or _error_name(e) in REJECTED_ERRORS)
+            delay = _backoff(attempt)
+            if retryable and attempt < FIRESTORE_RETRIES and time.monotonic() + delay < expires:
+                _retries.inc(operation=operation, error=_error_name(e))
+                attempt += 1
+                time.sleep(delay)
+                continue
+            _latency.observe(time.monotonic() - started, operation=operation, result="error")
+            if not is_transient(e):
+                # The service answered; this is a bug or bad input, not an outage
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            raise FirestoreUnavailable(f"{operation} failed: {e}") from e
+        breaker.record_success()
+        _latency.observe(time.monotonic() - started, operation=operation, result="ok")
+        return result
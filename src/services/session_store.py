@@ -0,0 +1,207 @@
+import base64
+import binascii
+import hashlib
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from ..utils.lazy import lazy_import
+
+aead = lazy_import("cryptography.hazmat.primitives.ciphers.aead")
+crypto_exceptions = lazy_import("cryptography.exceptions")
+
+# Sessions kept in memory; the least recently used are evicted beyond this
+SESSION_STORE_MAX_ENTRIES = int(os.environ.get("AUTH_SESSION_MAX_ENTRIES", "10000"))
+# Optional SQLite file so sessions survive a server restart
+SESSION_STORE_DB = os.environ.get("AUTH_SESSION_DB", "")
+# Cookie carrying the browser's session token, and whether it is sent over HTTPS only
+SESSION_COOKIE = "finance_tracker_session"
+SESSION_COOKIE_SECURE = os.environ.get("AUTH_COOKIE_SECURE", "1") != "0"
+# Lifetime of the one-time code a browser trades for its session cookie
+SESSION_HANDOFF_SECONDS = 60
+
+
+def _expiry_timestamp(auth_data: Dict[str, Any]) -> float:
+    """Get the session expiry of an auth record as a Unix timestamp"""
+    expires_at = auth_data.get("expires_at")
+    return datetime.fromisoformat(expires_at).timestamp() if expires_at else 0.0
+
+
+def _hash_token(token: str) -> str:
+    """Hash a session token so raw tokens are never written to disk"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _record_key(token: str) -> bytes:
+    """AES key for a session's stored record, derived from the token so the file alone cannot be read"""
+    return hashlib.sha256(b"finance-tracker-session-record\0" + token.encode("utf-8")).digest()
+
+
+def _encrypt(key: bytes, auth_data: Dict[str, Any]) -> str:
+    nonce = os.urandom(12)
+    sealed = aead.AESGCM(key).encrypt(nonce, json.dumps(auth_data).encode("utf-8"), None)
+    return base64.b64encode(nonce + sealed).decode("ascii")
+
+
+def _decrypt(key: bytes, data: str) -> Optional[Dict[str, Any]]:
+    """Open a sealed record; None if it was tampered with, truncated or sealed under another key"""
+    try:
+        raw = base64.b64decode(data, validate=True)
+        return json.loads(aead.AESGCM(key).decrypt(raw[:12], raw[12:], None))
+    except (crypto_exceptions.InvalidTag, binascii.Error, ValueError):
+        return None
+
+
+class SessionStore:
+    """Thread-safe auth session store keyed by browser session token"""
+
+    def __init__(self, max_entries: int = SESSION_STORE_MAX_ENTRIES, db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # Record keys by session key, so refreshed tokens can be re-encrypted without the raw token
+        self._keys: Dict[str, bytes] = {}
+        self._handoffs: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            # Records are encrypted from this table on; older plaintext rows are discarded
+            self._db.execute("DROP TABLE IF EXISTS sessions")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sealed_sessions ("
+                "token_hash TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM sealed_sessions WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """Look up a live session; expired sessions are dropped"""
+        if not token:
+            return None
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None and self._db is not None:
+                entry = self._load(token)
+                if entry is not None:
+                    self._entries[token] = entry
+                    self._evict()
+            if entry is None:
+                return None
+
+            auth_data, expires_at = entry
+            if time.time() >= expires_at:
+                self._remove(token)
+                return None
+
+            self._entries.move_to_end(token)
+            return auth_data
+
+    def put(self, token: str, auth_data: Dict[str, Any]):
+        """Store or replace the session for a token"""
+        expires_at = _expiry_timestamp(auth_data)
+        auth_data["session_key"] = _hash_token(token)
+        with self._lock:
+            self._entries[token] = (auth_data, expires_at)
+            self._entries.move_to_end(token)
+            self._keys[auth_data["session_key"]] = _record_key(token)
+            self._evict()
+            self._write(auth_data, expires_at)
+
+    def persist(self, auth_data: Dict[str, Any]):
+        """Write an in-memory record back to disk after it changed in place"""
+        if self._db is None or not auth_data.get("session_key"):
+            return
+        with self._lock:
+            self._write(auth_data, _expiry_timestamp(auth_data))
+
+    def is_live(self, auth_data: Dict[str, Any]) -> bool:
+        """Whether a record still backs an unexpired session held in memory"""
+        with self._lock:
+            if auth_data.get("session_key") not in self._keys:
+                return False
+        return time.time() < _expiry_timestamp(auth_data)
+
+    def delete(self, token: str):
+        """Remove a session, e.g. on sign out"""
+        with self._lock:
+            self._remove(token)
+
+    def issue_handoff(self, token: str) -> str:
+        """A short-lived, single-use code the browser trades for its session cookie"""
+        code = secrets.token_urlsafe(24)
+        now = time.monotonic()
+        with self._lock:
+            for stale in [c for c, (_, issued) in self._handoffs.items() if now - issued > SESSION_HANDOFF_SECONDS]:
+                del self._handoffs[stale]
+            self._handoffs[code] = (token, now)
+        return code
+
+    def redeem_handoff(self, code: str) -> Optional[str]:
+        """The session token for a handoff code, once, if the code is still live"""
+        with self._lock:
+            token, issued = self._handoffs.pop(code, (None, 0.0))
+        if token is None or time.monotonic() - issued > SESSION_HANDOFF_SECONDS:
+            return None
+        return token
+
+    def _load(self, token: str) -> Optional[tuple]:
+        row = self._db.execute(
+            "SELECT data, expires_at FROM sealed_sessions WHERE token_hash = ?",
+            (_hash_token(token),)
+        ).fetchone()
+        if not row:
+            return None
+        auth_data = _decrypt(_record_key(token), row[0])
+        if auth_data is None:
+            return None
+        self._keys[auth_data["session_key"]] = _record_key(token)
+        return auth_data, row[1]
+
+    def _write(self, auth_data: Dict[str, Any], expires_at: float):
+        if self._db is None:
+            return
+        key = self._keys.get(auth_data["session_key"])
+        if key is None:
+            # The session was signed out or evicted while a refresh was in flight
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO sealed_sessions (token_hash, data, expires_at) VALUES (?, ?, ?)",
+            (auth_data["session_key"], _encrypt(key, auth_data), expires_at)
+        )
+        self._db.commit()
+
+    def _remove(self, token: str):
+        self._entries.pop(token, None)
+        self._keys.pop(_hash_token(token), None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM sealed_sessions WHERE token_hash = ?", (_hash_token(token),))
+            self._db.commit()
+
+    def _evict(self):
+        # Only the in-memory copy is evicted; persisted sessions reload on demand
+        while len(self._entries) > self.max_entries:
+            _, (auth_data, _) = self._entries.popitem(last=False)
+            self._keys.pop(auth_data.get("session_key"), None)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Get the process-wide session store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SessionStore(db_path=SESSION_STORE_DB or None)
+    return _store
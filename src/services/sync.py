@@ -0,0 +1,238 @@
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Tuple
+
+import streamlit as st
+
+from .data_cache import get_shared_cache
+from .firebase import get_firebase_instance
+from ..utils.metrics import REGISTRY
+from ..utils.profiling import traced
+
+# Collections the dashboard needs, each reloaded only when its version counter moves
+DATA_COLLECTIONS = ("transactions", "notebooks", "categories", "budgets", "assets")
+# Threads revalidating sessions against Firestore
+SYNC_WORKERS = int(os.environ.get("SYNC_WORKERS", "4"))
+# Longest the first render after sign-in waits on the prefetch before loading itself
+PREFETCH_TIMEOUT_SECONDS = float(os.environ.get("PREFETCH_TIMEOUT_SECONDS", "30"))
+# How often an open page checks whether a background revalidation found newer data
+SYNC_POLL_SECONDS = float(os.environ.get("SYNC_POLL_SECONDS", "2"))
+
+_revalidations = REGISTRY.counter(
+    "finance_tracker_revalidations",
+    "Background checks of rendered data against Firestore",
+    ["result"]
+)
+_prefetches = REGISTRY.counter(
+    "finance_tracker_prefetches",
+    "Sign-in prefetches of a user's collections",
+    ["result"]
+)
+
+# Collection reads of prefetches run side by side here
+_fetch_pool = ThreadPoolExecutor(max_workers=SYNC_WORKERS * len(DATA_COLLECTIONS), thread_name_prefix="fetch")
+
+
+def fetch_collection(firebase, collection: str) -> Any:
+    """Read one of the collections the dashboard needs"""
+    if collection == "transactions":
+        return firebase.fetch_transactions()
+    if collection == "notebooks":
+        return firebase.fetch_notebooks()
+    if collection == "categories":
+        return firebase.fetch_categories(), firebase.fetch_categorization_rules()
+    if collection == "budgets":
+        return firebase.fetch_budgets() or {}
+    return firebase.fetch_assets()
+
+
+def _counter(version: Dict[str, Any], collection: str) -> int:
+    return version["collections"].get(collection, 0)
+
+
+def cached_collections(user_id: str, version: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Every collection at a data version from the shared cache, without reading Firestore"""
+    cache = get_shared_cache()
+    raw = {}
+    for collection in DATA_COLLECTIONS:
+        raw[collection] = cache.get(user_id, collection, _counter(version, collection))
+        if raw[collection] is None:
+            return None
+    return raw
+
+
+def load_collections(firebase, version: Optional[Dict[str, Any]], parallel: bool = False) -> Tuple[Dict[str, Any], List[str]]:
+    """Every collection at a data version, reading only those missing from the shared cache
+
+    Returns the collections and the names of those that were read. Without a
+    version everything is read and nothing is cached. With parallel, the
+    missing collections are read concurrently.
+    """
+    # Collections are shared with the user's other sessions; treat them as read-only
+    cache = get_shared_cache()
+    raw = {}
+    for collection in DATA_COLLECTIONS:
+        raw[collection] = cache.get(firebase.user_id, collection, _counter(version, collection)) if version else None
+    fetched = [collection for collection in DATA_COLLECTIONS if raw[collection] is None]
+
+    if parallel and len(fetched) > 1:
+        futures = {collection: _fetch_pool.submit(fetch_collection, firebase, collection) for collection in fetched}
+        raw.update({collection: future.result() for collection, future in futures.items()})
+    else:
+        raw.update({collection: fetch_collection(firebase, collection) for collection in fetched})
+
+    if version:
+        for collection in fetched:
+            cache.put(firebase.user_id, collection, _counter(version, collection), raw[collection])
+    return raw, fetched
+
+
+class SyncStatus:
+    """The data version a session renders and when it was last confirmed current
+
+    The revalidation thread updates this object directly; it lives in session
+    state so the next rerun picks up the newer version.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.user_id: Optional[str] = None
+        self.version: Optional[Dict[str, Any]] = None
+        self.synced_at: Optional[datetime] = None
+        self.error: Optional[str] = None
+        self.revalidating = False
+        # Set when a revalidation found newer data than the page shows
+        self.rerun_pending = False
+        # Synchronous writes the session had made when it last loaded
+        self.write_count = 0
+
+    def mark_synced(self, user_id: str, version: Dict[str, Any]) -> bool:
+        """Record a version confirmed against Firestore; True if it differs from the previous one"""
+        with self._lock:
+            changed = self.user_id != user_id or self.version != version
+            self.user_id, self.version = user_id, version
+            self.synced_at = datetime.now()
+            self.error = None
+            return changed
+
+    def start(self) -> bool:
+        """Claim the session's revalidation; False if one is already running"""
+        with self._lock:
+            if self.revalidating:
+                return False
+            self.revalidating = True
+            return True
+
+    def finish(self, error: Optional[str] = None, changed: bool = False):
+        with self._lock:
+            self.revalidating = False
+            self.rerun_pending = self.rerun_pending or changed
+            if error:
+                self.error = error
+
+    def take_rerun(self) -> bool:
+        """Whether the page should rerun to show newer data; clears the request"""
+        with self._lock:
+            pending, self.rerun_pending = self.rerun_pending, False
+            return pending
+
+
+def get_sync_status() -> SyncStatus:
+    """Get the session's sync status"""
+    if "sync_status" not in st.session_state:
+        st.session_state.sync_status = SyncStatus()
+    return st.session_state.sync_status
+
+
+@st.fragment(run_every=SYNC_POLL_SECONDS)
+def watch_for_changes():
+    """Rerun the page once a background revalidation has cached newer data
+
+    Only this fragment runs on the timer; the whole page reruns only when
+    something changed.
+    """
+    if get_sync_status().take_rerun():
+        st.rerun()
+
+
+class Revalidator:
+    """Checks rendered data against Firestore off the script thread"""
+
+    def __init__(self, workers: int = SYNC_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="revalidate")
+
+    def submit(self, firebase, status: SyncStatus):
+        """Revalidate a session's data unless a check is already running"""
+        if status.start():
+            self._executor.submit(self._revalidate, firebase, firebase.user_id, status)
+
+    @traced("sync.revalidate")
+    def _revalidate(self, firebase, user_id: str, status: SyncStatus):
+        error = None
+        changed = False
+        try:
+            version = firebase.fetch_data_version()
+            if version is None:
+                raise RuntimeError("the data version could not be read")
+            # Changed collections land in the shared cache before the rerun asks for them
+            load_collections(firebase, version)
+            if status.mark_synced(user_id, version):
+                _revalidations.inc(result="changed")
+                changed = True
+            else:
+                _revalidations.inc(result="unchanged")
+        except Exception as e:
+            error = str(e)
+            _revalidations.inc(result="error")
+        finally:
+            status.finish(error, changed)
+
+
+_revalidator = Revalidator()
+
+
+def revalidate_in_background(firebase, status: SyncStatus):
+    """Confirm a session's data is current; watch_for_changes reruns the page if anything changed"""
+    _revalidator.submit(firebase, status)
+
+
+# Sign-in prefetches run here, separate from revalidation so neither waits on the other
+_prefetch_pool = ThreadPoolExecutor(max_workers=SYNC_WORKERS, thread_name_prefix="prefetch")
+
+
+@traced("sync.prefetch")
+def _prefetch(firebase) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+    try:
+        # The version is read first so collections are never cached under a newer one
+        version = firebase.fetch_data_version()
+        raw, _ = load_collections(firebase, version, parallel=True)
+        _prefetches.inc(result="ok")
+        return version, raw
+    except Exception:
+        _prefetches.inc(result="error")
+        raise
+
+
+def start_prefetch(user_id: str):
+    """Start loading a user's collections the moment they sign in
+
+    The first rerun takes the result over with take_prefetch instead of
+    reading Firestore itself.
+    """
+    try:
+        firebase = get_firebase_instance()
+        firebase.user_id = user_id
+    except Exception:
+        # main() reports the problem when it initializes Firebase itself
+        return
+    st.session_state.prefetch = (user_id, _prefetch_pool.submit(_prefetch, firebase))
+
+
+def take_prefetch(user_id: str) -> Optional[Future]:
+    """Hand over the session's running or finished prefetch, if it is for this user"""
+    prefetch = st.session_state.pop("prefetch", None)
+    if prefetch is None or prefetch[0] != user_id:
+        return None
+    return prefetch[1]
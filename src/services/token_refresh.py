@@ -0,0 +1,173 @@
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Set, Tuple, Callable
+
+from .http_client import get_http_session
+
+logger = logging.getLogger(__name__)
+
+SECURE_TOKEN_URL = "https://securetoken.googleapis.com/v1/token?key={api_key}"
+
+# Refresh this long before the ID token expires (Firebase tokens last an hour)
+TOKEN_REFRESH_MARGIN_SECONDS = int(os.environ.get("AUTH_TOKEN_REFRESH_MARGIN", "300"))
+TOKEN_REFRESH_RETRY_SECONDS = 30
+TOKEN_REFRESH_MAX_FAILURES = 5
+# Auth records refreshed at once; the least recently scheduled are dropped beyond this
+TOKEN_REFRESH_MAX_ENTRIES = int(os.environ.get("AUTH_TOKEN_REFRESH_MAX_ENTRIES", "10000"))
+
+
+def token_expiry(expires_in: Any) -> str:
+    """Convert an expiresIn value from the REST API into an ISO timestamp"""
+    return (datetime.now() + timedelta(seconds=int(expires_in or 3600))).isoformat()
+
+
+def refresh_id_token(api_key: str, refresh_token: str) -> Dict[str, Any]:
+    """Exchange a refresh token for a new ID token"""
+    response = get_http_session().post(
+        SECURE_TOKEN_URL.format(api_key=api_key),
+        data={"grant_type": "refresh_token", "refresh_token": refresh_token}
+    )
+    data = response.json()
+    if not response.ok:
+        message = data.get("error", {}).get("message", "Unknown error")
+        raise RuntimeError(f"Token refresh failed: {message}")
+    return {
+        "id_token": data["id_token"],
+        "refresh_token": data["refresh_token"],
+        "token_expires_at": token_expiry(data.get("expires_in"))
+    }
+
+
+def _entry_key(auth_data: Dict[str, Any]) -> Any:
+    """One entry per stored session, even when its record was reloaded as a new dict"""
+    return auth_data.get("session_key") or id(auth_data)
+
+
+class TokenRefresher:
+    """Background thread that refreshes ID tokens shortly before they expire
+
+    Each record is refreshed only while is_live(auth_data, owners) holds, where
+    owners are the ids passed to schedule() by the app sessions using it.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        margin_seconds: int = TOKEN_REFRESH_MARGIN_SECONDS,
+        on_refresh: Optional[Callable[[Dict[str, Any]], None]] = None,
+        is_live: Optional[Callable[[Dict[str, Any], Set[str]], bool]] = None,
+        max_entries: int = TOKEN_REFRESH_MAX_ENTRIES
+    ):
+        self.api_key = api_key
+        self.margin_seconds = margin_seconds
+        self.on_refresh = on_refresh
+        self.is_live = is_live
+        self.max_entries = max_entries
+        self._heap = []
+        self._entries: Dict[Any, Tuple[Dict[str, Any], int, int]] = {}
+        self._owners: Dict[Any, Set[str]] = {}
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def _due_time(self, auth_data: Dict[str, Any]) -> float:
+        expires_at = auth_data.get("token_expires_at")
+        if not expires_at:
+            return time.time()
+        expiry = datetime.fromisoformat(expires_at).timestamp()
+        return max(time.time(), expiry - self.margin_seconds)
+
+    def schedule(self, auth_data: Dict[str, Any], delay: Optional[float] = None, failures: int = 0,
+                 owner: Optional[str] = None):
+        """Schedule a refresh for an auth record; the record is updated in place"""
+        if not auth_data.get("refresh_token"):
+            return
+        due = time.time() + delay if delay is not None else self._due_time(auth_data)
+        key = _entry_key(auth_data)
+        with self._cond:
+            seq = next(self._counter)
+            # Re-inserting keeps the entries in scheduling order for the cap below
+            self._entries.pop(key, None)
+            self._entries[key] = (auth_data, failures, seq)
+            if owner:
+                self._owners.setdefault(key, set()).add(owner)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+            heapq.heappush(self._heap, (due, seq, key))
+            self._ensure_thread()
+            self._cond.notify()
+
+    def cancel(self, auth_data: Dict[str, Any]):
+        """Stop refreshing an auth record, e.g. on sign out"""
+        with self._cond:
+            self._drop(_entry_key(auth_data))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _drop(self, key: Any):
+        self._entries.pop(key, None)
+        self._owners.pop(key, None)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="token-refresher", daemon=True)
+            self._thread.start()
+
+    def _next_due(self) -> Optional[Tuple[Dict[str, Any], int]]:
+        """Block until an entry is due and return it"""
+        with self._cond:
+            while True:
+                # Drop heap items that were cancelled or rescheduled
+                while self._heap and self._entries.get(self._heap[0][2], (None, 0, None))[2] != self._heap[0][1]:
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                due, _, key = self._heap[0]
+                wait = due - time.time()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                heapq.heappop(self._heap)
+                auth_data, failures, _ = self._entries.pop(key)
+                return auth_data, failures
+
+    def _still_needed(self, auth_data: Dict[str, Any]) -> bool:
+        """Whether a due record is still in use; abandoned records are dropped for good"""
+        key = _entry_key(auth_data)
+        with self._cond:
+            owners = set(self._owners.get(key, ()))
+        if self.is_live is None or self.is_live(auth_data, owners):
+            return True
+        with self._cond:
+            if key not in self._entries:
+                self._owners.pop(key, None)
+        return False
+
+    def _run(self):
+        while True:
+            entry = self._next_due()
+            if entry is None:
+                continue
+            auth_data, failures = entry
+            if not self._still_needed(auth_data):
+                continue
+            try:
+                tokens = refresh_id_token(self.api_key, auth_data["refresh_token"])
+                with self._cond:
+                    auth_data.update(tokens)
+                if self.on_refresh:
+                    self.on_refresh(auth_data)
+                self.schedule(auth_data)
+            except Exception as e:
+                logger.warning("ID token refresh for %s failed: %s", auth_data.get("user_id"), e)
+                if failures + 1 < TOKEN_REFRESH_MAX_FAILURES:
+                    self.schedule(auth_data, delay=TOKEN_REFRESH_RETRY_SECONDS, failures=failures + 1)
+                else:
+                    self.cancel(auth_data)
@@ -0,0 +1,257 @@
+import importlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Iterable
+
+from . import resilience
+from .write_queue import MAX_BATCH_WRITES, db_version_ref, version_bump
+from ..utils.metrics import REGISTRY
+from ..utils.profiling import traced
+
+# Quote provider, e.g. "file:/path/to/quotes.json" or "package.module:ProviderClass"
+QUOTE_PROVIDER = os.environ.get("QUOTE_PROVIDER", "")
+QUOTE_TTL_SECONDS = int(os.environ.get("QUOTE_TTL_SECONDS", "900"))
+
+_quote_requests = REGISTRY.counter(
+    "finance_tracker_quote_batches",
+    "Batched quote provider requests",
+    ["provider"]
+)
+_quote_lookups = REGISTRY.counter(
+    "finance_tracker_quote_lookups",
+    "Ticker lookups served by the quote cache",
+    ["result"]
+)
+
+
+class QuoteProvider:
+    """Source of current prices; implementations price many tickers per call"""
+    name = "base"
+
+    def get_quotes(self, tickers: List[str]) -> Dict[str, float]:
+        raise NotImplementedError
+
+
+class FileQuoteProvider(QuoteProvider):
+    """Reads prices from a local JSON file of {"TICKER": price}; used for tests and offline runs"""
+    name = "file"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._prices: Dict[str, float] = {}
+        self._mtime = None
+
+    def get_quotes(self, tickers: List[str]) -> Dict[str, float]:
+        mtime = os.path.getmtime(self.path)
+        if mtime != self._mtime:
+            with open(self.path, "r") as f:
+                self._prices = {k.upper(): float(v) for k, v in json.load(f).items()}
+            self._mtime = mtime
+        return {t: self._prices[t] for t in tickers if t in self._prices}
+
+
+class QuoteCache:
+    """Process-wide TTL cache of quotes shared by every session"""
+
+    def __init__(self, ttl_seconds: int = QUOTE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._quotes: Dict[str, tuple] = {}
+        self._inflight: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, tickers: Iterable[str], provider: QuoteProvider) -> Dict[str, float]:
+        """Get quotes, fetching every missing ticker in one batch"""
+        # Tickers another session is already fetching are waited on, not requested again
+        tickers = {t.upper() for t in tickers}
+        now = time.time()
+        found, to_fetch, to_wait = {}, [], []
+
+        with self._lock:
+            for ticker in tickers:
+                cached = self._quotes.get(ticker)
+                if cached and now - cached[1] < self.ttl_seconds:
+                    if cached[0] is not None:
+                        found[ticker] = cached[0]
+                elif ticker in self._inflight:
+                    to_wait.append((ticker, self._inflight[ticker]))
+                else:
+                    to_fetch.append(ticker)
+            event = threading.Event()
+            for ticker in to_fetch:
+                self._inflight[ticker] = event
+
+        _quote_lookups.inc(len(found), result="hit")
+        _quote_lookups.inc(len(to_fetch), result="miss")
+
+        if to_fetch:
+            try:
+                _quote_requests.inc(provider=provider.name)
+                fetched = provider.get_quotes(sorted(to_fetch))
+                fetched = {t.upper(): float(p) for t, p in fetched.items()}
+                with self._lock:
+                    fetched_at = time.time()
+                    # Unknown tickers are cached as None so they are not re-requested every rerun
+                    for ticker in to_fetch:
+                        self._quotes[ticker] = (fetched.get(ticker), fetched_at)
+                found.update(fetched)
+            finally:
+                with self._lock:
+                    for ticker in to_fetch:
+                        self._inflight.pop(ticker, None)
+                event.set()
+
+        for ticker, pending in to_wait:
+            pending.wait(timeout=30)
+            cached = self._quotes.get(ticker)
+            if cached and cached[0] is not None:
+                found[ticker] = cached[0]
+
+        return found
+
+
+_quote_cache = QuoteCache()
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_quote_provider() -> Optional[QuoteProvider]:
+    """Build the quote provider configured by QUOTE_PROVIDER, if any"""
+    global _provider
+    if _provider is None and QUOTE_PROVIDER:
+        with _provider_lock:
+            if _provider is None:
+                if QUOTE_PROVIDER.startswith("file:"):
+                    _provider = FileQuoteProvider(QUOTE_PROVIDER[len("file:"):])
+                else:
+                    module_name, _, class_name = QUOTE_PROVIDER.partition(":")
+                    _provider = getattr(importlib.import_module(module_name), class_name)()
+    return _provider
+
+
+def parse_holdings(text: str) -> Dict[str, float]:
+    """Parse holdings entered as "AAPL: 50, MSFT: 40" (commas or new lines)"""
+    holdings = {}
+    for part in text.replace("\n", ",").split(","):
+        if not part.strip():
+            continue
+        ticker, _, quantity = part.partition(":")
+        if not ticker.strip() or not quantity.strip():
+            raise ValueError(f"Invalid holding '{part.strip()}', expected TICKER: quantity")
+        holdings[ticker.strip().upper()] = float(quantity)
+    return holdings
+
+
+def format_holdings(holdings: Dict[str, float]) -> str:
+    """Format holdings for the asset form"""
+    return ", ".join(f"{ticker}: {quantity:g}" for ticker, quantity in sorted(holdings.items()))
+
+
+def holdings_value(holdings: Dict[str, float], quotes: Dict[str, float]) -> Optional[float]:
+    """Value of a set of holdings, or None if any ticker has no quote"""
+    total = 0.0
+    for ticker, quantity in holdings.items():
+        price = quotes.get(ticker.upper())
+        if price is None:
+            return None
+        total += float(quantity) * price
+    return round(total, 2)
+
+
+class ValuationEngine:
+    """Prices the holdings of many assets with one batched quote lookup"""
+
+    def __init__(self, provider: QuoteProvider, cache: QuoteCache = _quote_cache):
+        self.provider = provider
+        self.cache = cache
+
+    @traced("valuation.revalue")
+    def revalue(self, assets: List[Dict[str, Any]]) -> Dict[str, float]:
+        """Compute new values for every asset with holdings, keyed by asset ID"""
+        priced = [a for a in assets if a.get("holdings") and a.get("id")]
+        tickers = {t for a in priced for t in a["holdings"]}
+        if not tickers:
+            return {}
+
+        quotes = self.cache.get_many(tickers, self.provider)
+        values = {}
+        for asset in priced:
+            value = holdings_value(asset["holdings"], quotes)
+            if value is not None:
+                values[asset["id"]] = value
+        return values
+
+
+def refresh_asset_values(firebase, assets: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+    """Revalue the current user's holdings and write back values that changed
+
+    Returns copies of the assets with the stored new values, or None if nothing
+    changed; the given assets are shared with other sessions and left untouched.
+    """
+    provider = get_quote_provider()
+    if provider is None:
+        return None
+
+    values = ValuationEngine(provider).revalue(assets)
+    changed = {
+        asset["id"]: values[asset["id"]]
+        for asset in assets
+        if asset.get("id") in values and round(asset.get("value", 0) or 0, 2) != values[asset["id"]]
+    }
+    if not changed or not firebase.update_asset_values(changed):
+        return None
+    return [{**asset, "value": changed[asset["id"]]} if asset.get("id") in changed else asset for asset in assets]
+
+
+def revalue_all_users(db, provider: Optional[QuoteProvider] = None) -> int:
+    """Revalue the holdings of every user's assets with a single quote batch
+
+    Each user's changed values are written with updated_at and a bump of their
+    version document, so open sessions pick them up like any other write.
+    """
+    provider = provider or get_quote_provider()
+    if provider is None:
+        raise ValueError("No quote provider configured")
+
+    docs = [doc for doc in db.collection_group("assets").stream() if (doc.to_dict() or {}).get("holdings")]
+    assets = [{**doc.to_dict(), "id": doc.reference.path} for doc in docs]
+    values = ValuationEngine(provider).revalue(assets)
+
+    changed: Dict[str, list] = {}
+    for doc, asset in zip(docs, assets):
+        value = values.get(asset["id"])
+        if value is not None and round(asset.get("value", 0) or 0, 2) != value:
+            # users/{uid}/assets/{id}
+            changed.setdefault(doc.reference.parent.parent.id, []).append((doc.reference, value))
+
+    now = datetime.now()
+    for user_id, updates in changed.items():
+        # Leave room in each batch for the user's version bump
+        for start in range(0, len(updates), MAX_BATCH_WRITES - 1):
+            batch = db.batch()
+            for ref, value in updates[start:start + MAX_BATCH_WRITES - 1]:
+                batch.update(ref, {"value": value, "updated_at": now})
+            batch.set(db_version_ref(db, user_id), version_bump(["assets"]), merge=True)
+            resilience.call("valuation.revalue_all_users", lambda timeout: batch.commit(retry=None, timeout=timeout), idempotent=False)
+    return sum(len(updates) for updates in changed.values())
+
+
+def main():
+    """Revalue every user's holdings from the command line, e.g. from a scheduled job"""
+    import argparse
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
+    parser = argparse.ArgumentParser(description="Revalue the holdings of every user's assets")
+    parser.add_argument("--key", default="firestore-key.json", help="Service account key")
+    args = parser.parse_args()
+
+    app = firebase_admin.initialize_app(credentials.Certificate(args.key))
+    updated = revalue_all_users(firestore.client(app))
+    print(f"Updated {updated} asset values")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+import streamlit as st
+
+from . import resilience
+from ..utils.lazy import lazy_import
+from ..utils.metrics import REGISTRY
+from ..utils.profiling import traced
+
+firestore = lazy_import("firebase_admin.firestore")
+
+# Firestore rejects batches with more than 500 writes
+MAX_BATCH_WRITES = 500
+# How long the committer waits for more submissions to coalesce into one batch
+WRITE_COALESCE_SECONDS = float(os.environ.get("WRITE_COALESCE_SECONDS", "0.05"))
+
+_batches = REGISTRY.counter(
+    "finance_tracker_write_batches",
+    "Batches committed by the background write queue",
+    ["result"]
+)
+_write_seconds = REGISTRY.histogram(
+    "finance_tracker_write_batch_seconds",
+    "Time spent committing one background write batch"
+)
+
+
+@dataclass
+class WriteOp:
+    """One document write under a user's collections"""
+    user_id: str
+    collection: str
+    doc_id: str
+    kind: str  # "set", "update" or "delete"
+    data: Dict[str, Any] = field(default_factory=dict)
+    merge: bool = False
+
+    def reference(self, db):
+        return db.collection("users").document(self.user_id).collection(self.collection).document(self.doc_id)
+
+
+@dataclass
+class WriteRequest:
+    """Writes that must commit together, plus what to show the user while they are in flight"""
+    ops: List[WriteOp]
+    label: str
+    tracker: "WriteTracker"
+    # Server time the batch updated the user's version document; set once committed
+    committed_at: Optional[Any] = None
+
+    @property
+    def user_id(self) -> str:
+        return self.ops[0].user_id if self.ops else ""
+
+
+class WriteTracker:
+    """Writes a session has queued but not yet seen committed, and failures to report
+
+    The committer thread updates this object directly; it lives in session state so
+    the next rerun can overlay pending writes and surface errors. Committed writes
+    stay overlaid until the session loads a data version that includes them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[int, WriteRequest] = {}
+        self._failures: List[str] = []
+        self._next_id = 0
+        # Changes whenever the set of pending writes does, so caches can key on it
+        self.revision = 0
+
+    def add(self, request: WriteRequest) -> int:
+        with self._lock:
+            self._next_id += 1
+            self.revision += 1
+            self._pending[self._next_id] = request
+            return self._next_id
+
+    def finish(self, request_id: int, error: Optional[Exception] = None, committed_at: Optional[Any] = None):
+        """Record the outcome of a request; committed writes stay overlaid until settled"""
+        with self._lock:
+            request = self._pending.get(request_id)
+            if request is None:
+                return
+            self.revision += 1
+            if error or committed_at is None:
+                del self._pending[request_id]
+                if error:
+                    self._failures.append(f"{request.label} failed: {error}")
+            else:
+                request.committed_at = committed_at
+
+    def settle(self, version: Optional[Dict[str, Any]]):
+        """Stop overlaying committed writes that a loaded data version already includes
+
+        Every batch updates the user's version document, so a version document at
+        least as new as a batch's write was read after that batch was applied.
+        """
+        updated_at = version.get("updated_at") if version else None
+        if updated_at is None:
+            return
+        with self._lock:
+            settled = [
+                request_id for request_id, request in self._pending.items()
+                if request.committed_at is not None and request.committed_at <= updated_at
+            ]
+            for request_id in settled:
+                del self._pending[request_id]
+            if settled:
+                self.revision += 1
+
+    @property
+    def pending_count(self) -> int:
+        """Writes still waiting to be committed"""
+        with self._lock:
+            return sum(1 for request in self._pending.values() if request.committed_at is None)
+
+    def pop_failures(self) -> List[str]:
+        with self._lock:
+            failures, self._failures = self._failures, []
+            return failures
+
+    def _ops_for(self, collection: str) -> List[WriteOp]:
+        with self._lock:
+            return [op for request in self._pending.values() for op in request.ops if op.collection == collection]
+
+    def apply(self, collection: str, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Overlay pending writes onto freshly loaded documents of a collection"""
+        ops = self._ops_for(collection)
+        if not ops:
+            return documents
+
+        by_id = {d.get("id"): d for d in documents}
+        order = [d.get("id") for d in documents]
+        for op in ops:
+            if op.kind == "delete":
+                by_id.pop(op.doc_id, None)
+                continue
+            if op.kind == "update" and op.doc_id not in by_id:
+                # Firestore refuses updates to missing documents
+                continue
+            base = by_id.get(op.doc_id, {}) if (op.kind == "update" or op.merge) else {}
+            by_id[op.doc_id] = {**_merge(base, op.data), "id": op.doc_id}
+            if op.doc_id not in order:
+                order.append(op.doc_id)
+        return [by_id[doc_id] for doc_id in order if doc_id in by_id]
+
+    def apply_document(self, collection: str, doc_id: str, document: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Overlay pending writes onto a single freshly loaded document"""
+        for op in self._ops_for(collection):
+            if op.doc_id != doc_id:
+                continue
+            if op.kind == "delete":
+                document = None
+            elif op.kind == "update":
+                document = _merge(document, op.data) if document is not None else None
+            elif op.merge:
+                document = _merge(document or {}, op.data)
+            else:
+                document = _merge({}, op.data)
+        return document
+
+
+def _merge(document: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply written fields to a local copy of a document"""
+    merged = dict(document)
+    for key, value in data.items():
+        if type(value).__name__ == "ArrayUnion":
+            current = list(merged.get(key) or [])
+            merged[key] = current + [v for v in value.values if v not in current]
+        elif type(value).__name__ == "Increment":
+            merged[key] = (merged.get(key) or 0) + value.value
+        elif not type(value).__module__.startswith("google.cloud.firestore"):
+            merged[key] = value
+    return merged
+
+
+def version_bump(collections) -> Dict[str, Any]:
+    """Fields that bump a user's metadata/version document for writes to some collections"""
+    return {
+        "version": firestore.Increment(1),
+        "collections": {collection: firestore.Increment(1) for collection in collections},
+        "updated_at": datetime.now()
+    }
+
+
+class WriteQueue:
+    """Process-wide background committer; writes queued close together share one batch"""
+
+    def __init__(self, db):
+        self.db = db
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="firestore-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, ops: List[WriteOp], label: str, tracker: WriteTracker) -> int:
+        """Queue writes that must commit atomically and return immediately"""
+        request = WriteRequest(ops, label, tracker)
+        request_id = tracker.add(request)
+        self._queue.put((request_id, request))
+        return request_id
+
+    def _run(self):
+        while True:
+            group = [self._queue.get()]
+            # Every request may add a version bump for its user to the batch
+            size = len(group[0][1].ops) + 1
+            # Coalesce requests that arrive together, keeping each request whole
+            deadline = time.monotonic() + WRITE_COALESCE_SECONDS
+            while size < MAX_BATCH_WRITES:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                group.append(item)
+                size += len(item[1].ops) + 1
+            for batch in _user_batches(group):
+                self._commit(batch)
+
+    @traced("write_queue.commit")
+    def _commit(self, group: List[tuple]):
+        started = time.perf_counter()
+        error = committed_at = None
+        try:
+            committed_at = self._commit_batch(group)
+            _batches.inc(result="ok")
+        except resilience.FirestoreUnavailable as e:
+            # The batch may or may not have been applied, so it is not resent
+            error = e
+            _batches.inc(result="error")
+        except Exception as e:
+            error = e
+            _batches.inc(result="error")
+            if len(group) > 1:
+                # Firestore refused the whole batch, so nothing was applied; commit the
+                # requests one at a time so only the one at fault fails
+                _write_seconds.observe(time.perf_counter() - started)
+                for item in group:
+                    self._commit([item])
+                return
+        _write_seconds.observe(time.perf_counter() - started)
+        for request_id, request in group:
+            request.tracker.finish(request_id, error, committed_at)
+
+    def _commit_batch(self, group: List[tuple]):
+        """Commit requests of one user; returns the update time of their version document"""
+        batch = self.db.batch()
+        touched: Dict[str, set] = {}
+        for _, request in group:
+            for op in request.ops:
+                touched.setdefault(op.user_id, set()).add(op.collection)
+                ref = op.reference(self.db)
+                if op.kind == "delete":
+                    batch.delete(ref)
+                elif op.kind == "update":
+                    batch.update(ref, op.data)
+                else:
+                    batch.set(ref, op.data, merge=op.merge)
+        for user_id, collections in touched.items():
+            version_ref = db_version_ref(self.db, user_id)
+            batch.set(version_ref, version_bump(sorted(collections)), merge=True)
+        # Increments make a batch unsafe to resend unless it was rejected outright
+        results = resilience.call("write_queue.commit", lambda timeout: batch.commit(retry=None, timeout=timeout), idempotent=False)
+        # The version document is written last
+        return results[-1].update_time if results else None
+
+
+def _user_batches(group: List[tuple]):
+    """Split coalesced requests into one batch per user, each within Firestore's write limit"""
+    by_user: Dict[str, List[tuple]] = {}
+    for item in group:
+        by_user.setdefault(item[1].user_id, []).append(item)
+    for items in by_user.values():
+        batch, size = [], 0
+        for item in items:
+            writes = len(item[1].ops) + 1
+            if batch and size + writes > MAX_BATCH_WRITES:
+                yield batch
+                batch, size = [], 0
+            batch.append(item)
+            size += writes
+        yield batch
+
+
+def db_version_ref(db, user_id: str):
+    """Reference to a user's metadata/version document"""
+    return db.collection("users").document(user_id).collection("metadata").document("version")
+
+
+_write_queue = None
+_write_queue_lock = threading.Lock()
+
+
+def get_write_queue(db) -> WriteQueue:
+    """Get the process-wide write queue"""
+    global _write_queue
+    if _write_queue is None:
+        with _write_queue_lock:
+            if _write_queue is None:
+                _write_queue = WriteQueue(db)
+    return _write_queue
+
+
+def get_write_tracker() -> WriteTracker:
+    """Get the session's write tracker"""
+    if "write_tracker" not in st.session_state:
+        st.session_state.write_tracker = WriteTracker()
+    return st.session_state.write_tracker
+
@@ -1,16 +1,24 @@
 import streamlit as st
+from datetime import datetime
 from typing import List, Dict, Any, Callable
 
+from ..utils.formatting import format_currency
 from .tabs.overview import display_overview_tab
 from .tabs.budget import display_budget_tab
 from .tabs.transactions import display_transactions_tab
+from .tabs.notebooks import display_notebooks_tab
 from .tabs.assets import display_assets_tab
 
 __all__ = [
     "render_sidebar_dashboard",
+    "render_write_status",
+    "render_sync_status",
+    "render_usage",
+    "render_skeleton",
     "display_overview_tab",
     "display_budget_tab",
     "display_transactions_tab",
+    "display_notebooks_tab",
     "display_assets_tab",
     "render_dashboard"
 ]
@@ -48,6 +56,65 @@ def render_sidebar_dashboard(
                         key=f"delete_notebook_{notebook['id']}",
                         on_click=lambda n=notebook: on_delete_notebook(n["id"])
                     )
+                render_notebook_progress(notebook)
+
+def render_notebook_progress(notebook: Dict[str, Any]):
+    """Show a notebook's spend against its budget from the counters on the notebook itself"""
+    if "transaction_count" not in notebook:
+        return
+    count = notebook.get("transaction_count", 0)
+    spent = notebook.get("expense_total", 0.0)
+    budget = float(notebook.get("budget") or 0)
+    summary = f"{count} transaction{'s' if count != 1 else ''}"
+    if budget > 0:
+        st.progress(min(spent / budget, 1.0), text=f"{format_currency(spent)} of {format_currency(budget)}")
+        if spent > budget:
+            summary += f" · {format_currency(spent - budget)} over budget"
+    elif spent:
+        summary += f" · {format_currency(spent)} spent"
+    st.caption(summary)
+
+def render_write_status(tracker):
+    """Report background saves that are still running or have failed"""
+    for failure in tracker.pop_failures():
+        st.error(f"{failure}. Your change was not saved; please try again.")
+    
+    pending = tracker.pending_count
+    if pending:
+        st.sidebar.caption(f"Saving {pending} change{'s' if pending != 1 else ''}…")
+
+def render_skeleton():
+    """Placeholder layout shown while a signed-in user's data is still loading"""
+    st.caption("Loading your data…")
+    st.tabs(["Overview", "Budget", "Notebooks", "Assets", "Transactions"])
+    for col in st.columns(3):
+        with col:
+            st.metric("Loading…", "—")
+    for height in (240, 160):
+        st.markdown(
+            f'<div style="height:{height}px;border-radius:0.5rem;margin-bottom:1rem;'
+            'background:rgba(151,166,195,0.15);"></div>',
+            unsafe_allow_html=True
+        )
+
+def render_sync_status(status):
+    """Show when the data on screen was last confirmed against the database"""
+    if status.error:
+        st.sidebar.caption(f"⚠️ Showing saved data; syncing failed: {status.error}")
+    elif status.revalidating:
+        st.sidebar.caption("Syncing…")
+    elif status.synced_at:
+        seconds = int((datetime.now() - status.synced_at).total_seconds())
+        ago = "just now" if seconds < 5 else f"{seconds}s ago" if seconds < 60 else f"{seconds // 60} min ago"
+        st.sidebar.caption(f"Last synced {ago}")
+
+def render_usage(meter):
+    """Warn when the session is close to or past its database quota"""
+    levels = {meter.level("read"), meter.level("write")}
+    if "hard" in levels:
+        st.sidebar.caption("⚠️ Too many database requests; changes are paused for a minute")
+    elif "soft" in levels:
+        st.sidebar.caption("Showing saved data to limit database reads")
 
 def render_dashboard(
     transactions: List[Dict[str, Any]],
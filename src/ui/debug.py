@@ -0,0 +1,57 @@
+import streamlit as st
+
+from ..utils import profiling
+
+
+def render_profiler_panel():
+    """Render the profiling panel in the sidebar"""
+    if not profiling.PROFILING_ENABLED:
+        return
+
+    traces = st.session_state.get("profiler_traces", [])
+
+    with st.sidebar:
+        with st.expander("🛠️ Performance", expanded=False):
+            if not traces:
+                st.caption("No reruns recorded yet")
+                return
+
+            last = traces[-1]
+            st.caption(f"Last rerun: {last.duration_ms:.1f} ms across {len(last.spans)} spans")
+
+            rows = [
+                {
+                    "Span": ("  " * s.depth) + s.name,
+                    "ms": round(s.duration_ms, 2),
+                    "Docs": s.attrs.get("docs", ""),
+                    "Bytes": s.attrs.get("bytes", ""),
+                }
+                for s in last.spans
+            ]
+            st.dataframe(rows, hide_index=True, use_container_width=True)
+
+            firebase = st.session_state.get("firebase_instance")
+            if firebase is not None:
+                usage = firebase.meter.summary()
+                st.caption(
+                    f"Firestore this session: {sum(u.get('read', 0) for u in usage.values())} reads, "
+                    f"{sum(u.get('write', 0) + u.get('delete', 0) for u in usage.values())} writes"
+                )
+                st.dataframe(
+                    [{"Operation": operation, **counts} for operation, counts in sorted(usage.items())],
+                    hide_index=True,
+                    use_container_width=True
+                )
+
+            st.download_button(
+                "Chrome trace (JSON)",
+                data=profiling.to_chrome_trace(traces),
+                file_name="finance-tracker-trace.json",
+                mime="application/json"
+            )
+            st.download_button(
+                "OpenMetrics",
+                data=profiling.to_openmetrics(),
+                file_name="finance-tracker-metrics.txt",
+                mime="text/plain"
+            )
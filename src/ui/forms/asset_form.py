@@ -1,8 +1,13 @@
 import streamlit as st
+from datetime import date
 from typing import List, Dict, Any, Optional, Callable
 
+from ...services.categories import CategoryService
+from ...services.valuation import parse_holdings, format_holdings
+from .category_field import category_search, category_field
+
 def asset_form(
-    categories: List[str],
+    category_service: CategoryService,
     existing_data: Optional[Dict[str, Any]],
     on_submit: Callable[[Dict[str, Any]], None]
 ):
@@ -13,6 +18,7 @@ def asset_form(
     """, unsafe_allow_html=True)
     
     st.subheader("Asset Details")
+    category_query = category_search("asset_form")
     
     with st.form("asset_form"):
         # Asset name
@@ -31,17 +37,33 @@ def asset_form(
             help="Current value of the asset"
         )
         
-        # Asset category
-        category_options = [""] + categories if categories else [""]
-        category = st.selectbox(
-            "Category",
-            options=category_options,
-            index=category_options.index(existing_data.get("category", "")) if existing_data and existing_data.get("category") in category_options else 0,
+        # Holdings for investment accounts
+        holdings_text = st.text_input(
+            "Holdings (optional)",
+            value=format_holdings(existing_data.get("holdings", {})) if existing_data else "",
+            placeholder="e.g., AAPL: 50, MSFT: 40",
+            help="Ticker and quantity pairs; the value is recomputed from current prices"
         )
         
-        # New category input if "Other" is selected
-        if not category:
-            category = st.text_input("New Category", placeholder="Enter a new category")
+        # Certificate of deposit terms
+        with st.expander("Certificate of Deposit (optional)", expanded=bool(existing_data and existing_data.get("maturity_date"))):
+            interest_rate = st.number_input(
+                "Interest Rate (APY %)",
+                value=float(existing_data.get("interest_rate") or 0) if existing_data else 0.0,
+                min_value=0.0,
+                format="%.2f"
+            )
+            opened_date = st.date_input(
+                "Opened",
+                value=date.fromisoformat(existing_data["opened_date"]) if existing_data and existing_data.get("opened_date") else date.today()
+            )
+            maturity_date = st.date_input(
+                "Maturity Date",
+                value=date.fromisoformat(existing_data["maturity_date"]) if existing_data and existing_data.get("maturity_date") else None
+            )
+        
+        # Asset category
+        category = category_field(category_service, category_query, existing_data.get("category") if existing_data else None)
         
         # Description
         description = st.text_area(
@@ -60,13 +82,27 @@ def asset_form(
                 if not category:
                     st.error("Please select or enter a category")
                     return
+                try:
+                    holdings = parse_holdings(holdings_text)
+                except ValueError as e:
+                    st.error(str(e))
+                    return
                 
+                # Cleared fields are written empty, since saving an existing asset updates it in place
                 asset_data = {
                     "name": name,
                     "value": value,
                     "category": category,
-                    "description": description
+                    "description": description,
+                    "holdings": holdings,
+                    "interest_rate": None,
+                    "opened_date": None,
+                    "maturity_date": None
                 }
+                if maturity_date:
+                    asset_data["interest_rate"] = interest_rate
+                    asset_data["opened_date"] = opened_date.strftime("%Y-%m-%d")
+                    asset_data["maturity_date"] = maturity_date.strftime("%Y-%m-%d")
                 on_submit(asset_data)
         
         with col2:
@@ -1,8 +1,11 @@
 import streamlit as st
 from typing import List, Dict, Any, Optional, Callable
 
+from ...services.categories import CategoryService
+from .category_field import category_search, category_field
+
 def budget_form(
-    categories: List[str],
+    category_service: CategoryService,
     existing_budgets: Dict[str, Any],
     existing_data: Optional[Dict[str, Any]],
     on_submit: Callable[[Dict[str, Any]], None]
@@ -14,20 +17,12 @@ def budget_form(
     """, unsafe_allow_html=True)
     
     st.subheader("Budget Details")
+    category_query = category_search("budget_form")
     
     with st.form("budget_form"):
         # Category selection
-        category_options = [""] + categories if categories else [""]
         selected_category = existing_data.get("category") if existing_data else ""
-        category = st.selectbox(
-            "Category",
-            options=category_options,
-            index=category_options.index(selected_category) if selected_category in category_options else 0,
-        )
-        
-        # New category input if empty is selected
-        if not category:
-            category = st.text_input("New Category", placeholder="Enter a new category")
+        category = category_field(category_service, category_query, selected_category)
         
         # Monthly budget
         current_monthly = (
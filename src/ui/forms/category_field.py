@@ -0,0 +1,48 @@
+import streamlit as st
+from typing import Optional
+
+from ...services.categories import CategoryService
+
+# Categories offered when the list is narrowed by a typed prefix
+CATEGORY_SUGGESTIONS = 8
+
+
+def category_search(form_key: str) -> str:
+    """Filter box shown above a form; widgets inside a form only rerun on submit, so this one sits outside"""
+    return st.text_input(
+        "Find category",
+        key=f"{form_key}_category_query",
+        placeholder="Type the start of any word in a category"
+    ).strip()
+
+
+def category_field(
+    category_service: CategoryService,
+    query: str,
+    current: Optional[str] = None,
+    help: Optional[str] = None
+) -> str:
+    """Category picker narrowed to the trie suggestions for the query, with a free-text fallback
+
+    The current category stays selectable even when it does not match the query; without one,
+    the best suggestion is preselected.
+    """
+    options = category_service.suggest(query, limit=CATEGORY_SUGGESTIONS) if query else category_service.ranked()
+    if current and current not in options:
+        options = [current] + options
+    category_options = [""] + options
+    if current in category_options:
+        index = category_options.index(current)
+    else:
+        index = 1 if query and options else 0
+    category = st.selectbox("Category", options=category_options, index=index)
+
+    # New category input if empty is selected
+    if not category:
+        category = st.text_input(
+            "New Category",
+            value=query if query and not options else "",
+            placeholder="Enter a new category",
+            help=help
+        )
+    return category
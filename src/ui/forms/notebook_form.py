@@ -1,8 +1,12 @@
 import streamlit as st
+from datetime import date, timedelta
 from typing import List, Dict, Any, Optional, Callable
 
+from ...services.categories import CategoryService
+from .category_field import category_search, category_field
+
 def notebook_form(
-    categories: List[str],
+    category_service: CategoryService,
     existing_data: Optional[Dict[str, Any]],
     on_submit: Callable[[Optional[Dict[str, Any]]], None]
 ):
@@ -13,6 +17,7 @@ def notebook_form(
     """, unsafe_allow_html=True)
     
     st.subheader("Notebook Details")
+    category_query = category_search("notebook_form")
     
     with st.form("notebook_form"):
         # Notebook name
@@ -23,16 +28,7 @@ def notebook_form(
         ).strip()
         
         # Category
-        category_options = [""] + categories if categories else [""]
-        category = st.selectbox(
-            "Category",
-            options=category_options,
-            index=category_options.index(existing_data.get("category", "")) if existing_data and existing_data.get("category") in category_options else 0,
-        )
-        
-        # New category input if empty is selected
-        if not category:
-            category = st.text_input("New Category", placeholder="Enter a new category")
+        category = category_field(category_service, category_query, existing_data.get("category") if existing_data else None)
         
         # Description
         description = st.text_area(
@@ -41,6 +37,32 @@ def notebook_form(
             placeholder="Add details about this notebook"
         ).strip()
         
+        # Optional budget over a date window
+        budget = st.number_input(
+            "Budget",
+            min_value=0.0,
+            step=50.0,
+            format="%.2f",
+            value=float(existing_data.get("budget") or 0) if existing_data else 0.0,
+            help="Leave at 0 for no budget"
+        )
+        has_window = st.checkbox(
+            "Limit to dates",
+            value=bool(existing_data and existing_data.get("start_date")),
+            help="Track the budget between a start and end date"
+        )
+        col1, col2 = st.columns(2)
+        with col1:
+            start_date = st.date_input(
+                "Start Date",
+                value=date.fromisoformat(existing_data["start_date"]) if existing_data and existing_data.get("start_date") else date.today()
+            )
+        with col2:
+            end_date = st.date_input(
+                "End Date",
+                value=date.fromisoformat(existing_data["end_date"]) if existing_data and existing_data.get("end_date") else date.today() + timedelta(days=30)
+            )
+        
         # Form buttons
         col1, col2 = st.columns(2)
         with col1:
@@ -51,11 +73,17 @@ def notebook_form(
                 if not category:
                     st.error("Please select or enter a category")
                     return
+                if has_window and end_date < start_date:
+                    st.error("End date must be on or after the start date")
+                    return
                 
                 notebook_data = {
                     "name": name,
                     "category": category,
-                    "description": description
+                    "description": description,
+                    "budget": budget or None,
+                    "start_date": start_date.strftime("%Y-%m-%d") if has_window else None,
+                    "end_date": end_date.strftime("%Y-%m-%d") if has_window else None
                 }
                 on_submit(notebook_data)
         
@@ -2,11 +2,15 @@ import streamlit as st
 from datetime import datetime, date
 from typing import Optional, Dict, Any, List, Callable
 
+from ...services.categories import CategoryService
+from .category_field import category_search, category_field
+
 def transaction_form(
     notebooks: List[Dict[str, Any]],
-    categories: List[str],
+    category_service: CategoryService,
     existing_data: Optional[Dict[str, Any]],
-    on_submit: Callable[[Optional[Dict[str, Any]]], None]
+    on_submit: Callable[[Optional[Dict[str, Any]]], None],
+    categorize: Optional[Callable[[str, float, Optional[str]], Optional[str]]] = None
 ):
     """Form for adding/editing a transaction"""
     st.markdown("""
@@ -16,14 +20,26 @@ def transaction_form(
     
     st.subheader("Transaction Details")
     
+    # Description sits outside the form, which only reruns on submit, so a category
+    # can be suggested as soon as it is entered
+    description = st.text_input(
+        "Description",
+        value=existing_data.get("description", "") if existing_data else "",
+        key=f"transaction_form_description_{existing_data.get('id', 'new') if existing_data else 'new'}",
+        placeholder="e.g., Groceries at Trader Joe's"
+    ).strip()
+    suggested = None
+    if description and categorize and not (existing_data and existing_data.get("category")):
+        suggested = categorize(
+            description,
+            existing_data.get("amount", 0.0) if existing_data else 0.0,
+            existing_data.get("notebook_id") if existing_data else None
+        )
+        if suggested:
+            st.caption(f"Suggested category: {suggested}")
+    category_query = category_search("transaction_form")
+    
     with st.form("transaction_form"):
-        # Description
-        description = st.text_input(
-            "Description",
-            value=existing_data.get("description", "") if existing_data else "",
-            placeholder="e.g., Groceries at Trader Joe's"
-        ).strip()
-        
         # Amount and type
         col1, col2 = st.columns([2, 1])
         with col1:
@@ -48,17 +64,13 @@ def transaction_form(
         )
         
         # Category
-        category_options = [""] + categories if categories else [""]
-        category = st.selectbox(
-            "Category",
-            options=category_options,
-            index=category_options.index(existing_data.get("category", "")) if existing_data and existing_data.get("category") in category_options else 0,
+        category = category_field(
+            category_service,
+            category_query,
+            (existing_data.get("category") if existing_data else None) or suggested,
+            help="Leave empty to pick a category from your rules and past transactions" if categorize else None
         )
         
-        # New category input if empty is selected
-        if not category:
-            category = st.text_input("New Category", placeholder="Enter a new category")
-        
         # Notebook selection
         if notebooks:
             notebook_options = [""] + [n["name"] for n in notebooks]
@@ -90,6 +102,13 @@ def transaction_form(
                 if not description:
                     st.error("Please enter a description")
                     return
+                # The suggestion only knew the description; decide again with the amount and notebook
+                if categorize and (not category or category == suggested):
+                    category = categorize(
+                        description,
+                        -amount if is_expense else amount,
+                        notebook_id if notebooks and selected_notebook else None
+                    ) or category
                 if not category:
                     st.error("Please select or enter a category")
                     return
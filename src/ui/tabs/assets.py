@@ -1,15 +1,97 @@
 import streamlit as st
-import pandas as pd
-import altair as alt
 from typing import List, Dict, Any, Callable
+from ...services.fixed_income import current_values, project_cds, maturity_ladder
+from ...services.net_worth_history import HISTORY_RANGES, history_range
 from ...utils.formatting import format_currency
+from ...utils.lazy import lazy_import
+from ...utils.profiling import traced, span
 
+pd = lazy_import("pandas")
+alt = lazy_import("altair")
+
+@traced("ui.render_net_worth_history")
+def render_net_worth_history(on_load_history: Callable[[Any, Any], Any]):
+    """Render the net worth history line chart"""
+    st.subheader("Net Worth History")
+    selection = st.radio(
+        "History Range",
+        HISTORY_RANGES,
+        index=1,
+        horizontal=True,
+        label_visibility="collapsed",
+        key="net_worth_history_range"
+    )
+    
+    start_date, end_date = history_range(selection)
+    history = on_load_history(start_date, end_date)
+    if history is None or history.empty:
+        st.info("No history yet. Net worth is recorded whenever your assets change.")
+        return
+    
+    with span("altair_spec"):
+        chart = alt.Chart(history).mark_line().encode(
+            x=alt.X("date:T", title="Date"),
+            y=alt.Y("Net Worth:Q", title="Net Worth"),
+            tooltip=[
+                alt.Tooltip("date:T", title="Date"),
+                alt.Tooltip("Net Worth:Q", title="Net Worth", format="$,.2f")
+            ]
+        ).properties(height=250)
+    
+    with span("emit"):
+        st.altair_chart(chart, use_container_width=True)
+
+@traced("ui.render_cd_projections")
+def render_cd_projections(assets: List[Dict[str, Any]]):
+    """Render accrued values and the maturity ladder for all CDs"""
+    projections = project_cds(assets)
+    if projections.empty:
+        return
+    
+    st.subheader("Certificates of Deposit")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Principal", format_currency(projections["principal"].sum()))
+    with col2:
+        st.metric("Accrued Value", format_currency(projections["accrued_value"].sum()))
+    with col3:
+        st.metric("Value at Maturity", format_currency(projections["maturity_value"].sum()))
+    
+    ladder = maturity_ladder(assets)
+    with span("altair_spec"):
+        chart = alt.Chart(ladder).mark_bar().encode(
+            x=alt.X("month:T", title="Month"),
+            y=alt.Y("maturing:Q", title="Maturing"),
+            tooltip=[
+                alt.Tooltip("month:T", title="Month", format="%b %Y"),
+                alt.Tooltip("maturing:Q", title="Maturing", format="$,.2f"),
+                alt.Tooltip("value:Q", title="CD Value", format="$,.2f")
+            ]
+        ).properties(height=200)
+    
+    with span("emit"):
+        st.altair_chart(chart, use_container_width=True)
+        st.dataframe(
+            projections[["name", "rate", "maturity", "accrued_value", "maturity_value", "days_to_maturity"]].rename(columns={
+                "name": "Name",
+                "rate": "APY %",
+                "maturity": "Matures",
+                "accrued_value": "Accrued",
+                "maturity_value": "At Maturity",
+                "days_to_maturity": "Days Left"
+            }),
+            hide_index=True,
+            use_container_width=True
+        )
+
+@traced("ui.display_assets_tab")
 def display_assets_tab(
     assets: List[Dict[str, Any]],
     categories: List[str],
     on_add_asset: Callable[[], None],
     on_edit_asset: Callable[[Dict[str, Any]], None],
-    on_delete_asset: Callable[[Dict[str, Any]], None]
+    on_delete_asset: Callable[[Dict[str, Any]], None],
+    on_load_history: Callable[[Any, Any], Any] = None
 ):
     """Display the assets tab content"""
     # Add asset button
@@ -19,7 +101,8 @@ def display_assets_tab(
         st.info("No assets added yet. Click the button above to add your first asset!")
         return
     
-    # Group assets by category
+    # Group assets by category, valuing CDs at their accrued value
+    values = current_values(assets)
     assets_by_category = {}
     total_value = 0
     
@@ -28,16 +111,20 @@ def display_assets_tab(
         if category not in assets_by_category:
             assets_by_category[category] = []
         assets_by_category[category].append(asset)
-        total_value += asset.get("value", 0)
+        total_value += values.get(asset.get("id"), asset.get("value", 0))
     
     # Display total value
     st.metric("Total Assets Value", format_currency(total_value))
     
+    # Net worth history
+    if on_load_history:
+        render_net_worth_history(on_load_history)
+    
     # Asset distribution chart
     st.subheader("Asset Distribution")
     chart_data = []
     for category, category_assets in assets_by_category.items():
-        category_value = sum(a.get("value", 0) for a in category_assets)
+        category_value = sum(values.get(a.get("id"), a.get("value", 0)) for a in category_assets)
         chart_data.append({
             "category": category,
             "value": category_value,
@@ -45,20 +132,26 @@ def display_assets_tab(
         })
     
     if chart_data:
-        df = pd.DataFrame(chart_data)
+        with span("dataframe"):
+            df = pd.DataFrame(chart_data)
         
         # Pie chart
-        pie_chart = alt.Chart(df).mark_arc().encode(
-            theta=alt.Theta(field="value", type="quantitative"),
-            color=alt.Color(field="category", type="nominal"),
-            tooltip=[
-                alt.Tooltip("category:N", title="Category"),
-                alt.Tooltip("value:Q", title="Value", format="$,.2f"),
-                alt.Tooltip("percentage:Q", title="Percentage", format=".1f")
-            ]
-        ).properties(width=400, height=400)
+        with span("altair_spec"):
+            pie_chart = alt.Chart(df).mark_arc().encode(
+                theta=alt.Theta(field="value", type="quantitative"),
+                color=alt.Color(field="category", type="nominal"),
+                tooltip=[
+                    alt.Tooltip("category:N", title="Category"),
+                    alt.Tooltip("value:Q", title="Value", format="$,.2f"),
+                    alt.Tooltip("percentage:Q", title="Percentage", format=".1f")
+                ]
+            ).properties(width=400, height=400)
         
-        st.altair_chart(pie_chart, use_container_width=True)
+        with span("emit"):
+            st.altair_chart(pie_chart, use_container_width=True)
+    
+    # Certificates of deposit
+    render_cd_projections(assets)
     
     # Display assets by category
     st.subheader("Assets by Category")
@@ -71,7 +164,7 @@ def display_assets_tab(
                     if asset.get("description"):
                         st.write(asset["description"])
                 with col2:
-                    st.write(format_currency(asset.get("value", 0)))
+                    st.write(format_currency(values.get(asset.get("id"), asset.get("value", 0))))
                 with col3:
                     col3_1, col3_2 = st.columns(2)
                     with col3_1:
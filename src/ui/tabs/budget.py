@@ -1,16 +1,22 @@
 import streamlit as st
-import pandas as pd
-import altair as alt
-from datetime import datetime, timedelta, date
-from typing import List, Dict, Any, Callable
+from datetime import date, timedelta
+from typing import List, Dict, Any, Callable, Optional
 
+from ...services.budget_engine import TIMEFRAMES, budget_period, get_budget_engine
+from ...services.recurring import get_recurring_index
 from ...utils.formatting import format_currency
+from ...utils.lazy import lazy_import
+from ...utils.profiling import traced, span
+
+pd = lazy_import("pandas")
+alt = lazy_import("altair")
 
 def calculate_budget_progress(expenses: List[Dict[str, Any]], budget: float) -> float:
     """Calculate the progress towards a budget"""
     total_spent = sum(abs(expense["amount"]) for expense in expenses)
     return (total_spent / budget * 100) if budget > 0 else 0
 
+@traced("ui.render_budget_progress")
 def render_budget_progress(category: str, spent: float, budget: float, on_edit_budget: Callable[[Dict[str, Any]], None]):
     """Render a budget progress bar for a category"""
     progress = (spent / budget * 100) if budget > 0 else 0
@@ -27,11 +33,13 @@ def render_budget_progress(category: str, spent: float, budget: float, on_edit_b
     with col3:
         st.button("✏️", key=f"edit_budget_{category}", on_click=lambda: on_edit_budget({"category": category}))
 
+@traced("ui.display_budget_tab")
 def display_budget_tab(
     transactions: List[Dict[str, Any]], 
     budgets: Dict[str, Any],
     on_add_budget: Callable[[], None],
-    on_edit_budget: Callable[[Dict[str, Any]], None]
+    on_edit_budget: Callable[[Dict[str, Any]], None],
+    data_version: Optional[str] = None
 ):
     """Display the budget tab content"""
     # Add budget button
@@ -42,54 +50,30 @@ def display_budget_tab(
     with col1:
         timeframe = st.radio(
             "Timeframe",
-            ["Current Month", "Current Week", "YTD", "Custom"],
+            list(TIMEFRAMES.keys()),
             horizontal=True,
             label_visibility="collapsed"
         )
     
     # Date range selector for custom timeframe
+    custom_range = None
     if timeframe == "Custom":
         with col2:
-            start_date, end_date = st.date_input(
+            selected_range = st.date_input(
                 "Date Range",
                 value=(date.today().replace(day=1), date.today()),
                 key="budget_date_range"
             )
-    else:
-        # Calculate date range based on timeframe
-        now = datetime.now()
-        if timeframe == "Current Month":
-            start_date = date(now.year, now.month, 1)
-            end_date = date.today()
-            current_budgets = budgets.get("monthly", {}).get("categories", {})
-            total_budget = budgets.get("monthly", {}).get("total", 0)
-        elif timeframe == "Current Week":
-            start_date = date.today() - timedelta(days=date.today().weekday())
-            end_date = date.today()
-            # Use prorated monthly budget for the week
-            current_budgets = {
-                category: budget / 4  # Approximate week as month/4
-                for category, budget in budgets.get("monthly", {}).get("categories", {}).items()
-            }
-            total_budget = budgets.get("monthly", {}).get("total", 0) / 4
-        else:  # YTD
-            start_date = date(now.year, 1, 1)
-            end_date = date.today()
-            current_budgets = budgets.get("annual", {}).get("categories", {})
-            total_budget = budgets.get("annual", {}).get("total", 0)
-    
-    filtered_transactions = [
-        t for t in transactions
-        if start_date <= datetime.strptime(t["date"], "%Y-%m-%d").date() <= end_date
-        and t["amount"] < 0  # Only expenses
-    ]
+        if len(selected_range) != 2:
+            st.info("Select a start and end date")
+            return
+        custom_range = tuple(selected_range)
     
-    # Group expenses by category
-    category_expenses = {}
-    for transaction in filtered_transactions:
-        category = transaction["category"]
-        amount = abs(transaction["amount"])
-        category_expenses[category] = category_expenses.get(category, 0) + amount
+    # All periods are evaluated together, so switching timeframes reuses the result
+    engine = get_budget_engine(transactions, budgets, data_version)
+    result = engine.evaluate(custom_range)[TIMEFRAMES[timeframe]]
+    current_budgets = result.budgets
+    category_expenses = result.actuals
     
     if not current_budgets:
         st.info("No budgets set yet. Click the button above to set your first budget!")
@@ -97,8 +81,20 @@ def display_budget_tab(
     
     # Display overall budget progress
     st.subheader("Overall Budget")
-    total_spent = sum(category_expenses.values())
-    render_budget_progress("Total", total_spent, total_budget, on_edit_budget)
+    render_budget_progress("Total", result.total_spent, result.total_budget, on_edit_budget)
+    
+    # Recurring expenses still expected before the budget window closes
+    _, window_end = budget_period(TIMEFRAMES[timeframe], result.start, result.end, engine.today)
+    if window_end > engine.today:
+        upcoming = get_recurring_index(transactions, data_version).upcoming(
+            engine.today + timedelta(days=1), window_end, expenses_only=True
+        )
+        expected = sum(abs(t["amount"]) for t in upcoming)
+        if expected:
+            st.caption(
+                f"{format_currency(expected)} more expected from recurring expenses by {window_end:%b %d}, "
+                f"for a projected {format_currency(result.total_spent + expected)}"
+            )
     
     # Display category budgets
     st.subheader("Category Budgets")
@@ -117,24 +113,27 @@ def display_budget_tab(
         ])
     
     if chart_data:
-        df = pd.DataFrame(chart_data)
-        chart = alt.Chart(df).mark_bar().encode(
-            x=alt.X("category:N", title="Category"),
-            y=alt.Y("amount:Q", title="Amount"),
-            color=alt.Color(
-                "type:N", 
-                scale=alt.Scale(
-                    domain=["Budget", "Actual"],
-                    range=["#4CAF50", "#2196F3"]
-                )
-            ),
-            tooltip=[
-                alt.Tooltip("category:N", title="Category"),
-                alt.Tooltip("type:N", title="Type"),
-                alt.Tooltip("amount:Q", title="Amount", format="$,.2f")
-            ]
-        ).properties(height=300)
+        with span("dataframe"):
+            df = pd.DataFrame(chart_data)
+        with span("altair_spec"):
+            chart = alt.Chart(df).mark_bar().encode(
+                x=alt.X("category:N", title="Category"),
+                y=alt.Y("amount:Q", title="Amount"),
+                color=alt.Color(
+                    "type:N", 
+                    scale=alt.Scale(
+                        domain=["Budget", "Actual"],
+                        range=["#4CAF50", "#2196F3"]
+                    )
+                ),
+                tooltip=[
+                    alt.Tooltip("category:N", title="Category"),
+                    alt.Tooltip("type:N", title="Type"),
+                    alt.Tooltip("amount:Q", title="Amount", format="$,.2f")
+                ]
+            ).properties(height=300)
         
-        st.altair_chart(chart, use_container_width=True)
+        with span("emit"):
+            st.altair_chart(chart, use_container_width=True)
     else:
         st.info("No budget data to display")
@@ -0,0 +1,117 @@
+import streamlit as st
+from typing import List, Dict, Any, Optional
+
+from ...services.notebook_budgets import NotebookBudget, get_notebook_budgets
+from ...utils.formatting import format_currency
+from ...utils.lazy import lazy_import
+from ...utils.profiling import traced, span
+
+pd = lazy_import("pandas")
+alt = lazy_import("altair")
+
+def _summary_row(summary: NotebookBudget) -> Dict[str, Any]:
+    return {
+        "Notebook": summary.name,
+        "Budget": summary.budget,
+        "Spent": summary.spent,
+        "Remaining": summary.remaining,
+        "Daily Rate": summary.daily_rate,
+        "Projected": summary.projected,
+        "Projected Overrun": summary.projected_overrun,
+        "Days Left": summary.days_left,
+        "Ends": summary.end
+    }
+
+@traced("ui.render_burn_down")
+def render_burn_down(summary: NotebookBudget):
+    """Render remaining budget per day against an even burn to zero"""
+    with span("dataframe"):
+        df = summary.burn_down.rename("Remaining").reset_index()
+        df["day"] = pd.to_datetime(df["day"])
+
+    with span("altair_spec"):
+        chart = alt.Chart(df).mark_line(point=len(df) < 60).encode(
+            x=alt.X("day:T", title="Date"),
+            y=alt.Y("Remaining:Q", title="Remaining Budget"),
+            tooltip=[alt.Tooltip("day:T", title="Date"), alt.Tooltip("Remaining:Q", format="$,.2f")]
+        )
+        if summary.end:
+            ideal = pd.DataFrame({
+                "day": pd.to_datetime([summary.start, summary.end]),
+                "Remaining": [summary.budget, 0.0]
+            })
+            chart += alt.Chart(ideal).mark_line(strokeDash=[4, 4], color="gray").encode(x="day:T", y="Remaining:Q")
+    with span("emit"):
+        st.altair_chart(chart, use_container_width=True)
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Spent", format_currency(summary.spent), f"{format_currency(summary.remaining)} left", delta_color="off")
+    with col2:
+        target = f"target {format_currency(summary.ideal_daily)}/day" if summary.ideal_daily else None
+        st.metric("Daily Run-Rate", format_currency(summary.daily_rate), target, delta_color="off")
+    with col3:
+        if summary.projected is None:
+            st.metric("Projected", "No end date")
+        else:
+            overrun = summary.projected_overrun
+            st.metric(
+                "Projected at End",
+                format_currency(summary.projected),
+                f"{format_currency(abs(overrun))} {'over' if overrun > 0 else 'under'}",
+                delta_color="inverse" if overrun > 0 else "normal"
+            )
+
+@traced("ui.display_notebooks_tab")
+def display_notebooks_tab(
+    notebooks: List[Dict[str, Any]],
+    transactions: List[Dict[str, Any]],
+    data_version: Optional[str] = None
+):
+    """Display budget tracking for notebooks with a budget"""
+    summaries = get_notebook_budgets(notebooks, transactions, data_version)
+    if not summaries:
+        st.info("Give a notebook a budget and a date window to track it here")
+        return
+
+    active = sorted(
+        (s for s in summaries.values() if s.status == "active"),
+        key=lambda s: -s.expected_overrun
+    )
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Active Notebooks", len(active))
+    with col2:
+        st.metric("Active Budget", format_currency(sum(s.budget for s in active)))
+    with col3:
+        st.metric("Projected Over Budget", sum(1 for s in active if s.expected_overrun > 0))
+
+    if active:
+        with span("dataframe"):
+            df = pd.DataFrame([_summary_row(s) for s in active])
+        money = st.column_config.NumberColumn(format="$%.2f")
+        with span("emit"):
+            st.dataframe(
+                df,
+                hide_index=True,
+                use_container_width=True,
+                column_config={
+                    column: money
+                    for column in ("Budget", "Spent", "Remaining", "Daily Rate", "Projected", "Projected Overrun")
+                }
+            )
+
+        names = {s.notebook_id: s.name for s in active}
+        selected = st.selectbox("Burn-down", list(names), format_func=names.get, key="notebook_burn_down")
+        render_burn_down(summaries[selected])
+    else:
+        st.caption("No notebook budget is running today")
+
+    others = [s for s in summaries.values() if s.status != "active"]
+    if others:
+        with st.expander(f"Upcoming and ended ({len(others)})"):
+            with span("dataframe"):
+                df = pd.DataFrame([{"Status": s.status.title(), **_summary_row(s)} for s in others])
+            with span("emit"):
+                st.dataframe(df, hide_index=True, use_container_width=True)
@@ -1,16 +1,20 @@
 import streamlit as st
-import pandas as pd
-import altair as alt
 from datetime import datetime, timedelta, date
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
+from ...services.forecast import EARNINGS_KEY, FORECAST_POLL_SECONDS, MIN_HISTORY_MONTHS, monthly_rollup, get_forecast
+from ...services.recurring import RecurringIndex, get_recurring_index
+from ...utils.dates import days_to_datetimes, transaction_day
 from ...utils.formatting import format_currency
+from ...utils.lazy import lazy_import
+from ...utils.profiling import traced, span
+
+pd = lazy_import("pandas")
+alt = lazy_import("altair")
 
 def filter_transactions_by_timeframe(transactions: List[Dict[str, Any]], timeframe: str, start_date: date, end_date: date) -> List[Dict[str, Any]]:
     """Filter transactions based on the selected timeframe"""
-    if timeframe == "Custom":
-        return [t for t in transactions if start_date <= datetime.strptime(t["date"], "%Y-%m-%d").date() <= end_date]
-    else:
+    if timeframe != "Custom":
         now = datetime.now()
         if timeframe == "Current Month":
             start_date = date(now.year, now.month, 1)
@@ -21,8 +25,10 @@ def filter_transactions_by_timeframe(transactions: List[Dict[str, Any]], timefra
         else:  # YTD
             start_date = date(now.year, 1, 1)
             end_date = date.today()
-        return [t for t in transactions if start_date <= datetime.strptime(t["date"], "%Y-%m-%d").date() <= end_date]
+    first, last = start_date.toordinal(), end_date.toordinal()
+    return [t for t in transactions if first <= transaction_day(t) <= last]
 
+@traced("ui.render_spending_distribution")
 def render_spending_distribution(expenses: List[Dict[str, Any]]):
     """Render the spending distribution donut chart"""
     if not expenses:
@@ -34,42 +40,50 @@ def render_spending_distribution(expenses: List[Dict[str, Any]]):
         category = expense["category"]
         category_totals[category] = category_totals.get(category, 0) + abs(expense["amount"])
     
-    source = pd.DataFrame({
-        "category": list(category_totals.keys()),
-        "amount": list(category_totals.values())
-    })
+    with span("dataframe"):
+        source = pd.DataFrame({
+            "category": list(category_totals.keys()),
+            "amount": list(category_totals.values())
+        })
     
-    chart = alt.Chart(source).mark_arc(innerRadius=50).encode(
-        theta=alt.Theta(field="amount", type="quantitative"),
-        color=alt.Color(field="category", type="nominal"),
-        tooltip=["category", alt.Tooltip("amount", format="$,.2f")]
-    )
+    with span("altair_spec"):
+        chart = alt.Chart(source).mark_arc(innerRadius=50).encode(
+            theta=alt.Theta(field="amount", type="quantitative"),
+            color=alt.Color(field="category", type="nominal"),
+            tooltip=["category", alt.Tooltip("amount", format="$,.2f")]
+        )
     
-    st.altair_chart(chart, use_container_width=True)
+    with span("emit"):
+        st.altair_chart(chart, use_container_width=True)
 
+@traced("ui.render_spending_trends")
 def render_spending_trends(expenses: List[Dict[str, Any]]):
     """Render the spending trends line chart"""
     if not expenses:
         st.info("No expenses to display")
         return
     
-    df = pd.DataFrame(expenses)
-    df["date"] = pd.to_datetime(df["date"])
-    df["amount"] = df["amount"].abs()
-    
-    # Group by date and category
-    daily_by_category = df.groupby([df["date"].dt.date, "category"])["amount"].sum().reset_index()
+    with span("dataframe"):
+        df = pd.DataFrame(expenses)
+        df["date"] = days_to_datetimes(transaction_day(t) for t in expenses)
+        df["amount"] = df["amount"].abs()
+        
+        # Group by date and category
+        daily_by_category = df.groupby([df["date"].dt.date, "category"])["amount"].sum().reset_index()
     
     # Create line chart
-    trend_chart = alt.Chart(daily_by_category).mark_line().encode(
-        x="date:T",
-        y="amount:Q",
-        color="category:N",
-        tooltip=["date", "category", alt.Tooltip("amount", format="$,.2f")]
-    )
-    
-    st.altair_chart(trend_chart, use_container_width=True)
+    with span("altair_spec"):
+        trend_chart = alt.Chart(daily_by_category).mark_line().encode(
+            x="date:T",
+            y="amount:Q",
+            color="category:N",
+            tooltip=["date", "category", alt.Tooltip("amount", format="$,.2f")]
+        )
+    
+    with span("emit"):
+        st.altair_chart(trend_chart, use_container_width=True)
 
+@traced("ui.render_top_expenses")
 def render_top_expenses(expenses: List[Dict[str, Any]]):
     """Render the top expenses list"""
     if not expenses:
@@ -80,16 +94,27 @@ def render_top_expenses(expenses: List[Dict[str, Any]]):
     for expense in sorted_expenses:
         st.markdown(f"**{expense['description']}** - {format_currency(abs(expense['amount']))}")
 
-def render_recurring_expenses(expenses: List[Dict[str, Any]]):
-    """Render the recurring expenses list"""
-    recurring = [expense for expense in expenses if expense.get("recurring", False)]
+@traced("ui.render_recurring_expenses")
+def render_recurring_expenses(index: RecurringIndex, days_ahead: int = 30):
+    """Render detected recurring expenses and those expected in the coming days"""
+    today = date.today()
+    recurring = [series for series in index.series(today) if series.is_expense]
     if not recurring:
         st.info("No recurring expenses")
         return
     
-    for expense in recurring:
-        st.markdown(f"**{expense['description']}** - {format_currency(abs(expense['amount']))}/month")
+    for series in recurring:
+        st.markdown(
+            f"**{series.description}** - {format_currency(abs(series.amount))}/{series.period} "
+            f"(next {series.next_date(today):%b %d})"
+        )
+    
+    upcoming = list(index.upcoming(today + timedelta(days=1), today + timedelta(days=days_ahead), expenses_only=True))
+    if upcoming:
+        total = sum(abs(t["amount"]) for t in upcoming)
+        st.caption(f"{format_currency(total)} expected over the next {days_ahead} days")
 
+@traced("ui.render_savings_analysis")
 def render_savings_analysis(earnings: List[Dict[str, Any]], expenses: List[Dict[str, Any]]):
     """Render the savings analysis chart"""
     if not earnings or not expenses:
@@ -97,31 +122,112 @@ def render_savings_analysis(earnings: List[Dict[str, Any]], expenses: List[Dict[
         return
     
     # Calculate monthly savings rate trend
-    df_earnings = pd.DataFrame(earnings)
-    df_earnings["date"] = pd.to_datetime(df_earnings["date"])
-    df_expenses = pd.DataFrame(expenses)
-    df_expenses["date"] = pd.to_datetime(df_expenses["date"])
-    
-    # Group by month
-    monthly_earnings = df_earnings.groupby(df_earnings["date"].dt.to_period("M"))["amount"].sum()
-    monthly_expenses = df_expenses.groupby(df_expenses["date"].dt.to_period("M"))["amount"].sum().abs()
-    monthly_savings_rate = ((monthly_earnings - monthly_expenses) / monthly_earnings * 100).round(1)
-    
-    # Display as a line chart
-    savings_df = pd.DataFrame({
-        "date": monthly_savings_rate.index.astype(str),
-        "rate": monthly_savings_rate.values
-    })
-    
-    savings_chart = alt.Chart(savings_df).mark_line(point=True).encode(
-        x="date:T",
-        y=alt.Y("rate:Q", title="Savings Rate (%)"),
-        tooltip=["date", alt.Tooltip("rate", format=".1f")]
-    )
-    
-    st.altair_chart(savings_chart, use_container_width=True)
+    with span("dataframe"):
+        df_earnings = pd.DataFrame(earnings)
+        df_earnings["date"] = days_to_datetimes(transaction_day(t) for t in earnings)
+        df_expenses = pd.DataFrame(expenses)
+        df_expenses["date"] = days_to_datetimes(transaction_day(t) for t in expenses)
+        
+        # Group by month
+        monthly_earnings = df_earnings.groupby(df_earnings["date"].dt.to_period("M"))["amount"].sum()
+        monthly_expenses = df_expenses.groupby(df_expenses["date"].dt.to_period("M"))["amount"].sum().abs()
+        monthly_savings_rate = ((monthly_earnings - monthly_expenses) / monthly_earnings * 100).round(1)
+        
+        # Display as a line chart
+        savings_df = pd.DataFrame({
+            "date": monthly_savings_rate.index.astype(str),
+            "rate": monthly_savings_rate.values
+        })
+    
+    with span("altair_spec"):
+        savings_chart = alt.Chart(savings_df).mark_line(point=True).encode(
+            x="date:T",
+            y=alt.Y("rate:Q", title="Savings Rate (%)"),
+            tooltip=["date", alt.Tooltip("rate", format=".1f")]
+        )
+    
+    with span("emit"):
+        st.altair_chart(savings_chart, use_container_width=True)
+
+@st.fragment(run_every=FORECAST_POLL_SECONDS)
+def await_forecast(user_id: str, rollup, has_model: bool):
+    """Report a background fit in progress and rerun the page once its model is ready
+
+    Only this fragment runs on the timer, so waiting does not rerender the page.
+    """
+    _, fresh = get_forecast(user_id, rollup)
+    if fresh:
+        st.rerun()
+    if has_model:
+        st.caption("Showing the previous forecast while it is updated")
+    else:
+        st.info("The forecast is being prepared and will appear in a moment")
 
-def display_overview_tab(transactions: List[Dict[str, Any]], assets: List[Dict[str, Any]], budgets: Dict[str, Any]):
+@traced("ui.render_cash_flow_forecast")
+def render_cash_flow_forecast(transactions: List[Dict[str, Any]], data_version: Optional[str] = None):
+    """Render projected monthly earnings, expenses and savings rate"""
+    cached = st.session_state.get("forecast_rollup")
+    key = (data_version, date.today())
+    if data_version and cached and cached[0] == key:
+        rollup = cached[1]
+    else:
+        with span("rollup"):
+            rollup = monthly_rollup(transactions)
+        st.session_state.forecast_rollup = (key, rollup)
+    if len(rollup) < MIN_HISTORY_MONTHS:
+        st.info(f"At least {MIN_HISTORY_MONTHS} months of history are needed for a forecast")
+        return
+    
+    # Models are fitted in the background; a stale model is shown until the new one is ready
+    user_id = st.session_state.get("user_id", "")
+    model, fresh = get_forecast(user_id, rollup)
+    if not fresh:
+        await_forecast(user_id, rollup, model is not None)
+    if model is None:
+        return
+    
+    horizon = st.select_slider("Forecast horizon (months)", options=list(range(3, 13)), value=6, key="forecast_horizon")
+    forecast = model.predict(horizon)
+    history = rollup.tail(12)
+    history.index = history.index.astype(str)
+    
+    with span("dataframe"):
+        frames = []
+        for kind, frame in (("Actual", history), ("Forecast", forecast)):
+            earnings = frame[EARNINGS_KEY] if EARNINGS_KEY in frame else pd.Series(0.0, index=frame.index)
+            expenses = frame.drop(columns=[EARNINGS_KEY], errors="ignore").sum(axis=1)
+            frames.append(pd.DataFrame({"date": frame.index, "type": "Earnings", "amount": earnings.values, "kind": kind}))
+            frames.append(pd.DataFrame({"date": frame.index, "type": "Expenses", "amount": expenses.values, "kind": kind}))
+        source = pd.concat(frames, ignore_index=True)
+    
+    with span("altair_spec"):
+        chart = alt.Chart(source).mark_line(point=True).encode(
+            x="date:T",
+            y=alt.Y("amount:Q", title="Amount"),
+            color="type:N",
+            strokeDash=alt.StrokeDash("kind:N", title=""),
+            tooltip=["date", "type", "kind", alt.Tooltip("amount", format="$,.2f")]
+        )
+    
+    with span("emit"):
+        st.altair_chart(chart, use_container_width=True)
+    
+    projected_earnings = forecast[EARNINGS_KEY].sum() if EARNINGS_KEY in forecast else 0.0
+    projected_expenses = forecast.drop(columns=[EARNINGS_KEY], errors="ignore").sum().sum()
+    projected_rate = ((projected_earnings - projected_expenses) / projected_earnings * 100) if projected_earnings > 0 else 0
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Projected Earnings", format_currency(projected_earnings))
+    with col2:
+        st.metric("Projected Expenses", format_currency(projected_expenses))
+    with col3:
+        st.metric("Projected Savings Rate", f"{projected_rate:.1f}%")
+    
+    with st.expander("Forecast by category"):
+        st.dataframe(forecast.drop(columns=[EARNINGS_KEY], errors="ignore").T, use_container_width=True)
+
+@traced("ui.display_overview_tab")
+def display_overview_tab(transactions: List[Dict[str, Any]], assets: List[Dict[str, Any]], budgets: Dict[str, Any], data_version: Optional[str] = None):
     """Display the overview tab content"""
     # Timeframe selector
     col1, col2 = st.columns([2, 3])
@@ -190,8 +296,11 @@ def display_overview_tab(transactions: List[Dict[str, Any]], assets: List[Dict[s
         render_top_expenses(expenses)
         
         st.subheader("Recurring Expenses")
-        render_recurring_expenses(expenses)
+        render_recurring_expenses(get_recurring_index(transactions, data_version))
         
         st.subheader("Savings Analysis")
         earnings = [t for t in filtered_transactions if t["amount"] > 0]
         render_savings_analysis(earnings, expenses)
+    
+    st.subheader("Cash Flow Forecast")
+    render_cash_flow_forecast(transactions, data_version)
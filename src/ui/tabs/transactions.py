@@ -1,9 +1,14 @@
 import streamlit as st
-import pandas as pd
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Callable
+from typing import List, Dict, Any, Callable, Optional
 
+from ...services.export import EXPORT_FORMATS
+from ...utils.dates import day_ordinal, days_to_datetimes, transaction_day
 from ...utils.formatting import format_currency
+from ...utils.lazy import lazy_import
+from ...utils.profiling import traced, span
+
+pd = lazy_import("pandas")
 
 def filter_transactions(
     transactions: List[Dict[str, Any]],
@@ -17,16 +22,12 @@ def filter_transactions(
     filtered = transactions.copy()
     
     if start_date:
-        filtered = [
-            t for t in filtered
-            if datetime.strptime(t["date"], "%Y-%m-%d") >= start_date
-        ]
+        first = day_ordinal(start_date)
+        filtered = [t for t in filtered if transaction_day(t) >= first]
     
     if end_date:
-        filtered = [
-            t for t in filtered
-            if datetime.strptime(t["date"], "%Y-%m-%d") <= end_date
-        ]
+        last = day_ordinal(end_date)
+        filtered = [t for t in filtered if transaction_day(t) <= last]
     
     if category:
         filtered = [t for t in filtered if t["category"] == category]
@@ -42,14 +43,95 @@ def filter_transactions(
     
     return filtered
 
+@traced("ui.render_categorization_rules")
+def render_categorization_rules(
+    rules: List[Dict[str, Any]],
+    notebooks: List[Dict[str, Any]],
+    on_save_rules: Callable[[List[Dict[str, Any]]], None]
+):
+    """Render the editor for auto-categorization rules"""
+    with st.expander("Categorization rules"):
+        st.caption(
+            "Rules are checked top to bottom when a transaction is saved without a category. "
+            "Patterns are case-insensitive regular expressions matched against the description."
+        )
+        notebook_names = {n["id"]: n["name"] for n in notebooks}
+        rows = [
+            {
+                "pattern": r.get("pattern", ""),
+                "category": r.get("category", ""),
+                "min_amount": r.get("min_amount"),
+                "max_amount": r.get("max_amount"),
+                "notebook": notebook_names.get(r.get("notebook_id"), "")
+            }
+            for r in rules
+        ]
+        with span("dataframe"):
+            df = pd.DataFrame(rows, columns=["pattern", "category", "min_amount", "max_amount", "notebook"])
+        with span("emit"):
+            edited = st.data_editor(
+                df,
+                num_rows="dynamic",
+                use_container_width=True,
+                key="categorization_rules_editor",
+                column_config={
+                    "pattern": st.column_config.TextColumn("Pattern"),
+                    "category": st.column_config.TextColumn("Category", required=True),
+                    "min_amount": st.column_config.NumberColumn("Min Amount", min_value=0.0, format="$%.2f"),
+                    "max_amount": st.column_config.NumberColumn("Max Amount", min_value=0.0, format="$%.2f"),
+                    "notebook": st.column_config.SelectboxColumn("Notebook", options=[""] + list(notebook_names.values()))
+                }
+            )
+        if st.button("Save Rules", key="save_categorization_rules"):
+            notebook_ids = {name: notebook_id for notebook_id, name in notebook_names.items()}
+            on_save_rules([
+                {
+                    "pattern": row["pattern"] or "",
+                    "category": (row["category"] or "").strip(),
+                    "min_amount": None if pd.isna(row["min_amount"]) else float(row["min_amount"]),
+                    "max_amount": None if pd.isna(row["max_amount"]) else float(row["max_amount"]),
+                    "notebook_id": notebook_ids.get(row["notebook"])
+                }
+                for row in edited.to_dict("records")
+            ])
+
+@traced("ui.render_export")
+def render_export(
+    on_export: Callable[..., None],
+    start_date,
+    end_date,
+    notebook_id,
+    keep: Callable[[Dict[str, Any]], bool]
+):
+    """Render the export controls for the current filters"""
+    with st.expander("Export"):
+        col1, col2 = st.columns([2, 1])
+        with col1:
+            export_format = st.selectbox("Format", list(EXPORT_FORMATS), key="export_format")
+        with col2:
+            st.write("")
+            all_history = st.checkbox("Entire history", key="export_all_history")
+        if st.button("Prepare Export", key="prepare_export"):
+            if all_history:
+                on_export(export_format)
+            else:
+                on_export(export_format, start_date, end_date, notebook_id, keep)
+
+@traced("ui.display_transactions_tab")
 def display_transactions_tab(
     transactions: List[Dict[str, Any]],
     notebooks: List[Dict[str, Any]],
     categories: List[str],
     on_edit_transaction: Callable[[Dict[str, Any]], None],
-    on_delete_transaction: Callable[[str], None]
+    on_bulk_action: Callable[[str, List[Dict[str, Any]], Any], None],
+    rules: Optional[List[Dict[str, Any]]] = None,
+    on_save_rules: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    on_export: Optional[Callable[..., None]] = None
 ):
     """Display the transactions tab content"""
+    if on_save_rules:
+        render_categorization_rules(rules or [], notebooks, on_save_rules)
+    
     # Filter controls
     with st.container():
         col1, col2, col3 = st.columns(3)
@@ -115,57 +197,94 @@ def display_transactions_tab(
             if search_query.lower() in t["description"].lower()
         ]
     
+    if on_export:
+        render_export(
+            on_export,
+            start_date,
+            end_date,
+            None if selected_notebook_name == "All" else next(
+                (n["id"] for n in notebooks if n["name"] == selected_notebook_name),
+                None
+            ),
+            lambda t: (
+                (selected_category == "All" or t.get("category") == selected_category)
+                and (transaction_type != "Expense" or t.get("amount", 0) < 0)
+                and (transaction_type != "Income" or t.get("amount", 0) > 0)
+                and (not search_query or search_query.lower() in t.get("description", "").lower())
+            )
+        )
+    
     # Display transactions
-    if filtered_transactions:
-        # Convert to DataFrame for better display
-        df = pd.DataFrame(filtered_transactions)
-        df["date"] = pd.to_datetime(df["date"]).dt.date
-        df["amount"] = df["amount"].apply(format_currency)
-        
-        # Add notebook names
+    if not filtered_transactions:
+        st.info("No transactions found")
+        return
+    
+    with span("dataframe"):
         notebook_map = {n["id"]: n["name"] for n in notebooks}
-        df["notebook"] = df["notebook_id"].map(notebook_map)
-        
-        # Reorder and rename columns
-        display_df = df[[
-            "date",
-            "description",
-            "category",
-            "amount",
-            "notebook",
-            "recurring"
-        ]].rename(columns={
-            "date": "Date",
-            "description": "Description",
-            "category": "Category",
-            "amount": "Amount",
-            "notebook": "Notebook",
-            "recurring": "Recurring"
+        df = pd.DataFrame({
+            "Select": False,
+            "Date": days_to_datetimes(transaction_day(t) for t in filtered_transactions).dt.date.tolist(),
+            "Description": [t.get("description", "") for t in filtered_transactions],
+            "Category": [t.get("category", "") for t in filtered_transactions],
+            "Amount": [format_currency(t["amount"]) for t in filtered_transactions],
+            "Notebook": [notebook_map.get(t.get("notebook_id"), "") for t in filtered_transactions],
+            "Recurring": [bool(t.get("recurring", False)) for t in filtered_transactions]
         })
-        
-        # Display as table with action buttons
-        for index, row in display_df.iterrows():
-            with st.container():
-                cols = st.columns([2, 3, 2, 2, 2, 1, 1])
-                
-                # Display transaction details
-                cols[0].write(str(row["Date"]))
-                cols[1].write(row["Description"])
-                cols[2].write(row["Category"])
-                cols[3].write(row["Amount"])
-                cols[4].write(row["Notebook"])
-                cols[5].write("🔄" if row["Recurring"] else "")
-                
-                # Action buttons
-                with cols[6]:
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        if st.button("✏️", key=f"edit_{filtered_transactions[index]['id']}"):
-                            on_edit_transaction(filtered_transactions[index])
-                    with col2:
-                        if st.button("🗑️", key=f"delete_{filtered_transactions[index]['id']}"):
-                            on_delete_transaction(filtered_transactions[index]["id"])
-            
-            st.divider()
-    else:
-        st.info("No transactions found")
+    
+    select_all = st.checkbox(f"Select all {len(filtered_transactions)} transactions", key="select_all_transactions")
+    if select_all:
+        df["Select"] = True
+    
+    # One table widget instead of a row of buttons per transaction
+    with span("emit"):
+        edited = st.data_editor(
+            df,
+            hide_index=True,
+            use_container_width=True,
+            disabled=[c for c in df.columns if c != "Select"],
+            column_config={"Recurring": st.column_config.CheckboxColumn("Recurring")},
+            key=f"transactions_table_{select_all}"
+        )
+    selected = [t for t, chosen in zip(filtered_transactions, edited["Select"].tolist()) if chosen]
+    
+    render_bulk_actions(selected, notebooks, categories, on_edit_transaction, on_bulk_action)
+
+@traced("ui.render_bulk_actions")
+def render_bulk_actions(
+    selected: List[Dict[str, Any]],
+    notebooks: List[Dict[str, Any]],
+    categories: List[str],
+    on_edit_transaction: Callable[[Dict[str, Any]], None],
+    on_bulk_action: Callable[[str, List[Dict[str, Any]], Any], None]
+):
+    """Render the actions that apply to the selected transactions"""
+    if not selected:
+        st.caption("Select transactions to edit, delete, move or recategorize them")
+        return
+    
+    st.write(f"**{len(selected)} selected**")
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        action = st.selectbox(
+            "Action",
+            ["Change category", "Move to notebook", "Toggle recurring", "Delete"],
+            key="bulk_action"
+        )
+    
+    value = None
+    with col2:
+        if action == "Change category":
+            value = st.selectbox("Category", categories, key="bulk_category")
+        elif action == "Move to notebook":
+            notebook_options = ["No notebook"] + [n["name"] for n in notebooks]
+            notebook_name = st.selectbox("Notebook", notebook_options, key="bulk_notebook")
+            value = next((n["id"] for n in notebooks if n["name"] == notebook_name), None)
+        elif action == "Delete":
+            st.warning(f"This permanently deletes {len(selected)} transaction{'s' if len(selected) != 1 else ''}")
+    
+    with col3:
+        st.write("")
+        if st.button("Apply", key="apply_bulk_action", type="primary"):
+            on_bulk_action(action, selected, value)
+        if len(selected) == 1 and st.button("✏️ Edit", key="edit_selected_transaction"):
+            on_edit_transaction(selected[0])
@@ -0,0 +1,62 @@
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, Optional
+
+from .lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+# Day ordinal of 1970-01-01, to turn ordinals into epoch days for pandas
+EPOCH_DAY = date(1970, 1, 1).toordinal()
+
+
+def day_ordinal(value: Any) -> Optional[int]:
+    """Day ordinal of a date, a datetime or a "YYYY-MM-DD" string"""
+    if isinstance(value, int):
+        return value
+    if isinstance(value, datetime):
+        return value.date().toordinal()
+    if isinstance(value, date):
+        return value.toordinal()
+    if isinstance(value, str) and value:
+        try:
+            return date.fromisoformat(value[:10]).toordinal()
+        except ValueError:
+            return None
+    return None
+
+
+def iso_day(value: Any) -> Optional[str]:
+    """"YYYY-MM-DD" form of a date, a datetime or a day ordinal"""
+    day = day_ordinal(value)
+    return date.fromordinal(day).isoformat() if day is not None else None
+
+
+def date_fields(value: Any) -> Dict[str, Any]:
+    """The stored forms of a transaction date: display string, Firestore timestamp and day ordinal"""
+    day = day_ordinal(value)
+    if day is None:
+        return {}
+    as_date = date.fromordinal(day)
+    return {
+        "date": as_date.isoformat(),
+        "date_ts": datetime(as_date.year, as_date.month, as_date.day, tzinfo=timezone.utc),
+        "day": day
+    }
+
+
+def with_typed_date(data: Dict[str, Any]) -> Dict[str, Any]:
+    """A copy of transaction fields with the typed date fields added when the date is set"""
+    if "date" not in data:
+        return data
+    return {**data, **date_fields(data["date"])}
+
+
+def transaction_day(transaction: Dict[str, Any]) -> Optional[int]:
+    """A transaction's day ordinal, parsed from its date only for documents not yet migrated"""
+    day = transaction.get("day")
+    return day if isinstance(day, int) else day_ordinal(transaction.get("date"))
+
+
+def days_to_datetimes(days: Iterable[Optional[int]]):
+    """Day ordinals as a pandas datetime Series, without parsing any strings; missing days become NaT"""
+    return pd.to_datetime(pd.Series(list(days), dtype="float64") - EPOCH_DAY, unit="D")
@@ -0,0 +1,83 @@
+"""Import-time report for the app's cold start.
+
+Runs ``python -X importtime -c "import <module>"`` in a fresh interpreter and
+summarises the slowest imports, flagging heavy packages that should stay lazy
+until a tab or service needs them.
+
+    python -m src.utils.import_report            # report for app.py
+    python -m src.utils.import_report --top 40
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import List, Dict, Any
+
+# Packages the sign-in page should not pay for
+HEAVY_PACKAGES = ["pandas", "altair", "numpy", "firebase_admin", "google.cloud.firestore", "pyarrow"]
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def collect_import_times(module: str = "app", cwd: str = None) -> List[Dict[str, Any]]:
+    """Import a module in a fresh interpreter and parse the -X importtime output"""
+    cwd = cwd or os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd,
+        capture_output=True,
+        text=True
+    )
+
+    entries = []
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        entries.append({
+            "module": name,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+            "depth": len(indent) // 2
+        })
+
+    if result.returncode != 0 and not entries:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    return entries
+
+
+def format_report(entries: List[Dict[str, Any]], top: int = 25) -> str:
+    """Render the slowest imports and the heavy packages that were loaded"""
+    total_ms = sum(e["self_ms"] for e in entries)
+    lines = [f"Total import time: {total_ms:.1f} ms across {len(entries)} modules", ""]
+
+    lines.append(f"{'cumulative ms':>14}  {'self ms':>9}  module")
+    for entry in sorted(entries, key=lambda e: e["cumulative_ms"], reverse=True)[:top]:
+        lines.append(f"{entry['cumulative_ms']:>14.1f}  {entry['self_ms']:>9.1f}  {entry['module']}")
+
+    loaded = {e["module"] for e in entries}
+    lines.append("")
+    lines.append("Heavy packages imported at startup:")
+    eager = [p for p in HEAVY_PACKAGES if p in loaded]
+    if eager:
+        for package in eager:
+            cumulative = next(e["cumulative_ms"] for e in entries if e["module"] == package)
+            lines.append(f"  {package} ({cumulative:.1f} ms)")
+    else:
+        lines.append("  none")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report import times for the app's cold start")
+    parser.add_argument("--module", default="app", help="Module to import (default: app)")
+    parser.add_argument("--top", type=int, default=25, help="Number of slowest imports to list")
+    args = parser.parse_args()
+
+    print(format_report(collect_import_times(args.module), args.top))
+
+
+if __name__ == "__main__":
+    main()
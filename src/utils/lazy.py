@@ -0,0 +1,49 @@
+import importlib
+import sys
+import threading
+from typing import Any
+
+_lock = threading.Lock()
+
+
+class LazyModule:
+    """Module proxy that defers the real import until an attribute is used"""
+
+    def __init__(self, name: str):
+        self.__dict__["_lazy_name"] = name
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            with _lock:
+                module = self.__dict__["_lazy_module"]
+                if module is None:
+                    module = importlib.import_module(self.__dict__["_lazy_name"])
+                    self.__dict__["_lazy_module"] = module
+        return module
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.__dict__["_lazy_module"] is not None
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr: str, value: Any):
+        setattr(self._load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.is_loaded else "not loaded"
+        return f"<lazy module '{self.__dict__['_lazy_name']}' ({state})>"
+
+
+def lazy_import(name: str):
+    """Return the module if it is already imported, otherwise a lazy proxy for it"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return LazyModule(name)
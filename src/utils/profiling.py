@@ -0,0 +1,244 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from .metrics import REGISTRY
+
+# Profiling is switched on per process; when off, `traced` returns the wrapped
+# function untouched and `span` hands back a shared no-op object.
+PROFILING_ENABLED = os.environ.get("FINANCE_TRACKER_PROFILE", "").lower() in ("1", "true", "yes", "on")
+MAX_TRACES = 20
+
+_local = threading.local()
+
+_span_seconds = REGISTRY.histogram(
+    "finance_tracker_span_duration_seconds",
+    "Wall time spent inside instrumented spans",
+    ["span"]
+)
+_documents_read = REGISTRY.counter(
+    "finance_tracker_documents_read",
+    "Firestore documents read by instrumented spans",
+    ["span"]
+)
+_bytes_read = REGISTRY.counter(
+    "finance_tracker_bytes_read",
+    "Estimated Firestore bytes read by instrumented spans",
+    ["span"]
+)
+
+
+class Span:
+    """A single timed section of a rerun"""
+    __slots__ = ("name", "start_ns", "end_ns", "depth", "attrs", "thread_id")
+
+    def __init__(self, name: str, depth: int, attrs: Dict[str, Any]):
+        self.name = name
+        self.depth = depth
+        self.attrs = attrs
+        self.thread_id = threading.get_ident()
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns = None
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.perf_counter_ns()
+        return (end_ns - self.start_ns) / 1_000_000
+
+    def set(self, **attrs):
+        """Attach attributes such as document counts to the span"""
+        self.attrs.update(attrs)
+
+
+class _NullSpan:
+    """Span stand-in used when no trace is active"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    """All spans recorded during one script rerun"""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.started_at = datetime.now()
+        self.origin_ns = time.perf_counter_ns()
+        self.spans: List[Span] = []
+        self._stack: List[Span] = []
+
+    @property
+    def duration_ms(self) -> float:
+        if not self.spans:
+            return 0.0
+        return (max(s.end_ns or s.start_ns for s in self.spans) - self.origin_ns) / 1_000_000
+
+    def open(self, name: str, attrs: Dict[str, Any]) -> Span:
+        span = Span(name, len(self._stack), attrs)
+        self.spans.append(span)
+        self._stack.append(span)
+        return span
+
+    def close(self, span: Span):
+        span.end_ns = time.perf_counter_ns()
+        if self._stack and self._stack[-1] is span:
+            self._stack.pop()
+        _span_seconds.observe((span.end_ns - span.start_ns) / 1e9, span=span.name)
+        if "docs" in span.attrs:
+            _documents_read.inc(span.attrs["docs"], span=span.name)
+        if "bytes" in span.attrs:
+            _bytes_read.inc(span.attrs["bytes"], span=span.name)
+
+    @property
+    def current(self) -> Optional[Span]:
+        return self._stack[-1] if self._stack else None
+
+
+class _ActiveSpan:
+    """Context manager that opens and closes a span on the active trace"""
+    __slots__ = ("trace", "name", "attrs", "span")
+
+    def __init__(self, trace: Trace, name: str, attrs: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+        self.span = None
+
+    def __enter__(self) -> Span:
+        self.span = self.trace.open(self.name, self.attrs)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.span.attrs["error"] = exc_type.__name__
+        self.trace.close(self.span)
+        return False
+
+
+def is_active() -> bool:
+    """Return True if a trace is being recorded on this thread"""
+    return getattr(_local, "trace", None) is not None
+
+
+def span(name: str, **attrs):
+    """Time a block of code under the active trace"""
+    trace = getattr(_local, "trace", None)
+    if trace is None:
+        return _NULL_SPAN
+    return _ActiveSpan(trace, name, attrs)
+
+
+def record(**attrs):
+    """Attach attributes to the innermost open span"""
+    trace = getattr(_local, "trace", None)
+    if trace is not None and trace.current is not None:
+        trace.current.attrs.update(attrs)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator that wraps every call of a function in a span"""
+    def decorator(func: Callable) -> Callable:
+        if not PROFILING_ENABLED:
+            return func
+
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            trace = getattr(_local, "trace", None)
+            if trace is None:
+                return func(*args, **kwargs)
+            with _ActiveSpan(trace, span_name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def trace_rerun(label: str = "rerun"):
+    """Record every span of a script rerun and keep it for the debug panel"""
+    if not PROFILING_ENABLED:
+        yield None
+        return
+
+    import streamlit as st
+
+    trace = Trace(label)
+    _local.trace = trace
+    try:
+        with _ActiveSpan(trace, label, {}):
+            yield trace
+    finally:
+        _local.trace = None
+        traces = st.session_state.setdefault("profiler_traces", [])
+        traces.append(trace)
+        del traces[:-MAX_TRACES]
+
+
+def estimate_document_size(data: Any) -> int:
+    """Estimate the Firestore storage size of a document in bytes"""
+    if data is None or isinstance(data, bool):
+        return 1
+    if isinstance(data, (int, float, datetime, date)):
+        return 8
+    if isinstance(data, str):
+        return len(data.encode("utf-8")) + 1
+    if isinstance(data, bytes):
+        return len(data)
+    if isinstance(data, dict):
+        return sum(len(str(k).encode("utf-8")) + 1 + estimate_document_size(v) for k, v in data.items()) + 32
+    if isinstance(data, (list, tuple)):
+        return sum(estimate_document_size(v) for v in data)
+    return 8
+
+
+def record_documents(documents: List[Dict[str, Any]]):
+    """Record the document count and estimated bytes on the current span"""
+    if not is_active():
+        return
+    record(docs=len(documents), bytes=sum(estimate_document_size(d) for d in documents))
+
+
+def to_chrome_trace(traces: List[Trace]) -> str:
+    """Export traces in the Chrome trace event format (chrome://tracing, Perfetto)"""
+    events = []
+    for pid, trace in enumerate(traces, start=1):
+        events.append({
+            "name": "process_name",
+            "ph": "M",
+            "pid": pid,
+            "args": {"name": f"{trace.label} @ {trace.started_at.isoformat(timespec='seconds')}"}
+        })
+        for s in trace.spans:
+            if s.end_ns is None:
+                continue
+            events.append({
+                "name": s.name,
+                "cat": s.name.split(".", 1)[0],
+                "ph": "X",
+                "pid": pid,
+                "tid": s.thread_id,
+                "ts": (s.start_ns - trace.origin_ns) / 1000,
+                "dur": (s.end_ns - s.start_ns) / 1000,
+                "args": {k: v for k, v in s.attrs.items()}
+            })
+    return json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}, default=str)
+
+
+def to_openmetrics() -> str:
+    """Export the process metrics in the OpenMetrics text format"""
+    return REGISTRY.render_openmetrics()
@@ -0,0 +1,161 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+
+import pytest
+
+
+class FakeSnapshot:
+    def __init__(self, reference: "FakeDocument", data: Optional[Dict[str, Any]]):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeDocument:
+    def __init__(self, db: "FakeFirestore", path: str):
+        self.db = db
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    @property
+    def parent(self) -> "FakeCollection":
+        return FakeCollection(self.db, self.path.rsplit("/", 1)[0])
+
+    def collection(self, name: str) -> "FakeCollection":
+        return FakeCollection(self.db, f"{self.path}/{name}")
+
+    def get(self, **kwargs) -> FakeSnapshot:
+        return FakeSnapshot(self, self.db.docs.get(self.path))
+
+    def set(self, data: Dict[str, Any], merge: bool = False, **kwargs):
+        self.db.write("set", self, data, merge)
+
+
+class FakeQuery:
+    """Documents matching a path predicate, in document path order"""
+
+    def __init__(self, db: "FakeFirestore", match, after=None, start=None, end=None, limit=None):
+        self.db = db
+        self.match = match
+        self._after, self._start, self._end, self._limit = after, start, end, limit
+
+    def _with(self, **changes) -> "FakeQuery":
+        options = {"after": self._after, "start": self._start, "end": self._end, "limit": self._limit}
+        options.update(changes)
+        return FakeQuery(self.db, self.match, **options)
+
+    def order_by(self, field: str) -> "FakeQuery":
+        return self
+
+    def start_after(self, cursor) -> "FakeQuery":
+        return self._with(after=cursor["__name__"].path)
+
+    def start_at(self, cursor) -> "FakeQuery":
+        return self._with(start=cursor["__name__"].path)
+
+    def end_before(self, cursor) -> "FakeQuery":
+        return self._with(end=cursor["__name__"].path)
+
+    def limit(self, count: int) -> "FakeQuery":
+        return self._with(limit=count)
+
+    def stream(self, **kwargs):
+        found = []
+        for path in sorted(p for p in self.db.docs if self.match(p)):
+            if (self._after and path <= self._after) or (self._start and path < self._start):
+                continue
+            if self._end and path >= self._end:
+                continue
+            found.append(FakeSnapshot(FakeDocument(self.db, path), self.db.docs[path]))
+            if self._limit and len(found) == self._limit:
+                break
+        return iter(found)
+
+    def get_partitions(self, count: int, **kwargs):
+        paths = sorted(p for p in self.db.docs if self.match(p))
+        step = max(len(paths) // count, 1)
+        cuts = [None] + paths[step::step][:count - 1] + [None]
+        return [
+            SimpleNamespace(
+                start_at=FakeDocument(self.db, start) if start else None,
+                end_at=FakeDocument(self.db, end) if end else None
+            )
+            for start, end in zip(cuts, cuts[1:])
+        ]
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, db: "FakeFirestore", path: str):
+        super().__init__(db, lambda p: p.rsplit("/", 1)[0] == path)
+        self.path = path
+
+    def document(self, doc_id: str) -> FakeDocument:
+        return FakeDocument(self.db, f"{self.path}/{doc_id}")
+
+
+class FakeBatch:
+    def __init__(self, db: "FakeFirestore"):
+        self.db = db
+        self.writes = []
+
+    def set(self, ref: FakeDocument, data: Dict[str, Any], merge: bool = False):
+        self.writes.append(("set", ref, data, merge))
+
+    def update(self, ref: FakeDocument, data: Dict[str, Any]):
+        self.writes.append(("update", ref, data, False))
+
+    def delete(self, ref: FakeDocument):
+        self.writes.append(("delete", ref, None, False))
+
+    def commit(self, **kwargs):
+        if self.db.fail_commit and self.db.fail_commit(self):
+            raise ValueError("commit refused")
+        if any(kind == "update" and ref.path not in self.db.docs for kind, ref, _, _ in self.writes):
+            raise ValueError("no document to update")
+        self.db.commits.append([(kind, ref.path) for kind, ref, _, _ in self.writes])
+        results = []
+        for kind, ref, data, merge in self.writes:
+            self.db.write(kind, ref, data, merge)
+            results.append(SimpleNamespace(update_time=self.db.clock))
+        return results
+
+
+class FakeFirestore:
+    """In-memory stand-in for a Firestore client, holding documents by path"""
+
+    def __init__(self):
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.commits = []
+        self.fail_commit = None
+        self.clock = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    def collection(self, name: str) -> FakeCollection:
+        return FakeCollection(self, name)
+
+    def collection_group(self, name: str) -> FakeQuery:
+        return FakeQuery(self, lambda p: p.split("/")[-2] == name)
+
+    def document(self, path: str) -> FakeDocument:
+        return FakeDocument(self, path)
+
+    def batch(self) -> FakeBatch:
+        return FakeBatch(self)
+
+    def write(self, kind: str, ref: FakeDocument, data: Optional[Dict[str, Any]], merge: bool):
+        self.clock += timedelta(microseconds=1)
+        if kind == "delete":
+            self.docs.pop(ref.path, None)
+        elif kind == "update" or merge:
+            self.docs.setdefault(ref.path, {}).update(data)
+        else:
+            self.docs[ref.path] = dict(data)
+
+
+@pytest.fixture
+def db() -> FakeFirestore:
+    return FakeFirestore()
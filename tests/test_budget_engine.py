@@ -0,0 +1,66 @@
+from datetime import date
+
+import pytest
+
+from src.services.budget_engine import BudgetEngine, annual_factor, apply_budget_update, monthly_factor
+
+TODAY = date(2026, 2, 10)
+BUDGETS = {
+    "monthly": {"categories": {"Food": 300, "Insurance": 0}},
+    "annual": {"categories": {"Food": 3600, "Insurance": 1200}},
+}
+
+
+def _spend(category, amount, day):
+    return {"category": category, "amount": -amount, "date": day}
+
+
+def test_monthly_factor_counts_partial_months_by_days():
+    assert monthly_factor(date(2026, 2, 1), date(2026, 2, 28)) == pytest.approx(1.0)
+    assert monthly_factor(date(2026, 1, 17), date(2026, 2, 14)) == pytest.approx(15 / 31 + 14 / 28)
+
+
+def test_annual_factor_uses_real_year_length():
+    assert annual_factor(date(2024, 1, 1), date(2024, 12, 31)) == pytest.approx(1.0)
+    assert annual_factor(date(2026, 2, 1), date(2026, 2, 28)) == pytest.approx(28 / 365)
+
+
+def test_month_keeps_monthly_budgets_and_prorates_annual_only():
+    budgets = BudgetEngine([], BUDGETS, today=TODAY).evaluate()["month"].budgets
+    assert budgets["Food"] == 300
+    assert budgets["Insurance"] == pytest.approx(1200 * 28 / 365)
+
+
+def test_week_and_quarter_prorate():
+    results = BudgetEngine([], BUDGETS, today=TODAY).evaluate()
+    assert results["week"].budgets["Food"] == pytest.approx(300 * 7 / 28)
+    assert results["quarter"].budgets["Food"] == pytest.approx(900)
+    assert results["ytd"].budgets == {"Food": 3600.0, "Insurance": 1200.0}
+
+
+def test_actuals_per_period():
+    transactions = [
+        _spend("Food", 20, "2026-02-09"),
+        _spend("Food", 30, "2026-02-02"),
+        _spend("Food", 50, "2026-01-15"),
+        {"category": "Salary", "amount": 1000, "date": "2026-02-01"},
+    ]
+    results = BudgetEngine(transactions, BUDGETS, today=TODAY).evaluate()
+    assert results["week"].actuals == {"Food": 20.0}
+    assert results["month"].actuals == {"Food": 50.0}
+    assert results["ytd"].total_spent == 100.0
+
+
+def test_custom_range():
+    transactions = [_spend("Food", 10, "2026-01-01"), _spend("Food", 10, "2026-01-31")]
+    result = BudgetEngine(transactions, BUDGETS, today=TODAY).evaluate((date(2026, 1, 1), date(2026, 1, 31)))["custom"]
+    assert result.actuals == {"Food": 20.0}
+    assert result.budgets["Food"] == pytest.approx(300)
+
+
+def test_apply_budget_update_adjusts_totals():
+    budgets = {"monthly": {"total": 300, "categories": {"Food": 300}}}
+    apply_budget_update(budgets, "Food", 250, 3000)
+    apply_budget_update(budgets, "Rent", 1000, 12000)
+    assert budgets["monthly"] == {"total": 1250, "categories": {"Food": 250, "Rent": 1000}}
+    assert budgets["annual"]["total"] == 15000
@@ -0,0 +1,77 @@
+import pytest
+
+from src.services.categorizer import Categorizer, DescriptionModel, Rule, RuleMatcher, parse_rules
+
+
+def test_first_matching_rule_wins():
+    matcher = RuleMatcher([Rule("Groceries", "trader joe"), Rule("Shopping", "joe")])
+    assert matcher.match("TRADER JOE'S #552") == "Groceries"
+    assert matcher.match("Joe's Hardware") == "Shopping"
+    assert matcher.match("Unknown") is None
+
+
+def test_amount_and_notebook_conditions_fall_through_to_later_rules():
+    matcher = RuleMatcher([
+        Rule("Big Purchases", "amazon", min_amount=100),
+        Rule("Trip", "amazon", notebook_id="nb1"),
+        Rule("Shopping", "amazon"),
+    ])
+    assert matcher.match("Amazon", -250) == "Big Purchases"
+    assert matcher.match("Amazon", -20, "nb1") == "Trip"
+    assert matcher.match("Amazon", -20) == "Shopping"
+
+
+def test_named_groups_work_in_the_combined_regex():
+    rules = parse_rules([
+        {"category": "Duplicate", "pattern": r"(?P<word>\w+) (?P=word)"},
+        {"category": "Shopping", "pattern": "amazon"},
+    ])
+    matcher = RuleMatcher(rules)
+    assert matcher.match("pay pay") == "Duplicate"
+    assert matcher.match("amazon mktp") == "Shopping"
+
+
+@pytest.mark.parametrize("pattern", [r"(\w)\1", r"(a)?(?(1)b|c)"])
+def test_numbered_group_references_are_rejected(pattern):
+    with pytest.raises(ValueError):
+        parse_rules([{"category": "Shopping", "pattern": "amazon"}, {"category": "Bad", "pattern": pattern}])
+
+
+def test_invalid_pattern_is_rejected():
+    with pytest.raises(ValueError):
+        parse_rules([{"category": "Bad", "pattern": "("}])
+
+
+def test_rules_without_category_are_dropped():
+    assert parse_rules([{"category": "", "pattern": "x"}]) == []
+
+
+def test_model_learns_from_history():
+    model = DescriptionModel([
+        {"description": "Shell gas station", "category": "Fuel"},
+        {"description": "Chevron gas", "category": "Fuel"},
+        {"description": "Whole Foods market", "category": "Groceries"},
+    ])
+    assert model.predict("SHELL GAS 123")[0] == "Fuel"
+    assert model.predict("Whole Foods market") == ("Groceries", 1.0)
+    assert model.predict("completely new") is None
+
+
+def test_categorizer_order_rules_then_notebook_then_model():
+    categorizer = Categorizer(
+        [Rule("Rent", "landlord")],
+        [{"id": "nb1", "category": "Vacation"}],
+        [{"description": "Starbucks", "category": "Coffee"}] * 3,
+    )
+    assert categorizer.categorize("Landlord LLC", -1000, "nb1") == "Rent"
+    assert categorizer.categorize("Hotel", -200, "nb1") == "Vacation"
+    assert categorizer.categorize("Starbucks", -5) == "Coffee"
+    assert categorizer.categorize("Nothing alike", -5) is None
+
+
+def test_categorize_many_matches_single_calls():
+    categorizer = Categorizer([Rule("Big", "shop", min_amount=100), Rule("Small", "shop")], [], [])
+    transactions = [{"description": "Shop", "amount": amount} for amount in (-50, -100, -150, -50)]
+    assert categorizer.categorize_many(transactions) == [
+        categorizer.categorize(t["description"], t["amount"]) for t in transactions
+    ]
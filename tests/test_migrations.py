@@ -0,0 +1,85 @@
+import pytest
+
+from src.services.migrations import MIGRATIONS, MigrationRunner, _legacy_categories_plan, _typed_date_plan, _user_of
+
+
+def _runner(db, tmp_path, mode, **options):
+    options.setdefault("partitions", 3)
+    options.setdefault("writes_per_second", 0)
+    return MigrationRunner(
+        db, MIGRATIONS["typed_dates"], mode=mode,
+        checkpoint_path=str(tmp_path / f"{mode}.json"), page_size=2, **options
+    )
+
+
+@pytest.fixture
+def transactions(db):
+    for user in ("u1", "u2"):
+        for i in range(5):
+            db.docs[f"users/{user}/transactions/t{i}"] = {"date": f"2026-01-0{i + 1}", "amount": -1.0}
+    db.docs["users/u1/transactions/t0"].update(_typed_fields("2026-01-01"))
+    return db
+
+
+def _typed_fields(day):
+    return {name: value for op in _typed_date_plan("u", "x", {"date": day}) for name, value in op.data.items()}
+
+
+def test_user_of_path():
+    assert _user_of("users/u1/transactions/t1") == "u1"
+    assert _user_of("other/u1/transactions/t1") is None
+
+
+def test_typed_date_plan_is_idempotent():
+    [op] = _typed_date_plan("u1", "t1", {"date": "2026-01-02"})
+    assert op.kind == "update" and op.data["date"] == "2026-01-02" and op.data["day"]
+    assert _typed_date_plan("u1", "t1", {"date": "2026-01-02", **op.data}) == []
+    assert _typed_date_plan("u1", "t1", {}) == []
+
+
+def test_legacy_categories_plan_ignores_other_documents():
+    assert _legacy_categories_plan("u1", "version", {"version": 3}) == []
+
+
+def test_dry_run_counts_without_writing(transactions, tmp_path):
+    before = {path: dict(data) for path, data in transactions.docs.items()}
+    totals = _runner(transactions, tmp_path, "dry-run").run()
+    assert totals["scanned"] == 10
+    assert totals["changed"] == 9
+    assert totals["done"] == totals["partitions"]
+    assert transactions.docs == before
+
+
+def test_apply_then_verify(transactions, tmp_path):
+    totals = _runner(transactions, tmp_path, "apply").run()
+    assert totals["changed"] == 9 and totals["failed"] == 0
+    assert all("day" in data for path, data in transactions.docs.items() if "/transactions/" in path)
+
+    verify = _runner(transactions, tmp_path, "verify").run()
+    assert verify["stale"] == 0
+    assert transactions.docs["migrations/typed_dates"]["verified"] is True
+
+
+def test_verify_reports_stale_documents(transactions, tmp_path):
+    runner = _runner(transactions, tmp_path, "verify")
+    totals = runner.run()
+    assert totals["stale"] == 9
+    assert transactions.docs["migrations/typed_dates"]["verified"] is False
+    assert len(runner.stale_examples) == 9
+
+
+def test_single_user_run_leaves_others_and_the_marker(transactions, tmp_path):
+    _runner(transactions, tmp_path, "apply", user_id="u2").run()
+    assert all("day" in transactions.docs[f"users/u2/transactions/t{i}"] for i in range(5))
+    assert "day" not in transactions.docs["users/u1/transactions/t1"]
+
+    _runner(transactions, tmp_path, "verify", user_id="u2").run()
+    assert "migrations/typed_dates" not in transactions.docs
+
+
+def test_resumes_from_checkpoint(transactions, tmp_path):
+    first = _runner(transactions, tmp_path, "apply", partitions=1, time_limit=-1).run()
+    assert first["scanned"] == 0 and first["done"] == 0
+
+    resumed = _runner(transactions, tmp_path, "apply", partitions=1).run()
+    assert resumed["scanned"] == 10 and resumed["done"] == 1
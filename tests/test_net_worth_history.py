@@ -0,0 +1,56 @@
+from datetime import date
+
+from src.services.net_worth_history import (
+    TOTAL_KEY,
+    _decode_series,
+    _encode_series,
+    decode_chunk,
+    encode_chunk,
+    month_ids_between,
+    series_labels,
+    snapshot_chunk,
+)
+
+
+def test_series_round_trip():
+    cents = [0, 150, 150, -2_000, 10**12, 10**12 - 1, -(10**12), 0]
+    assert _decode_series(_encode_series(cents)) == cents
+
+
+def test_empty_series_round_trip():
+    assert _decode_series(_encode_series([])) == []
+
+
+def test_chunk_round_trip():
+    series = {TOTAL_KEY: [100, 200, 300], "a": [100, 200, 300]}
+    chunk = encode_chunk("2026-03", date(2026, 3, 1).toordinal(), series, {"a": "Car"})
+    assert chunk["days"] == 3
+    assert decode_chunk(chunk) == (date(2026, 3, 1).toordinal(), series)
+
+
+def test_month_ids_cross_year():
+    assert month_ids_between(date(2025, 11, 20), date(2026, 2, 1)) == ["2025-11", "2025-12", "2026-01", "2026-02"]
+
+
+def test_snapshot_carries_values_forward_and_drops_removed_assets():
+    first = snapshot_chunk("2026-03", None, [{"id": "a", "name": "Car", "value": 10}], date(2026, 3, 1))
+    later = snapshot_chunk("2026-03", first, [{"id": "b", "name": "Boat", "value": 5}], date(2026, 3, 4))
+    _, series = decode_chunk(later)
+    assert series["a"] == [1000, 1000, 1000, 0]
+    assert series["b"] == [0, 0, 0, 500]
+    assert series[TOTAL_KEY] == [1000, 1000, 1000, 500]
+    assert later["names"] == {"a": "Car", "b": "Boat"}
+
+
+def test_snapshot_same_day_replaces_value():
+    first = snapshot_chunk("2026-03", None, [{"id": "a", "value": 10}], date(2026, 3, 1))
+    again = snapshot_chunk("2026-03", first, [{"id": "a", "value": 12}], date(2026, 3, 1))
+    assert decode_chunk(again)[1]["a"] == [1200]
+
+
+def test_series_labels_are_unique():
+    labels = series_labels({"a": "Savings", "b": "Savings", "c": "Car", "d": "Net Worth", "e": ""})
+    assert labels["c"] == "Car"
+    assert labels["a"] == "Savings (a)" and labels["b"] == "Savings (b)"
+    assert labels["d"] == "Net Worth (d)"
+    assert len(set(labels.values())) == len(labels)
@@ -0,0 +1,69 @@
+from datetime import date, timedelta
+
+from src.services.recurring import RecurringIndex, amount_clusters, normalize_description
+
+
+def _monthly(prefix, description, amounts, start=date(2026, 1, 5)):
+    return [
+        {"id": f"{prefix}{i}", "description": description, "amount": amount, "category": "Bills",
+         "date": date(start.year, start.month + i, start.day).isoformat()}
+        for i, amount in enumerate(amounts)
+    ]
+
+
+def _rows(amounts):
+    return {str(i): (i, amount, "", "", False) for i, amount in enumerate(amounts)}
+
+
+def test_normalize_description_strips_noise():
+    assert normalize_description("POS DEBIT Netflix.com #1234") == "netflix com"
+
+
+def test_steady_amounts_stay_in_one_cluster():
+    # Amounts either side of any fixed band edge must not split a series
+    assert len(amount_clusters(_rows([-9.99, -10.01, -10.05, -9.95]))) == 1
+
+
+def test_distant_amounts_split():
+    clusters = amount_clusters(_rows([-10.0, -10.5, -50.0, -51.0]))
+    assert sorted(len(c) for c in clusters) == [2, 2]
+
+
+def test_expenses_and_earnings_never_mix():
+    clusters = amount_clusters(_rows([-10.0, 10.0]))
+    assert len(clusters) == 2
+
+
+def test_monthly_series_detected():
+    index = RecurringIndex()
+    index.sync(_monthly("n", "Netflix 0412", [-15.49, -15.49, -15.49, -15.49]))
+    [series] = index.series(today=date(2026, 4, 20))
+    assert series.frequency == "monthly"
+    assert series.period == "month"
+    assert series.amount == -15.49
+    assert series.next_date() == date(2026, 5, 5)
+
+
+def test_two_plans_of_one_merchant_are_separate_series():
+    transactions = _monthly("a", "Spotify", [-9.99] * 3) + _monthly("b", "Spotify", [-49.99] * 3)
+    index = RecurringIndex()
+    index.sync(transactions)
+    assert sorted(s.amount for s in index.series(today=date(2026, 3, 10))) == [-49.99, -9.99]
+
+
+def test_sync_forgets_removed_transactions():
+    transactions = _monthly("n", "Gym", [-30.0] * 3)
+    index = RecurringIndex()
+    index.sync(transactions)
+    assert index.series(today=date(2026, 3, 10))
+    index.sync(transactions[:1])
+    assert index.series(today=date(2026, 3, 10)) == []
+
+
+def test_upcoming_projects_occurrences():
+    index = RecurringIndex()
+    index.sync(_monthly("n", "Rent", [-1000.0] * 3))
+    start = date(2026, 3, 10)
+    projected = list(index.upcoming(start, start + timedelta(days=60)))
+    assert [p["date"] for p in projected] == ["2026-04-05", "2026-05-05"]
+    assert all(p["projected"] for p in projected)
@@ -0,0 +1,78 @@
+import base64
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("cryptography")
+
+from src.services.session_store import SessionStore, _decrypt, _encrypt, _record_key
+
+
+def _auth(hours=1, **extra):
+    return {"user_id": "u1", "id_token": "secret-id-token", "expires_at": (datetime.now() + timedelta(hours=hours)).isoformat(), **extra}
+
+
+def test_encrypt_round_trip():
+    key = _record_key("token")
+    assert _decrypt(key, _encrypt(key, {"a": 1})) == {"a": 1}
+
+
+def test_wrong_key_is_rejected():
+    sealed = _encrypt(_record_key("token"), {"a": 1})
+    assert _decrypt(_record_key("other"), sealed) is None
+
+
+def test_tampered_record_is_rejected():
+    key = _record_key("token")
+    raw = bytearray(base64.b64decode(_encrypt(key, {"a": 1})))
+    raw[-1] ^= 1
+    assert _decrypt(key, base64.b64encode(bytes(raw)).decode("ascii")) is None
+
+
+@pytest.mark.parametrize("data", ["", "AAAA", "not base64!"])
+def test_malformed_record_is_rejected(data):
+    assert _decrypt(_record_key("token"), data) is None
+
+
+def test_sessions_survive_restart_encrypted(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    SessionStore(db_path=path).put("token", _auth())
+
+    assert SessionStore(db_path=path).get("token")["user_id"] == "u1"
+    assert SessionStore(db_path=path).get("other") is None
+    rows = sqlite3.connect(path).execute("SELECT token_hash, data FROM sealed_sessions").fetchall()
+    assert rows and all("secret-id-token" not in data and "token" != token_hash for token_hash, data in rows)
+
+
+def test_expired_session_is_dropped():
+    store = SessionStore()
+    store.put("token", _auth(hours=-1))
+    assert store.get("token") is None
+    assert len(store) == 0
+
+
+def test_lru_eviction():
+    store = SessionStore(max_entries=2)
+    for token in ("a", "b", "c"):
+        store.put(token, _auth())
+    assert store.get("a") is None
+    assert store.get("c") is not None
+
+
+def test_handoff_code_is_single_use():
+    store = SessionStore()
+    code = store.issue_handoff("token")
+    assert store.redeem_handoff(code) == "token"
+    assert store.redeem_handoff(code) is None
+
+
+def test_delete_stops_persisting(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    store = SessionStore(db_path=path)
+    auth_data = _auth()
+    store.put("token", auth_data)
+    store.delete("token")
+    store.persist(auth_data)
+    assert not store.is_live(auth_data)
+    assert SessionStore(db_path=path).get("token") is None
@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.services.write_queue import WriteOp, WriteRequest, WriteTracker, _user_batches, MAX_BATCH_WRITES
+
+
+def _request(tracker, *ops, label="Saving"):
+    return WriteRequest(list(ops), label, tracker)
+
+
+def test_overlay_set_update_delete():
+    tracker = WriteTracker()
+    tracker.add(_request(tracker, WriteOp("u", "transactions", "new", "set", {"amount": 5})))
+    tracker.add(_request(tracker, WriteOp("u", "transactions", "a", "update", {"amount": 7})))
+    tracker.add(_request(tracker, WriteOp("u", "transactions", "b", "delete")))
+    tracker.add(_request(tracker, WriteOp("u", "transactions", "missing", "update", {"amount": 1})))
+    loaded = [{"id": "a", "amount": 1, "category": "Food"}, {"id": "b", "amount": 2}]
+
+    assert tracker.apply("transactions", loaded) == [
+        {"id": "a", "amount": 7, "category": "Food"},
+        {"id": "new", "amount": 5},
+    ]
+    # The loaded documents themselves are left as they were
+    assert loaded[0]["amount"] == 1
+    assert tracker.apply("notebooks", loaded) is loaded
+
+
+def test_overlay_single_document_merge():
+    tracker = WriteTracker()
+    tracker.add(_request(tracker, WriteOp("u", "budgets", "current", "set", {"monthly": 1}, merge=True)))
+    assert tracker.apply_document("budgets", "current", {"annual": 2}) == {"annual": 2, "monthly": 1}
+    assert tracker.apply_document("budgets", "other", None) is None
+
+
+def test_failed_request_is_dropped_and_reported():
+    tracker = WriteTracker()
+    request_id = tracker.add(_request(tracker, WriteOp("u", "transactions", "a", "set", {}), label="Saving 'x'"))
+    tracker.finish(request_id, ValueError("refused"))
+    assert tracker.pending_count == 0
+    assert tracker.apply("transactions", []) == []
+    assert tracker.pop_failures() == ["Saving 'x' failed: refused"]
+    assert tracker.pop_failures() == []
+
+
+def test_committed_request_stays_overlaid_until_settled():
+    tracker = WriteTracker()
+    committed_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    request_id = tracker.add(_request(tracker, WriteOp("u", "transactions", "a", "set", {"amount": 1})))
+    tracker.finish(request_id, committed_at=committed_at)
+    assert tracker.pending_count == 0
+
+    tracker.settle({"version": 1, "updated_at": committed_at - timedelta(seconds=1)})
+    assert tracker.apply("transactions", []) == [{"id": "a", "amount": 1}]
+    tracker.settle(None)
+    assert tracker.apply("transactions", []) == [{"id": "a", "amount": 1}]
+
+    revision = tracker.revision
+    tracker.settle({"version": 2, "updated_at": committed_at})
+    assert tracker.apply("transactions", []) == []
+    assert tracker.revision != revision
+
+
+def test_user_batches_split_by_user_and_size():
+    tracker = WriteTracker()
+    big = [WriteOp("u1", "transactions", str(i), "set", {}) for i in range(MAX_BATCH_WRITES - 10)]
+    group = [
+        (1, _request(tracker, *big)),
+        (2, _request(tracker, WriteOp("u2", "transactions", "x", "set", {}))),
+        (3, _request(tracker, *[WriteOp("u1", "transactions", f"y{i}", "set", {}) for i in range(20)])),
+    ]
+    batches = [[request_id for request_id, _ in batch] for batch in _user_batches(group)]
+    assert batches == [[1], [3], [2]]
+
+
+def test_commit_isolates_a_refused_request(db):
+    pytest.importorskip("firebase_admin")
+    from src.services.write_queue import WriteQueue
+
+    db.docs["users/u/transactions/a"] = {"amount": 1}
+    queue = WriteQueue(db)
+    tracker = WriteTracker()
+    good = _request(tracker, WriteOp("u", "transactions", "a", "update", {"amount": 2}))
+    bad = _request(tracker, WriteOp("u", "transactions", "missing", "update", {"amount": 3}), label="Saving 'bad'")
+    group = [(tracker.add(good), good), (tracker.add(bad), bad)]
+
+    queue._commit(group)
+
+    assert db.docs["users/u/transactions/a"]["amount"] == 2
+    assert "users/u/transactions/missing" not in db.docs
+    assert "users/u/metadata/version" in db.docs
+    assert tracker.pop_failures() == ["Saving 'bad' failed: no document to update"]
+    # The good write stays overlaid until a load includes it
+    assert good.committed_at is not None
+    assert tracker.apply("transactions", []) == []